@@ -0,0 +1,410 @@
+"""
+Packed single-file content archive.
+
+A content tree can be packed into one file so the game opens, stats and
+reads a single file instead of every document separately. The archive is
+memory-mapped at runtime and file contents are served as slices of the
+mapping.
+
+Packing also does the work sessions would otherwise repeat on every open:
+each text file is wrapped to the widths the view uses on common terminals
+(LAYOUT_WIDTHS), and each image is decoded to raw RGBA pixels. At runtime
+a layout is two arrays cast straight from the mapping and an image is a
+surface over its mapped pixels, so neither is computed again.
+
+Layout: an 8-byte magic string, an 8-byte little-endian index length, the
+index as UTF-8 JSON, then the concatenated file data. The index is a
+nested tree; each node records its on-disk name and type, directories
+record their lock level and children, and files record the offset and
+length of their data relative to the start of the data section. Text
+files also map each width in "layouts" to the [offset, row count] of
+their row start offsets followed by their row end offsets, as
+little-endian 32-bit integers. Images record the [offset, width, height]
+of their RGBA pixels in "pixels". Every piece of data starts on a 4-byte
+boundary.
+
+Pack a tree with python archive.py 1documents 1documents.pak; the lock
+levels and display order come from manifest.json, or from the manifest
+named as a third argument.
+"""
+
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from manifest import MANIFEST_PATH, Manifest
+from media import load_pygame
+from layout import TextLayout
+from metrics import timed
+from model import ContentCache, Directory, TextFile, ImageFile
+
+MAGIC = b"TERMPAK1"
+_HEADER = struct.Struct("<8sQ")
+
+# Widths that text files are wrapped to when packing: what the view wraps to
+# on 80, 100, 120 and 132 column terminals, one less than the terminal
+LAYOUT_WIDTHS = (79, 99, 119, 131)
+
+# Prebuilt tables are little-endian, so other machines wrap at runtime
+_NATIVE_TABLES = sys.byteorder == "little"
+
+
+def _append(blobs, offset, data):
+    """
+    Add data to the data section, padded to a 4-byte boundary.
+
+    Args:
+        blobs (list): List that data is appended to.
+        offset (int): Offset in the data section for the next data.
+        data (bytes): The data to add.
+
+    Returns:
+        int: The offset for the next data.
+    """
+    blobs.append(data)
+    padding = -len(data) % 4
+    blobs.append(bytes(padding))
+    return offset + len(data) + padding
+
+
+def _layout_tables(text, width):
+    """
+    Wrap a text and encode its row offsets for the archive.
+
+    Args:
+        text (str): The text.
+        width (int): Number of characters per row.
+
+    Returns:
+        tuple: The row count, and the start offsets followed by the end
+            offsets as little-endian 32-bit integers.
+    """
+    starts, ends = TextLayout(text, width).offsets
+    table = array("I", starts)
+    table.extend(array("I", ends))
+    if sys.byteorder != "little":
+        table.byteswap()
+    return len(starts), table.tobytes()
+
+
+def _index_node(node, blobs, offset, widths):
+    """
+    Build the index entry for a node, collecting file data as it goes.
+
+    Args:
+        node (File): The node to index.
+        blobs (list): List that file data is appended to.
+        offset (int): Offset in the data section for the next file.
+        widths (tuple): Widths to prebuild text layouts for.
+
+    Returns:
+        tuple: The index entry and the offset for the next file.
+    """
+    entry = {"name": os.path.basename(node.path)}
+    if isinstance(node, Directory):
+        entry["type"] = "dir"
+        entry["lock"] = node.lock_level
+        entry["children"] = []
+        for child in node.contents:
+            child_entry, offset = _index_node(child, blobs, offset, widths)
+            entry["children"].append(child_entry)
+        return entry, offset
+
+    entry["type"] = "text" if isinstance(node, TextFile) else "image"
+    with open(node.path, "rb") as file_obj:
+        data = file_obj.read()
+    entry["offset"] = offset
+    entry["length"] = len(data)
+    offset = _append(blobs, offset, data)
+
+    if entry["type"] == "text":
+        text = data.decode("utf-8")
+        entry["layouts"] = {}
+        for width in widths:
+            rows, table = _layout_tables(text, width)
+            entry["layouts"][str(width)] = [offset, rows]
+            offset = _append(blobs, offset, table)
+    else:
+        pygame = load_pygame()
+        surface = pygame.image.load(io.BytesIO(data), entry["name"])
+        entry["pixels"] = [offset, *surface.get_size()]
+        offset = _append(blobs, offset, pygame.image.tobytes(surface, "RGBA"))
+    return entry, offset
+
+
+def pack(source, destination, manifest=None, widths=LAYOUT_WIDTHS):
+    """
+    Pack a content directory into an archive file.
+
+    Args:
+        source (str): Path to the content directory.
+        destination (str): Path of the archive to write.
+        manifest (Manifest): Lock levels and display order to record, or
+            None to leave every directory open and in name order.
+        widths (tuple): Terminal widths to prebuild text layouts for.
+    """
+    source = os.path.abspath(source)
+    root = Directory(
+        os.path.basename(source),
+        os.path.dirname(source),
+        ContentCache(),
+        manifest=manifest,
+    )
+    blobs = []
+    index, _ = _index_node(root, blobs, 0, widths)
+    index_bytes = json.dumps(index, separators=(",", ":")).encode("utf-8")
+    # Pad with whitespace so the data section starts on a 4-byte boundary
+    index_bytes += b" " * (-(_HEADER.size + len(index_bytes)) % 4)
+    with open(destination, "wb") as file_obj:
+        file_obj.write(_HEADER.pack(MAGIC, len(index_bytes)))
+        file_obj.write(index_bytes)
+        for data in blobs:
+            file_obj.write(data)
+
+
+class Archive:
+    """
+    A memory-mapped content archive.
+    """
+
+    def __init__(self, path):
+        """
+        Open and map an archive and read its index.
+
+        Args:
+            path (str): Path to the archive file.
+
+        Raises:
+            ValueError: If the file is not a content archive.
+        """
+        self._path = os.path.abspath(path)
+        with open(self._path, "rb") as file_obj:
+            self._map = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_length = _HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a content archive")
+        index_start = _HEADER.size
+        self._data_start = index_start + index_length
+        self._index = json.loads(
+            str(self._map[index_start : self._data_start], "utf-8")
+        )
+        self._view = memoryview(self._map)
+
+    @property
+    def path(self):
+        """
+        Retrieve the archive's path.
+
+        Returns:
+            str: Absolute path to the archive file.
+        """
+        return self._path
+
+    def data(self, entry):
+        """
+        Return a file's data as a zero-copy slice of the mapping.
+
+        Args:
+            entry (dict): Index entry of a file.
+
+        Returns:
+            memoryview: The file's bytes.
+        """
+        return self.slice(entry["offset"], entry["length"])
+
+    def slice(self, offset, length):
+        """
+        Return part of the data section without copying it.
+
+        Args:
+            offset (int): Offset from the start of the data section.
+            length (int): Number of bytes.
+
+        Returns:
+            memoryview: The bytes.
+        """
+        start = self._data_start + offset
+        return self._view[start : start + length]
+
+    def root(self, cache=None):
+        """
+        Create the root directory node of the archived tree.
+
+        Args:
+            cache (ContentCache): Cache for lazy loading, or None to load
+                the whole tree immediately.
+
+        Returns:
+            ArchiveDirectory: The root directory.
+        """
+        return ArchiveDirectory(self, self._index, cache)
+
+    def close(self):
+        """
+        Release the mapping. Nodes must not be used afterwards.
+        """
+        self._view.release()
+        self._map.close()
+
+
+class ArchiveTextFile(TextFile):
+    """
+    A text file served from an archive.
+    """
+
+    __slots__ = ("_archive", "_entry")
+
+    def __init__(self, archive, entry, cache=None, parent=None):
+        """
+        Create a text file node from its index entry.
+
+        Args:
+            archive (Archive): The archive holding the file.
+            entry (dict): Index entry of the file.
+            cache (ContentCache): Cache for lazy loading, or None.
+            parent (ArchiveDirectory): Directory holding the node, or None.
+        """
+        self._archive = archive
+        self._entry = entry
+        super().__init__(entry["name"], archive.path, cache, parent=parent)
+
+    @property
+    def raw(self):
+        """
+        Retrieve the file's bytes without copying them.
+
+        Returns:
+            memoryview: The undecoded file data.
+        """
+        return self._archive.data(self._entry)
+
+    @timed("tree.read_text")
+    def load(self):
+        """
+        Decode the text straight from the mapped archive.
+
+        Returns:
+            str: Contents of the file.
+        """
+        return str(self.raw, "utf-8")
+
+    def prebuilt_layout(self, width):
+        """
+        Return the file's layout for a width from the archive, if it was
+        wrapped to that width when packing.
+
+        Args:
+            width (int): Number of characters per row.
+
+        Returns:
+            TextLayout: The layout, or None to wrap the text when needed.
+        """
+        table = self._entry.get("layouts", {}).get(str(width))
+        if table is None or not _NATIVE_TABLES:
+            return None
+        offset, rows = table
+        offsets = self._archive.slice(offset, 8 * rows).cast("I")
+        return TextLayout.from_offsets(
+            self.contents, width, offsets[:rows], offsets[rows:]
+        )
+
+
+class ArchiveImageFile(ImageFile):
+    """
+    An image file served from an archive.
+    """
+
+    __slots__ = ("_archive", "_entry")
+
+    def __init__(self, archive, entry, cache=None, parent=None):
+        """
+        Create an image file node from its index entry.
+
+        Args:
+            archive (Archive): The archive holding the file.
+            entry (dict): Index entry of the file.
+            cache (ContentCache): Cache for lazy loading, or None.
+            parent (ArchiveDirectory): Directory holding the node, or None.
+        """
+        self._archive = archive
+        self._entry = entry
+        super().__init__(entry["name"], archive.path, cache, parent=parent)
+
+    @property
+    def raw(self):
+        """
+        Retrieve the encoded image bytes without copying them.
+
+        Returns:
+            memoryview: The PNG data.
+        """
+        return self._archive.data(self._entry)
+
+    @timed("tree.decode_image")
+    def load(self):
+        """
+        Load the image from the mapped archive, using the pixels decoded
+        when packing if there are any.
+
+        Returns:
+            pygame.Surface: The decoded image.
+        """
+        pygame = load_pygame()
+        if "pixels" in self._entry:
+            offset, width, height = self._entry["pixels"]
+            pixels = self._archive.slice(offset, 4 * width * height)
+            return pygame.image.frombuffer(pixels, (width, height), "RGBA")
+        return pygame.image.load(io.BytesIO(self.raw), self._entry["name"])
+
+
+class ArchiveDirectory(Directory):
+    """
+    A directory served from an archive.
+    """
+
+    __slots__ = ("_archive", "_entry")
+
+    def __init__(self, archive, entry, cache=None, parent=None):
+        """
+        Create a directory node from its index entry.
+
+        Args:
+            archive (Archive): The archive holding the directory.
+            entry (dict): Index entry of the directory.
+            cache (ContentCache): Cache for lazy loading, or None.
+            parent (ArchiveDirectory): Directory holding the node, or None.
+        """
+        self._archive = archive
+        self._entry = entry
+        super().__init__(entry["name"], archive.path, cache, parent=parent)
+        self._lock_level = entry["lock"]
+
+    @timed("tree.list_directory")
+    def load(self):
+        """
+        Create a node for each child listed in the index.
+
+        Returns:
+            list: File and Directory objects in name order.
+        """
+        node_classes = {
+            "text": ArchiveTextFile,
+            "image": ArchiveImageFile,
+            "dir": ArchiveDirectory,
+        }
+        return [
+            node_classes[child["type"]](self._archive, child, self._cache, self)
+            for child in self._entry["children"]
+        ]
+
+
+if __name__ == "__main__":
+    pack(
+        sys.argv[1],
+        sys.argv[2],
+        Manifest.load(sys.argv[3] if len(sys.argv) > 3 else MANIFEST_PATH),
+    )
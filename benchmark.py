@@ -0,0 +1,989 @@
+"""
+Performance benchmarks for the game.
+
+Each benchmark is a function named bench_<name> that prints its results.
+Run all of them with python benchmark.py, or pick some by name, e.g.
+python benchmark.py cold_start.
+"""
+
+import asyncio
+import curses
+import gc
+import itertools
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
+from time import perf_counter, process_time, sleep
+import pygame
+import metrics
+import model
+from archive import Archive, pack
+from controller import Controller
+from events import KeyEventLoop
+from headless import HeadlessGame
+from preview import PreviewCache, render_preview
+from manifest import Manifest
+from model import (
+    ContentCache,
+    Directory,
+    ImageFile,
+    Model,
+    TextFile,
+    check_password,
+    hash_password,
+    load_tree,
+)
+from saves import SaveStore
+from screen import VirtualScreen
+from search import SearchIndex
+from server import GameServer
+from view import View
+from watcher import ContentWatcher
+
+
+def make_synthetic_tree(path, dirs=50, files_per_dir=40, text_size=4096):
+    """
+    Write a synthetic content tree for benchmarking.
+
+    Every directory holds text files plus one small image.
+
+    Args:
+        path (str): Directory to create the tree in.
+        dirs (int): Number of subdirectories.
+        files_per_dir (int): Number of text files per subdirectory.
+        text_size (int): Approximate size of each text file in bytes.
+
+    Returns:
+        str: Name of the root directory created inside path.
+    """
+    line = "the quick brown fox jumps over the lazy dog " * 2 + "\n"
+    text = line * (text_size // len(line) + 1)
+    image = pygame.Surface((64, 64))
+    image.fill((40, 80, 120))
+    for dir_index in range(1, dirs + 1):
+        folder = os.path.join(path, "1synthetic", f"1folder{dir_index:05d}")
+        os.makedirs(folder)
+        for file_index in range(1, files_per_dir + 1):
+            name = os.path.join(folder, f"1note{file_index:05d}.txt")
+            with open(name, "w", encoding="utf-8") as file_obj:
+                file_obj.write(text)
+        pygame.image.save(image, os.path.join(folder, "2image.png"))
+    return "1synthetic"
+
+
+def best_of(function, repeat=5):
+    """
+    Time a function several times and return the fastest run.
+
+    Args:
+        function (callable): Function taking no arguments.
+        repeat (int): Number of runs.
+
+    Returns:
+        float: Fastest run time in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def bench_cold_start():
+    """
+    Compare serial and thread-pool loading of a full content tree.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        root = make_synthetic_tree(tmp)
+        serial = best_of(lambda: Directory(root, tmp))
+        parallel = best_of(lambda: load_tree(root, tmp))
+    print(f"cold_start serial:   {serial * 1000:8.1f} ms")
+    print(f"cold_start parallel: {parallel * 1000:8.1f} ms")
+
+
+class PipeKeys:
+    """
+    Key source reading single characters from a pipe, like getkey does.
+    """
+
+    def __init__(self):
+        """
+        Create the pipe.
+        """
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.read_fd, False)
+
+    def nodelay(self, flag):
+        """
+        Accept the nodelay call made by KeyEventLoop; reads never block.
+
+        Args:
+            flag (bool): Ignored.
+        """
+
+    def getkey(self):
+        """
+        Read one waiting key.
+
+        Returns:
+            str: The key.
+
+        Raises:
+            curses.error: If no key is waiting.
+        """
+        try:
+            data = os.read(self.read_fd, 1)
+        except BlockingIOError as error:
+            raise curses.error("no input") from error
+        return data.decode()
+
+    def close(self):
+        """
+        Close both ends of the pipe.
+        """
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+def _poll_loop(keys, dispatch):
+    """
+    Read keys the way the game used to: try a read, then sleep 2 ms.
+
+    Args:
+        keys (PipeKeys): Key source.
+        dispatch (callable): Called with each key; returns False to stop.
+    """
+    while True:
+        try:
+            if not dispatch(keys.getkey()):
+                return
+        except curses.error:
+            pass
+        sleep(0.002)
+
+
+def _measure_input_loop(run_loop, presses=200, idle=1.0):
+    """
+    Measure idle CPU use and key-to-dispatch latency of an input loop.
+
+    Args:
+        run_loop (callable): Runs a loop given a key source and dispatcher.
+        presses (int): Number of keys to time.
+        idle (float): Seconds to stay idle while measuring CPU use.
+
+    Returns:
+        tuple: CPU seconds used per idle second, and mean latency.
+    """
+    keys = PipeKeys()
+    received = threading.Event()
+    latencies = []
+    sent_at = [0.0]
+
+    def dispatch(key):
+        latencies.append(perf_counter() - sent_at[0])
+        received.set()
+        return key != "q"
+
+    thread = threading.Thread(target=run_loop, args=(keys, dispatch))
+    thread.start()
+    cpu_start = process_time()
+    sleep(idle)
+    idle_cpu = (process_time() - cpu_start) / idle
+    for index in range(presses):
+        received.clear()
+        sent_at[0] = perf_counter()
+        os.write(keys.write_fd, b"q" if index == presses - 1 else b"x")
+        received.wait()
+        sleep(0.001)
+    thread.join()
+    keys.close()
+    return idle_cpu, sum(latencies) / len(latencies)
+
+
+def bench_input_loop():
+    """
+    Compare the old sleep-polling input loop with KeyEventLoop.
+    """
+    loops = {
+        "poll": _poll_loop,
+        "event": (
+            lambda keys, dispatch: KeyEventLoop(keys, keys.read_fd).run(
+                dispatch
+            )
+        ),
+    }
+    for name, run_loop in loops.items():
+        idle_cpu, latency = _measure_input_loop(run_loop)
+        print(
+            f"input_loop {name:5}: idle CPU {idle_cpu * 100:5.1f}%, "
+            f"latency {latency * 1e6:7.1f} us"
+        )
+
+
+async def _read_until(reader, marker):
+    """
+    Read a session's output until a screen containing marker arrives.
+
+    Args:
+        reader (asyncio.StreamReader): Session output.
+        marker (bytes): Text that only the expected screen contains.
+    """
+    output = b""
+    while marker not in output:
+        output += await reader.read(4096)
+
+
+async def _drive_sessions(path, count, steps):
+    """
+    Connect players to a server and browse in every session at once.
+
+    Args:
+        path (str): Unix socket path of the server.
+        count (int): Number of players.
+        steps (int): Number of open-and-close round trips per player.
+
+    Returns:
+        tuple: Open connections, and the time taken to run every step.
+    """
+    connections = []
+    for _ in range(count):
+        reader, writer = await asyncio.open_unix_connection(path)
+        await _read_until(reader, b"work_documents/")
+        connections.append((reader, writer))
+
+    async def browse(reader, writer):
+        for _ in range(steps):
+            writer.write(b"1")
+            await _read_until(reader, b"email_log/")
+            writer.write(b"q")
+            await _read_until(reader, b"work_documents/")
+
+    start = perf_counter()
+    await asyncio.gather(*(browse(*pair) for pair in connections))
+    return connections, perf_counter() - start
+
+
+def bench_server_sessions(count=300, steps=20):
+    """
+    Load-test the multi-session server over a local Unix socket.
+
+    Args:
+        count (int): Number of simulated players.
+        steps (int): Number of round trips of three keys per player.
+    """
+
+    async def scenario(tmp):
+        game = GameServer(load_tree("1documents"))
+        path = os.path.join(tmp, "game.sock")
+        server = await game.start(unix_path=path)
+        async with server:
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            connections, elapsed = await _drive_sessions(path, count, steps)
+            # Count only what the sessions hold, not the client side
+            client_memory = tracemalloc.get_traced_memory()[0]
+            for _, writer in connections:
+                writer.write(b"\x04")
+                writer.close()
+            await asyncio.sleep(0.2)
+            after = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+        return elapsed, (client_memory - after) or (client_memory - before)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        elapsed, memory = asyncio.run(scenario(tmp))
+    keys = count * steps * 3
+    print(f"server_sessions: {count} sessions, {keys} keys")
+    print(f"server_sessions: {keys / elapsed:8.0f} keys/s")
+    print(f"server_sessions: {memory / count / 1024:8.1f} KB per session")
+
+
+def _legacy_image_viewer(file):
+    """
+    Show an image the way the game used to: decode, spin, then quit pygame.
+
+    Args:
+        file (ImageFile): The image.
+    """
+    image = file.load()
+    screen = pygame.display.set_mode(image.get_size())
+    screen.blit(image.convert(), (0, 0))
+    pygame.display.flip()
+    status = True
+    while status:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                status = False
+    pygame.quit()
+
+
+def _time_image_viewer(show, file, idle=0.5):
+    """
+    Measure how long an image viewer takes to open and its idle CPU use.
+
+    Args:
+        show (callable): Viewer taking the image.
+        file (ImageFile): The image.
+        idle (float): Seconds to leave the viewer open while measuring CPU.
+
+    Returns:
+        tuple: Open time in seconds and CPU seconds per idle second.
+    """
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    # A queued QUIT closes the viewer as soon as it starts waiting
+    pygame.event.post(pygame.event.Event(pygame.QUIT))
+    start = perf_counter()
+    show(file)
+    open_time = perf_counter() - start
+
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    pygame.time.set_timer(pygame.QUIT, int(idle * 1000), loops=1)
+    cpu_start, start = process_time(), perf_counter()
+    show(file)
+    idle_cpu = (process_time() - cpu_start) / (perf_counter() - start)
+    return open_time, idle_cpu
+
+
+def bench_image_viewer():
+    """
+    Compare the old spinning image viewer with View.display_image_file.
+
+    Runs on SDL's dummy video driver, so no window is needed.
+    """
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    root = Directory("1documents", os.getcwd(), ContentCache())
+    file = root.contents[0].contents[3].contents[1]
+    assert isinstance(file, ImageFile)
+    view = View(VirtualScreen(), None, Model())
+    viewers = {
+        "legacy": _legacy_image_viewer,
+        "view": lambda image: view.display_image_file(image, [image]),
+    }
+    for name, show in viewers.items():
+        open_time, idle_cpu = _time_image_viewer(show, file)
+        print(
+            f"image_viewer {name:6}: open {open_time * 1000:6.1f} ms, "
+            f"idle CPU {idle_cpu * 100:5.1f}%"
+        )
+
+
+def bench_search(dirs=250, files_per_dir=40):
+    """
+    Time building and querying a search index over a large synthetic tree.
+
+    Args:
+        dirs (int): Number of synthetic directories.
+        files_per_dir (int): Number of text files in each.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        root_name = make_synthetic_tree(tmp, dirs, files_per_dir, 1024)
+        root = Directory(root_name, tmp, ContentCache())
+        index = SearchIndex(root)
+        start = perf_counter()
+        count = index.document_count
+        build = perf_counter() - start
+        query = best_of(lambda: index.search("lazy fox", 1), repeat=20)
+    print(f"search: indexed {count} files in {build * 1000:8.1f} ms")
+    print(f"search: query in {query * 1000:8.3f} ms")
+
+
+def bench_screen_updates():
+    """
+    Count bytes sent to the terminal per key, with and without diffing.
+
+    The full-repaint run invalidates the screen before every key, which is
+    what clearing the screen on every navigation used to cost.
+    """
+    scripts = {
+        "browse": ["1", "1", "q", "4", "q", "q"] * 10,
+        "read": ["1", "2", "KEY_DOWN", "KEY_NPAGE", "q", "q"] * 10,
+    }
+    root = load_tree("1documents")
+    for (name, repaint), (script, keys) in itertools.product(
+        (("full", True), ("diff", False)), scripts.items()
+    ):
+        written = []
+        screen = VirtualScreen(24, 80, lambda data: written.append(len(data)))
+        model = Model()
+        controller = Controller(screen, model)
+        view = View(screen, controller, model, image_window=False)
+        controller.start(view, root)
+        written.clear()
+        for key in keys:
+            if repaint:
+                view.invalidate()
+            controller.handle_key(key)
+        print(
+            f"screen_updates {script:6} {name}: "
+            f"{sum(written) / len(keys):7.0f} bytes per key"
+        )
+
+
+class _DictNode:  # pylint: disable=too-few-public-methods
+    """
+    Content node stored the way File was before it used __slots__.
+    """
+
+    def __init__(self, name, path, cache=None, parent=None):
+        """
+        Set the same attributes as File.__init__.
+
+        Args:
+            name (str): File name with a prepended identifier character.
+            path (str): Path to the file's directory.
+            cache (ContentCache): Cache the node would load through.
+            parent (_DictNode): Directory holding the node, or None.
+        """
+        self._name = name[1:]
+        self._path = os.path.join(path, name)
+        self._cache = cache
+        self._executor = None
+        self._parent = parent
+        self._display_path = None
+        self._contents = None
+
+
+class _DictDirectory(_DictNode):  # pylint: disable=too-few-public-methods
+    """
+    Directory node stored the way Directory was before it used __slots__.
+    """
+
+    def __init__(self, name, path, cache=None, parent=None):
+        """
+        Set the same attributes as Directory.__init__.
+
+        Args:
+            name (str): Name of the directory.
+            path (str): Path to the parent directory.
+            cache (ContentCache): Cache the node would load through.
+            parent (_DictNode): Directory holding the node, or None.
+        """
+        super().__init__(name, path, cache, parent)
+        self._lock_level = 1
+
+
+def _build_nodes(directory_class, file_class, dirs, files_per_dir):
+    """
+    Create the nodes of a lazy content tree without touching the disk.
+
+    Args:
+        directory_class (type): Class used for directories.
+        file_class (type): Class used for files.
+        dirs (int): Number of subdirectories.
+        files_per_dir (int): Number of files per subdirectory.
+
+    Returns:
+        list: Every node created.
+    """
+    cache = ContentCache()
+    root = directory_class("1synthetic", "/bench", cache)
+    nodes = [root]
+    for dir_index in range(dirs):
+        name = f"1folder{dir_index:05d}"
+        folder = directory_class(name, "/bench/1synthetic", cache, parent=root)
+        nodes.append(folder)
+        folder_path = f"/bench/1synthetic/{name}"
+        for file_index in range(files_per_dir):
+            nodes.append(
+                file_class(
+                    f"1note{file_index:05d}.txt",
+                    folder_path,
+                    cache,
+                    parent=folder,
+                )
+            )
+    return nodes
+
+
+def bench_node_memory(dirs=1000, files_per_dir=99):
+    """
+    Compare the memory used by slotted nodes and dict-backed nodes.
+
+    The default tree has 100,001 nodes. Memory is measured with tracemalloc
+    and includes the name and path strings, which both layouts share.
+
+    Args:
+        dirs (int): Number of subdirectories.
+        files_per_dir (int): Number of files per subdirectory.
+    """
+    layouts = {
+        "dict": (_DictDirectory, _DictNode),
+        "slots": (Directory, TextFile),
+    }
+    for name, (directory_class, file_class) in layouts.items():
+        tracemalloc.start()
+        nodes = _build_nodes(directory_class, file_class, dirs, files_per_dir)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(
+            f"node_memory {name:5}: {len(nodes)} nodes, "
+            f"{size / 2**20:6.1f} MiB, {size / len(nodes):5.0f} bytes per node"
+        )
+        del nodes
+
+
+def bench_passwords():
+    """
+    Time password verification at several work factors, and the cost of
+    checked and throttled attempts.
+    """
+    for iterations in (50_000, 100_000, 200_000):
+        encoded = hash_password("vires_in_silentio", iterations)
+        check = best_of(lambda: check_password("guess", encoded), repeat=3)
+        print(f"passwords {iterations:7} iterations: {check * 1000:6.1f} ms")
+
+    model = Model({2: hash_password("vires_in_silentio")}, clock=lambda: 0.0)
+    first = best_of(lambda: model.verify_password(2, "guess"), repeat=3)
+    throttled = best_of(lambda: model.verify_password(2, "other"), repeat=20)
+    print(f"passwords checked attempt:   {first * 1000:9.3f} ms")
+    print(f"passwords throttled attempt: {throttled * 1000:9.3f} ms")
+
+
+def bench_saves(players=1000):
+    """
+    Time resuming saved players and the cost of saving on each key.
+
+    Args:
+        players (int): Number of saved players to resume.
+    """
+    root = load_tree("1documents")
+    keys = ["1", "1", "q", "4", "q", "q"] * 50
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "saves.db")
+        store = SaveStore(path)
+        for player in range(players):
+            store.save(f"player{player}", 1, (0, 3))
+        store.close()
+
+        store = SaveStore(path)
+        resume = 0.0
+        for player in range(players):
+            model = Model()
+            model.set_player_name(f"player{player}")
+            screen = VirtualScreen()
+            controller = Controller(screen, model)
+            view = View(screen, controller, model, image_window=False)
+            start = perf_counter()
+            controller.start(view, root, saves=store)
+            resume += perf_counter() - start
+        print(f"saves resume: {resume / players * 1000:7.3f} ms per player")
+
+        for name, saves in (("without saves", None), ("with saves", store)):
+            model = Model()
+            screen = VirtualScreen()
+            controller = Controller(screen, model)
+            view = View(screen, controller, model, image_window=False)
+            controller.start(view, root, saves=saves)
+            start = perf_counter()
+            for key in keys:
+                controller.handle_key(key)
+            per_key = (perf_counter() - start) / len(keys)
+            print(f"saves key {name:13}: {per_key * 1000:7.3f} ms per key")
+        store.close()
+
+
+def _per_press(game, open_keys, close_keys, repeat=200):
+    """
+    Time opening a screen and closing it again, many times over.
+
+    Args:
+        game (HeadlessGame): Game showing the screen to open from.
+        open_keys (list): Keys that open the screen.
+        close_keys (list): Keys that return to where the game started.
+        repeat (int): Number of times to open the screen.
+
+    Returns:
+        float: Average seconds per open.
+    """
+    total = 0.0
+    for _ in range(repeat):
+        start = perf_counter()
+        game.press(*open_keys)
+        total += perf_counter() - start
+        game.press(*close_keys)
+    return total / repeat
+
+
+def bench_sessions(sessions=100):
+    """
+    Measure startup, open latency, scrolling and memory of headless games.
+
+    Runs on the bundled documents and on a large synthetic tree, as a
+    baseline for performance work. Every directory and file is opened by
+    typing its number and pressing Enter, which works for any listing.
+
+    Args:
+        sessions (int): Number of games created to measure memory.
+    """
+    manifest = Manifest.load()
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic = make_synthetic_tree(
+            tmp, dirs=200, files_per_dir=50, text_size=200_000
+        )
+        # Each tree with the keys opening a text file in its first directory
+        trees = {
+            "bundled": (
+                load_tree(
+                    os.path.basename(manifest.root),
+                    os.path.dirname(manifest.root),
+                    manifest=manifest,
+                ),
+                ["2", "\n"],
+            ),
+            "synthetic": (load_tree(synthetic, tmp), ["1", "\n"]),
+        }
+        for name, (root, text_keys) in trees.items():
+            startup = best_of(lambda root=root: HeadlessGame(root), repeat=20)
+            game = HeadlessGame(root)
+            open_dir = _per_press(game, ["1", "\n"], ["q"])
+            game.press("1", "\n")
+            open_text = _per_press(game, text_keys, ["q"])
+
+            # Scroll through the text file, a line at a time
+            game.press(*text_keys)
+            keys = ["KEY_DOWN", "KEY_UP"] * 1000
+            start = perf_counter()
+            game.press(*keys)
+            scroll = len(keys) / (perf_counter() - start)
+
+            tracemalloc.start()
+            games = [HeadlessGame(root) for _ in range(sessions)]
+            for each in games:
+                each.press("1", "\n", *text_keys)
+            memory = tracemalloc.get_traced_memory()[0] / sessions
+            tracemalloc.stop()
+            del games
+
+            print(f"sessions {name:9} startup:   {startup * 1000:8.3f} ms")
+            print(f"sessions {name:9} open dir:  {open_dir * 1000:8.3f} ms")
+            print(f"sessions {name:9} open text: {open_text * 1000:8.3f} ms")
+            print(f"sessions {name:9} scroll:    {scroll:8.0f} keys/s")
+            print(f"sessions {name:9} memory:    {memory / 1024:8.1f} KiB each")
+
+
+def bench_streaming(megabytes=100):
+    """
+    Compare opening and paging a large log read whole and streamed.
+
+    Args:
+        megabytes (int): Approximate size of the log file.
+    """
+    threshold = model.STREAMING_THRESHOLD
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "1logs"))
+        line = "2024-01-01 00:00:00 INFO request handled in 12 ms " * 2 + "\n"
+        with open(
+            os.path.join(tmp, "1logs", "1server.txt"), "w", encoding="utf-8"
+        ) as file_obj:
+            file_obj.write(line * (megabytes * 1024 * 1024 // len(line)))
+        for name, limit in (("whole", float("inf")), ("streamed", 0)):
+            model.STREAMING_THRESHOLD = limit
+            try:
+                game = HeadlessGame(load_tree("1logs", tmp))
+            finally:
+                model.STREAMING_THRESHOLD = threshold
+            tracemalloc.start()
+            start = perf_counter()
+            game.play("1")
+            first_paint = perf_counter() - start
+            memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            page_down = best_of(lambda game=game: game.play("PGDN"), repeat=50)
+            start = perf_counter()
+            game.play("END")
+            end = perf_counter() - start
+            print(
+                f"streaming {name:8} first paint: {first_paint * 1000:9.3f} ms"
+            )
+            print(f"streaming {name:8} peak memory: {memory / 2**20:9.1f} MiB")
+            print(f"streaming {name:8} page down:   {page_down * 1000:9.3f} ms")
+            print(f"streaming {name:8} end:         {end * 1000:9.3f} ms")
+            del game
+
+
+def bench_watch(dirs=200, files_per_dir=50):
+    """
+    Compare reloading one changed file with reloading the whole tree.
+
+    Args:
+        dirs (int): Number of directories in the synthetic tree.
+        files_per_dir (int): Number of text files in each directory.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        name = make_synthetic_tree(tmp, dirs, files_per_dir)
+        full = best_of(lambda: load_tree(name, tmp), repeat=3)
+        root = load_tree(name, tmp)
+        watcher = ContentWatcher(root)
+        idle = best_of(watcher.poll, repeat=5)
+
+        changed = os.path.join(
+            tmp, name, "1folder00001", f"1note{files_per_dir:05d}.txt"
+        )
+        mtime_ns = os.stat(changed).st_mtime_ns
+        reloads = []
+        for run in range(5):
+            with open(changed, "a", encoding="utf-8") as file_obj:
+                file_obj.write("more\n")
+            os.utime(changed, ns=(mtime_ns, mtime_ns + run + 1))
+            start = perf_counter()
+            directories = watcher.poll()
+            reloads.append(perf_counter() - start)
+            assert len(directories) == 1
+        print(f"watch full reload:     {full * 1000:9.3f} ms")
+        print(f"watch poll, no change: {idle * 1000:9.3f} ms")
+        print(f"watch poll, one file:  {min(reloads) * 1000:9.3f} ms")
+
+
+def bench_bundle(dirs=20, files_per_dir=20, text_size=200_000):
+    """
+    Compare the per-open work of loose files and of a packed archive, whose
+    text is wrapped and images decoded when packing. Text files are opened
+    through an 80-column game, the way a player opens them.
+
+    Args:
+        dirs (int): Number of directories in the synthetic tree.
+        files_per_dir (int): Number of text files in each directory.
+        text_size (int): Approximate size of each text file in bytes.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        name = make_synthetic_tree(tmp, dirs, files_per_dir, text_size)
+        path = os.path.join(tmp, "content.pak")
+        start = perf_counter()
+        pack(os.path.join(tmp, name), path)
+        build = perf_counter() - start
+        archive = Archive(path)
+        trees = {"loose": load_tree(name, tmp), "packed": archive.root()}
+        print(f"bundle build: {build * 1000:9.1f} ms")
+        for tree, root in trees.items():
+            folder = root.contents[0]
+            numbers = [
+                str(number)
+                for number, node in enumerate(folder.contents, start=1)
+                if isinstance(node, TextFile)
+            ]
+            images = [
+                node
+                for folder in root.contents
+                for node in folder.contents
+                if isinstance(node, ImageFile)
+            ]
+            # Open each text file of the first folder in an 80-column game,
+            # with a fresh layout cache per run as a new session would have
+            opens = []
+            for _ in range(3):
+                game = HeadlessGame(root)
+                game.press("1", "\n")
+                total = 0.0
+                for number in numbers:
+                    start = perf_counter()
+                    game.press(*number, "\n")
+                    total += perf_counter() - start
+                    game.press("q")
+                opens.append(total / len(numbers))
+            open_text = min(opens)
+            decode = best_of(
+                lambda images=images: [image.load() for image in images],
+                repeat=3,
+            ) / len(images)
+            print(f"bundle {tree:6} open text:    {open_text * 1e6:9.1f} us")
+            print(f"bundle {tree:6} decode image: {decode * 1e6:9.1f} us")
+        # Games hold views of the archive in reference cycles
+        del trees, game
+        gc.collect()
+        archive.close()
+
+
+def bench_preview(repeat=5):
+    """
+    Time drawing images in the terminal: rendering the bundled PNGs and
+    large images, fetching a cached render, and opening one in a session.
+
+    Args:
+        repeat (int): Number of runs; the fastest is reported.
+    """
+    images = {
+        os.path.basename(path): pygame.image.load(path)
+        for path in [
+            os.path.join(
+                "1documents", "1work_documents", "4diary", "2sunrise.png"
+            ),
+            os.path.join("1documents", "2archive", "1diary_cont", "2note.png"),
+        ]
+    }
+    gradient = pygame.Surface((4000, 3000))
+    for x in range(0, 4000, 40):
+        gradient.fill(
+            (x * 255 // 4000, 128, 255 - x * 255 // 4000), (x, 0, 40, 3000)
+        )
+    images["gradient 4000x3000"] = gradient
+    images["noise 2000x1500"] = pygame.image.frombuffer(
+        os.urandom(2000 * 1500 * 3), (2000, 1500), "RGB"
+    )
+    for name, surface in images.items():
+        for cols, rows in [(79, 22), (199, 58)]:
+            render = best_of(
+                lambda surface=surface, cols=cols, rows=rows: render_preview(
+                    surface, cols, rows, 256
+                ),
+                repeat,
+            )
+            size = f"{cols + 1}x{rows + 2}"
+            print(f"preview {name:20} {size:7}: {render * 1000:8.3f} ms")
+
+    game = HeadlessGame(load_tree("1documents"), previews=PreviewCache())
+    game.play("1 4 ENTER")
+    first = best_of(lambda: game.play("2"), repeat=1)
+    game.play("q")
+    cached = best_of(lambda: game.play("2 q"), repeat=50)
+    print(f"preview open in session, first:  {first * 1000:8.3f} ms")
+    print(f"preview open and close, cached:  {cached * 1000:8.3f} ms")
+
+
+def bench_resize(megabytes=50):
+    """
+    Time resizing the terminal while reading a small and a large file, to
+    a width not seen before and back to one whose wrapping is cached.
+
+    Args:
+        megabytes (int): Approximate size of the large file.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "1docs"))
+        line = "2024-01-01 00:00:00 INFO request handled in 12 ms " * 2 + "\n"
+        sizes = {"1small.txt": 4096, "2large.txt": megabytes * 1024 * 1024}
+        for name, size in sizes.items():
+            with open(
+                os.path.join(tmp, "1docs", name), "w", encoding="utf-8"
+            ) as file_obj:
+                file_obj.write(line * (size // len(line)))
+        for number, name in (("1", "small"), ("2", "large")):
+            game = HeadlessGame(load_tree("1docs", tmp))
+            game.play(number + " PGDN")
+            widths = itertools.count(60)
+            new_width = best_of(
+                lambda game=game: game.resize(24, next(widths)), repeat=20
+            )
+            game.resize(24, 80)
+            cached = best_of(
+                lambda game=game: (game.resize(30, 80), game.resize(24, 80)),
+                repeat=20,
+            )
+            print(
+                f"resize {name:5} to a new width:    {new_width * 1000:8.3f} ms"
+            )
+            print(
+                f"resize {name:5} to a cached width:"
+                f" {cached / 2 * 1000:8.3f} ms"
+            )
+
+
+def bench_metrics(calls=200_000):
+    """
+    Measure what the instrumentation costs when disabled and enabled.
+
+    Args:
+        calls (int): Number of calls to time a trivial function with.
+    """
+
+    def plain():
+        return None
+
+    instrumented = metrics.timed("bench.plain")(plain)
+    base = best_of(lambda: [plain() for _ in range(calls)], repeat=3)
+    off = best_of(lambda: [instrumented() for _ in range(calls)], repeat=3)
+    with metrics.recording(metrics.Recorder()):
+        on = best_of(lambda: [instrumented() for _ in range(calls)], repeat=3)
+    print(
+        f"metrics overhead disabled: {(off - base) / calls * 1e9:6.0f} ns/call"
+    )
+    print(
+        f"metrics overhead enabled:  {(on - base) / calls * 1e9:6.0f} ns/call"
+    )
+
+    game = HeadlessGame(load_tree("1documents"))
+    game.play("1 4 ENTER 1")
+    keys = ["KEY_DOWN", "KEY_UP"] * 2000
+    off = best_of(lambda: game.press(*keys), repeat=3)
+    with metrics.recording(metrics.Recorder()):
+        on = best_of(lambda: game.press(*keys), repeat=3)
+    print(f"metrics per key disabled: {off / len(keys) * 1e6:8.2f} us")
+    print(f"metrics per key enabled:  {on / len(keys) * 1e6:8.2f} us")
+
+
+def _import_time(statement):
+    """
+    Measure the import time of a statement with python -X importtime.
+
+    Args:
+        statement (str): Python code doing the imports.
+
+    Returns:
+        tuple: Total microseconds spent importing, and the number of modules
+            imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        check=True,
+        text=True,
+        env=dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1"),
+    )
+    total = 0
+    modules = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        modules += 1
+        # Top-level imports are not indented; they include their children
+        if not name.startswith("  "):
+            total += int(cumulative)
+    return total, modules
+
+
+def bench_startup(repeat=5):
+    """
+    Compare import time with pygame deferred and with it imported up front.
+
+    Args:
+        repeat (int): Number of runs; the fastest is reported.
+    """
+    statements = {
+        "text-only": "import main",
+        "with pygame": "import pygame; import main",
+    }
+    for name, statement in statements.items():
+        runs = [_import_time(statement) for _ in range(repeat)]
+        total, modules = min(runs)
+        print(
+            f"startup {name:11}: {total / 1000:7.1f} ms importing "
+            f"{modules} modules"
+        )
+
+
+def main(names):
+    """
+    Run the named benchmarks, or all of them if none are named.
+
+    Args:
+        names (list): Benchmark names without the bench_ prefix.
+    """
+    benchmarks = {
+        name[len("bench_") :]: function
+        for name, function in globals().items()
+        if name.startswith("bench_")
+    }
+    for name in names or benchmarks:
+        benchmarks[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,49 +2,376 @@
 Controller module for handling user input in a curses-based interface.
 """
 
-from time import sleep
+import functools
+from metrics import timed
+from model import Directory, TextFile
+from navigation import NavigationStack
 
 
 class Controller:
     """
     Handles key input and password entry using a curses stdscr object.
+
+    Keys are handed to handle_key one at a time, which routes them to the
+    screen that is currently open: a directory listing, a text file, a
+    password prompt, or the search prompt and its results. KEY_RESIZE,
+    which curses sends when the terminal changes size, redraws whichever
+    screen is open.
     """
 
-    def __init__(self, stdscr, model):
+    def __init__(self, stdscr, model, run_blocking=None):
         """
         Initialize the Controller.
 
         Args:
             stdscr (curses.window): The curses standard screen object.
             model (object): A model instance for managing game state.
+            run_blocking (callable): Runs a slow function, such as checking
+                a password, off the thread keys are handled on. It returns
+                a future (asyncio or concurrent.futures) of the result,
+                whose done callbacks run on the key-handling thread; e.g.
+                a server's loop.run_in_executor bound to an executor. None
+                runs such functions in place.
         """
         self._stdscr = stdscr
         self._model = model
+        self._run_blocking = run_blocking
+        self._view = None
+        self._path = None
+        self._entered_password = []
+        self._checking = False
+        self._search_index = None
+        self._search_query = None
+        self._search_hits = None
+        self._selection = ""
+        self._filter = None
+        self._saves = None
+
+    def start(self, view, root, search_index=None, saves=None):
+        """
+        Show the root directory, or where the player left off, and start
+        accepting keys.
+
+        Args:
+            view (View): View used to draw each screen.
+            root (Directory): Top-level directory of the game.
+            search_index (SearchIndex): Index of the tree's text files, or
+                None to disable search.
+            saves (SaveStore): Store to resume from and save progress to
+                under the model's player name, or None to not save.
+        """
+        self._view = view
+        self._path = NavigationStack(root)
+        self._search_index = search_index
+        self._saves = saves
+        state = None if saves is None else saves.load(self._model.player_name)
+        if state is not None:
+            self._model.set_unlock_level(state.unlock_level)
+            # Stay at the root if the tree no longer has the saved path
+            self._path.open_path(state.path)
+        self._open(self._path.current)
 
-    def get_key_press(self):
+    @timed("controller.handle_key")
+    def handle_key(self, key):
         """
-        Wait for and return a single key press from the user.
+        Act on one key press for whichever screen is open.
+
+        Args:
+            key (str): Key name as returned by getkey.
 
         Returns:
-            str: The key character entered by the user.
+            bool: True to keep running.
         """
-        while True:
-            key = self._stdscr.getkey()
-            if key is not None:
-                return key
-            sleep(0.002)
+        current = self._path.current
+        if key == "KEY_RESIZE":
+            self._view.resize()
+        elif self._checking:
+            pass  # Keys wait until the password has been checked
+        elif self._search_query is not None:
+            self._handle_search_key(key)
+        elif self._search_hits is not None:
+            self._handle_search_result_key(key)
+        elif not isinstance(current, Directory):
+            if key in ("q", "Q"):
+                self._go_back()
+            elif isinstance(current, TextFile):
+                self._view.scroll_text(key)
+        elif self._is_locked(current):
+            self._handle_password_key(current, key)
+        elif self._filter is not None:
+            self._handle_filter_key(key)
+        elif key in ("q", "Q"):
+            self._go_back()
+        elif key == "/" and self._search_index is not None:
+            self._search_query = []
+            self._view.display_search_prompt("")
+        elif key in ("f", "F"):
+            self._filter = ""
+            self._view.filter_listing(self._filter, typing=True)
+        elif key in ("KEY_NPAGE", "KEY_PPAGE", "KEY_HOME", "KEY_END"):
+            self._view.scroll_listing(key)
+        else:
+            self._handle_selection_key(current, key)
+        return True
 
-    def enter_password(self):
+    def _handle_filter_key(self, key):
         """
-        Capture user input character by character until newline is entered.
+        Edit the listing filter; Enter keeps it and Escape clears it.
+
+        Args:
+            key (str): Key name as returned by getkey.
+        """
+        if key == "\x1b":
+            self._filter = None
+            self._view.filter_listing("")
+            return
+        if key == "\n":
+            self._view.filter_listing(self._filter)
+            self._filter = None
+            return
+        if key in ("KEY_BACKSPACE", "\b", "\x7f"):
+            self._filter = self._filter[:-1]
+        elif len(key) == 1 and key.isprintable():
+            self._filter += key
+        self._view.filter_listing(self._filter, typing=True)
+
+    def _handle_selection_key(self, directory, key):
+        """
+        Collect the digits of an entry number and open the entry.
+
+        An entry opens as soon as its number cannot be the start of a longer
+        one, so directories with up to nine entries open on one key press as
+        before; otherwise Enter opens the number typed so far.
+
+        Args:
+            directory (Directory): The directory being browsed.
+            key (str): Key name as returned by getkey.
+        """
+        if key.isdigit() and len(key) == 1:
+            self._selection += key
+        elif key in ("KEY_BACKSPACE", "\b", "\x7f"):
+            self._selection = self._selection[:-1]
+        elif key == "\n" and self._selection:
+            self._open_child(directory, self._selection)
+            return
+        elif key == "\x1b":
+            # Escape drops a partly typed number and any kept filter
+            self._selection = ""
+            self._view.filter_listing("")
+            return
+        else:
+            return
+
+        count = len(directory.contents)
+        if self._selection and int(self._selection) * 10 > count:
+            self._open_child(directory, self._selection)
+        else:
+            self._view.show_listing_status(self._selection)
+
+    def _handle_search_key(self, key):
+        """
+        Edit the search query, run it on newline or cancel on Escape.
+
+        Args:
+            key (str): Key name as returned by getkey.
+        """
+        if key == "\x1b":
+            self._search_query = None
+            self._open(self._path.current)
+            return
+        if key == "\n":
+            query = "".join(self._search_query)
+            self._search_query = None
+            self._search_hits = self._search_index.search(
+                query, self._model.unlock_level, limit=9
+            )
+            self._view.display_search_results(query, self._search_hits)
+            return
+        if key in ("KEY_BACKSPACE", "\b", "\x7f"):
+            self._search_query = self._search_query[:-1]
+        elif len(key) == 1 and key.isprintable():
+            self._search_query.append(key)
+        self._view.display_search_prompt("".join(self._search_query))
+
+    def _handle_search_result_key(self, key):
+        """
+        Open a search hit chosen by number, or leave the results on q.
+
+        Args:
+            key (str): Key name as returned by getkey.
+        """
+        if key in ("q", "Q"):
+            self._search_hits = None
+            self._open(self._path.current)
+            return
+        try:
+            hit = self._search_hits[int(key) - 1]
+        except (IndexError, ValueError):
+            return
+        self._search_hits = None
+        # A hit from an index older than the tree may lead nowhere
+        self._path.open_path(hit.indices)
+        self._open(self._path.current)
+
+    def _is_locked(self, file):
+        """
+        Check whether a file is a directory the player cannot open yet.
+
+        Args:
+            file (File): File to check.
 
         Returns:
-            str: The full password input by the user.
-        """
-        entered_password = ""
-        while True:
-            key = self._stdscr.getkey()
-            if key == "\n":
-                break
-            entered_password += key
-        return entered_password
+            bool: True if the directory is locked.
+        """
+        return (
+            isinstance(file, Directory)
+            and file.lock_level > self._model.unlock_level
+        )
+
+    def _handle_password_key(self, directory, key):
+        """
+        Add a key to the password being typed, or submit it on newline.
+
+        Args:
+            directory (Directory): The locked directory.
+            key (str): Key name as returned by getkey.
+        """
+        if key in ("q", "Q"):
+            self._go_back()
+        elif key == "\n":
+            check = functools.partial(
+                self._model.password_matches,
+                directory.lock_level,
+                "".join(self._entered_password),
+            )
+            if not self._model.begin_attempt():
+                if self._model.attempt_in_progress():
+                    # Keep the password so Enter can submit it again
+                    self._view.show_password_busy()
+                    return
+                self._entered_password = []
+                self._show_password_result(directory)
+                return
+            self._entered_password = []
+            if self._run_blocking is None:
+                self._password_checked(directory, check())
+            else:
+                self._checking = True
+                self._view.show_password_checking()
+                self._run_blocking(check).add_done_callback(
+                    functools.partial(self._password_check_done, directory)
+                )
+        else:
+            self._entered_password.append(key)
+            self._view.echo_password_key(key)
+
+    def _password_check_done(self, directory, future):
+        """
+        Finish a password check that ran through run_blocking.
+
+        Args:
+            directory (Directory): The locked directory.
+            future (Future): The result of Model.password_matches.
+        """
+        self._checking = False
+        matched = not future.cancelled() and future.exception() is None
+        self._password_checked(directory, matched and future.result())
+
+    def _password_checked(self, directory, matched):
+        """
+        Unlock the next level if the password was right, and show the
+        directory again.
+
+        Args:
+            directory (Directory): The locked directory.
+            matched (bool): Whether the password was right.
+        """
+        if self._model.finish_attempt(matched):
+            self._model.increase_level()
+        self._show_password_result(directory)
+
+    def _show_password_result(self, directory):
+        """
+        Show a directory after a password attempt, with how long to wait
+        if it is still locked and attempts are being throttled.
+
+        Args:
+            directory (Directory): The directory the password was for.
+        """
+        self._open(directory)
+        wait = self._model.retry_after()
+        if wait > 0 and self._is_locked(directory):
+            self._view.show_password_wait(wait)
+
+    def _open_child(self, directory, number):
+        """
+        Open the child of a directory selected by its number.
+
+        Args:
+            directory (Directory): The directory being browsed.
+            number (str): Entry number typed by the user, counting from 1.
+        """
+        self._selection = ""
+        try:
+            if int(number) < 1:
+                raise IndexError(number)
+            selected_file = directory.contents[int(number) - 1]
+        except (IndexError, ValueError):
+            # Ignore invalid input
+            self._view.show_listing_status("")
+            return
+        self._path.push(selected_file, int(number) - 1)
+        self._open(selected_file)
+
+    def _open(self, file):
+        """
+        Display a file at the end of the path.
+
+        Files shown in their own window are closed by the time the view
+        returns, so the directory is shown again straight away.
+
+        Args:
+            file (File): File to display.
+        """
+        self._entered_password = []
+        self._selection = ""
+        self._filter = None
+        if not self._view.display_file(file, self._path):
+            self._go_back()
+        elif self._saves is not None:
+            self._saves.save(
+                self._model.player_name,
+                self._model.unlock_level,
+                self._path.indices,
+            )
+
+    def content_changed(self, directories):
+        """
+        Catch up with directories whose listings were replaced.
+
+        Search results are dropped, since the files they point to may have
+        moved, and an open listing that changed is shown again.
+
+        Args:
+            directories (set): The directories that changed.
+        """
+        self._path.reindex(directories)
+        current = self._path.current
+        if self._search_hits is not None:
+            self._search_hits = None
+            self._open(current)
+        elif (
+            current in directories
+            and self._search_query is None
+            and self._filter is None
+            and not self._is_locked(current)
+        ):
+            self._open(current)
+
+    def _go_back(self):
+        """
+        Return to the parent of the open file, if there is one.
+        """
+        if len(self._path) > 1:
+            self._path.pop()
+            self._open(self._path.current)
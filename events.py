@@ -0,0 +1,150 @@
+"""
+Event loop that waits for terminal input instead of polling for it.
+
+The loop can also wake up when the terminal is resized: a SIGWINCH handler
+writes to a pipe the loop waits on alongside the input, and the loop then
+tells curses the new size and dispatches a single KEY_RESIZE, however many
+resize signals arrived since it last woke up.
+"""
+
+import curses
+import os
+import selectors
+import signal
+import sys
+from metrics import timed
+
+
+class KeyEventLoop:
+    """
+    Waits for input to be readable, then dispatches every pending key.
+    """
+
+    def __init__(self, stdscr, fileno=None, watch_resize=False):
+        """
+        Initialize the loop and make key reads non-blocking.
+
+        Args:
+            stdscr: Curses screen (or anything with getkey and nodelay) that
+                keys are read from.
+            fileno (int): File descriptor the keys arrive on, or None for
+                standard input.
+            watch_resize (bool): Whether to handle SIGWINCH and resize
+                curses' screens to the terminal. Only one loop per process
+                should do so.
+        """
+        self._stdscr = stdscr
+        self._stdscr.nodelay(True)
+        self._selector = selectors.DefaultSelector()
+        if fileno is None:
+            fileno = sys.stdin.fileno()
+        self._fileno = fileno
+        self._selector.register(fileno, selectors.EVENT_READ)
+        self._resize_pipe = None
+        if watch_resize and hasattr(signal, "SIGWINCH"):
+            self._resize_pipe = os.pipe()
+            for end in self._resize_pipe:
+                os.set_blocking(end, False)
+            self._selector.register(self._resize_pipe[0], selectors.EVENT_READ)
+            signal.signal(signal.SIGWINCH, self._signal_resize)
+
+    def _signal_resize(self, _signum, _frame):
+        """
+        Wake the loop up to handle a resize.
+        """
+        try:
+            os.write(self._resize_pipe[1], b"\0")
+        except BlockingIOError:
+            pass  # A wakeup is already pending
+
+    def _take_resize(self):
+        """
+        Check for resizes signalled since the last call, and if there were
+        any, resize curses' screens to the terminal.
+
+        Returns:
+            bool: True if the terminal was resized.
+        """
+        if self._resize_pipe is None:
+            return False
+        try:
+            if not os.read(self._resize_pipe[0], 4096):
+                return False
+        except BlockingIOError:
+            return False
+        try:
+            size = os.get_terminal_size(self._fileno)
+        except OSError:
+            return False
+        curses.resizeterm(size.lines, size.columns)
+        return True
+
+    @timed("events.wait")
+    def wait(self, timeout=None):
+        """
+        Sleep until input is readable.
+
+        Args:
+            timeout (float): Seconds to wait at most, or None to wait until
+                input arrives.
+
+        Returns:
+            bool: True if input is ready, False if the timeout passed.
+        """
+        return bool(self._selector.select(timeout))
+
+    def read_keys(self):
+        """
+        Read every key that is already waiting.
+
+        A resize is reported as one KEY_RESIZE, after which the screen has
+        its new size, so only the last KEY_RESIZE read is kept.
+
+        Returns:
+            list: Keys in the order they were typed.
+        """
+        keys = ["KEY_RESIZE"] if self._take_resize() else []
+        while True:
+            try:
+                keys.append(self._stdscr.getkey())
+            except curses.error:
+                break
+        if keys.count("KEY_RESIZE") > 1:
+            last = len(keys) - 1 - keys[::-1].index("KEY_RESIZE")
+            keys = [
+                key
+                for index, key in enumerate(keys)
+                if key != "KEY_RESIZE" or index == last
+            ]
+        return keys
+
+    def run(self, dispatch, tick=None, interval=1.0):
+        """
+        Dispatch keys until the handler asks to stop.
+
+        Args:
+            dispatch (callable): Called with each key; returns False to end
+                the loop.
+            tick (callable): Called with no arguments whenever interval
+                seconds pass without input, or None.
+            interval (float): Seconds between ticks.
+        """
+        timeout = None if tick is None else interval
+        while True:
+            if not self.wait(timeout):
+                tick()
+                continue
+            for key in self.read_keys():
+                if not dispatch(key):
+                    return
+
+    def close(self):
+        """
+        Stop watching the input file descriptor.
+        """
+        self._selector.close()
+        if self._resize_pipe is not None:
+            signal.signal(signal.SIGWINCH, signal.SIG_DFL)
+            for end in self._resize_pipe:
+                os.close(end)
+            self._resize_pipe = None
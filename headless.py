@@ -0,0 +1,160 @@
+"""
+Headless game driver.
+
+HeadlessGame runs a Model, Controller and View against a VirtualScreen, so
+the game can be played from scripts, tests and benchmarks without a
+terminal. Scripts are space-separated words: names from SCRIPT_KEYS (such
+as ENTER or DOWN) and curses key names (such as KEY_NPAGE) are single
+keys, and any other word is typed one character at a time.
+
+Replay a script and print the final screen with
+python headless.py "1 ENTER 2 ENTER DOWN".
+"""
+
+import sys
+from controller import Controller
+from main import load_content, load_search_index
+from manifest import Manifest
+from model import Model
+from screen import VirtualScreen
+from view import View
+
+SCRIPT_KEYS = {
+    "ENTER": "\n",
+    "ESC": "\x1b",
+    "BACKSPACE": "KEY_BACKSPACE",
+    "UP": "KEY_UP",
+    "DOWN": "KEY_DOWN",
+    "PGUP": "KEY_PPAGE",
+    "PGDN": "KEY_NPAGE",
+    "HOME": "KEY_HOME",
+    "END": "KEY_END",
+    "SPACE": " ",
+}
+
+
+def parse_script(script):
+    """
+    Convert a key script into key names.
+
+    Args:
+        script (str): Space-separated words, e.g. "1 ENTER / diary ENTER".
+
+    Returns:
+        list: Key names as getkey would return them.
+    """
+    keys = []
+    for word in script.split():
+        if word in SCRIPT_KEYS:
+            keys.append(SCRIPT_KEYS[word])
+        elif word.startswith("KEY_"):
+            keys.append(word)
+        else:
+            keys.extend(word)
+    return keys
+
+
+class HeadlessGame:
+    """
+    A game session drawing to an in-memory screen.
+    """
+
+    def __init__(
+        self,
+        root,
+        rows=24,
+        cols=80,
+        password_hashes=None,
+        search_index=None,
+        layouts=None,
+        previews=None,
+    ):
+        """
+        Start a game and draw its first screen.
+
+        Args:
+            root (Directory): Top-level directory of the game.
+            rows (int): Screen height.
+            cols (int): Screen width.
+            password_hashes (dict): Hash of the password for each level.
+            search_index (SearchIndex): Index to search, or None.
+            layouts (LayoutCache): Cache of wrapped text to share between
+                games, or None for a cache of this game's own.
+            previews (PreviewCache): Cache of images drawn in the terminal
+                to share between games, or None for one of this game's own.
+        """
+        self.model = Model(password_hashes)
+        self.screen = VirtualScreen(rows, cols)
+        self.controller = Controller(self.screen, self.model)
+        self.view = View(
+            self.screen,
+            self.controller,
+            self.model,
+            layouts=layouts,
+            image_window=False,
+            previews=previews,
+        )
+        self.controller.start(self.view, root, search_index)
+
+    @property
+    def lines(self):
+        """
+        Retrieve the text on each row of the screen.
+
+        Returns:
+            list: One string per row.
+        """
+        return self.screen.lines
+
+    @property
+    def text(self):
+        """
+        Retrieve the whole screen as text.
+
+        Returns:
+            str: The rows joined by newlines.
+        """
+        return "\n".join(self.screen.lines)
+
+    def resize(self, rows, cols):
+        """
+        Resize the screen and let the game redraw, as curses does by
+        sending KEY_RESIZE.
+
+        Args:
+            rows (int): New height.
+            cols (int): New width.
+        """
+        self.screen.resize(rows, cols)
+        self.controller.handle_key("KEY_RESIZE")
+
+    def press(self, *keys):
+        """
+        Press keys one after another.
+
+        Args:
+            *keys (str): Key names as getkey would return them.
+        """
+        for key in keys:
+            self.controller.handle_key(key)
+
+    def play(self, script):
+        """
+        Replay a key script.
+
+        Args:
+            script (str): Space-separated words; see parse_script.
+        """
+        self.press(*parse_script(script))
+
+
+if __name__ == "__main__":
+    manifest = Manifest.load()
+    content = load_content(manifest)
+    game = HeadlessGame(
+        content,
+        password_hashes=manifest.password_hashes,
+        search_index=load_search_index(content),
+    )
+    game.play(" ".join(sys.argv[1:]))
+    print(game.text)
@@ -0,0 +1,178 @@
+"""
+Background image decoding with a cache of display-ready surfaces.
+
+Once the first image has been opened, images are decoded on a thread pool
+as soon as the directory holding them is shown, so opening one rarely
+waits on a decode. Until then nothing is prefetched, so sessions that never
+open an image never load pygame. Decoded surfaces and
+their copies converted to the display's pixel format are kept in a
+least-recently-used cache bounded by their size in bytes; prefetched images
+join it as soon as they are decoded, whether or not they are ever opened.
+"""
+
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from media import load_pygame
+from metrics import count, timed
+from model import ImageFile
+
+
+def _surface_bytes(surface):
+    """
+    Return the memory used by a surface's pixels.
+
+    Args:
+        surface (pygame.Surface): The surface.
+
+    Returns:
+        int: Size of the pixel buffer in bytes.
+    """
+    return surface.get_pitch() * surface.get_height()
+
+
+def display_format():
+    """
+    Describe the pixel format of the current display surface.
+
+    Returns:
+        tuple: Bit depth and channel masks, or None if there is no display.
+    """
+    display = load_pygame().display.get_surface()
+    if display is None:
+        return None
+    return (display.get_bitsize(), display.get_masks())
+
+
+class ImageCache:
+    """
+    Decodes images in the background and caches the results.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_workers=2):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_bytes (int): Pixel memory budget across all cached surfaces.
+            max_workers (int): Number of decoding threads.
+        """
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._surfaces = OrderedDict()
+        self._pending = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._used = False
+        # Prefetches finish on the decoding threads
+        self._lock = threading.RLock()
+
+    @property
+    def size(self):
+        """
+        Retrieve the pixel memory held by the cache.
+
+        Returns:
+            int: Bytes of cached surfaces.
+        """
+        return self._bytes
+
+    def prefetch(self, files):
+        """
+        Start decoding the images among some files, if an image has been
+        opened before.
+
+        Args:
+            files (list): File objects; anything but an ImageFile is skipped.
+        """
+        if not self._used:
+            return
+        with self._lock:
+            for file in files:
+                key = (file, None)
+                if (
+                    isinstance(file, ImageFile)
+                    and key not in self._surfaces
+                    and file not in self._pending
+                ):
+                    future = self._executor.submit(file.load)
+                    self._pending[file] = future
+                    future.add_done_callback(
+                        functools.partial(self._prefetched, file)
+                    )
+
+    def _prefetched(self, file, future):
+        """
+        Move a finished prefetch into the cache, within the byte budget.
+
+        Args:
+            file (ImageFile): The image.
+            future (concurrent.futures.Future): Its decode.
+        """
+        with self._lock:
+            if self._pending.get(file) is not future:
+                return  # Already taken by get
+            del self._pending[file]
+            if not future.cancelled() and future.exception() is None:
+                self._store((file, None), future.result())
+
+    @timed("images.get")
+    def get(self, file, surface_format=None):
+        """
+        Return an image as a surface, decoding or converting it if needed.
+
+        Args:
+            file (ImageFile): The image.
+            surface_format (tuple): Pixel format from display_format() to
+                convert the image to, or None for the decoded image.
+
+        Returns:
+            pygame.Surface: The image.
+        """
+        self._used = True
+        key = (file, surface_format)
+        with self._lock:
+            if key in self._surfaces:
+                self._surfaces.move_to_end(key)
+                return self._surfaces[key]
+            future = None
+            if surface_format is None:
+                future = self._pending.pop(file, None)
+        count("images.miss")
+
+        if surface_format is None:
+            surface = file.load() if future is None else future.result()
+        else:
+            surface = self.get(file).convert()
+        with self._lock:
+            self._store(key, surface)
+        return surface
+
+    def _store(self, key, surface):
+        """
+        Add a surface, evicting the least recently used ones over budget.
+
+        Call this holding the lock.
+
+        Args:
+            key (tuple): File and pixel format.
+            surface (pygame.Surface): The surface to cache.
+        """
+        if key in self._surfaces:
+            self._surfaces.move_to_end(key)
+            return
+        self._surfaces[key] = surface
+        self._bytes += _surface_bytes(surface)
+        while self._bytes > self._max_bytes and len(self._surfaces) > 1:
+            _, evicted = self._surfaces.popitem(last=False)
+            self._bytes -= _surface_bytes(evicted)
+
+    def close(self, wait=False):
+        """
+        Stop the decoding threads.
+
+        Args:
+            wait (bool): Finish the prefetches already queued and wait for
+                them, instead of cancelling them.
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
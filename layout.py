@@ -0,0 +1,472 @@
+"""
+Layout module for wrapping text files into screen rows.
+
+Wrapping is done once per file and terminal width, and the result is kept
+as two arrays of row offsets into the original text, so a wrapped file
+costs a few bytes per row rather than a copy of every line. Files are
+wrapped by a LazyLayout, which indexes rows a block of lines at a time and
+only as far as the viewer has scrolled, so opening a file or rewrapping it
+after the terminal is resized costs the same however long it is. A
+TextLayout wraps a whole text up front, as archive.pack does ahead of time.
+"""
+
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from operator import add
+from metrics import timed
+
+# Characters (or bytes) a LazyLayout wraps at a time, rounded up to a line
+_BLOCK_SIZE = 1 << 16
+
+
+class TextLayout:
+    """
+    A text wrapped to a fixed width, stored as row start and end offsets.
+    """
+
+    @timed("layout.wrap")
+    def __init__(self, text, width):
+        """
+        Wrap a text to the given width.
+
+        Each line of the text takes at least one row; lines longer than the
+        width continue on the following rows.
+
+        Args:
+            text (str): The text to wrap.
+            width (int): Number of characters per row.
+        """
+        self._text = text
+        self._width = width
+        self._starts = array("L")
+        self._ends = array("L")
+
+        width = max(width, 1)
+        line_start = 0
+        text_length = len(text)
+        while True:
+            line_end = text.find("\n", line_start)
+            if line_end == -1:
+                line_end = text_length
+            # Split the line into width-sized rows (an empty line is one row)
+            row_start = line_start
+            while True:
+                row_end = min(row_start + width, line_end)
+                self._starts.append(row_start)
+                self._ends.append(row_end)
+                if row_end >= line_end:
+                    break
+                row_start = row_end
+            if line_end >= text_length:
+                break
+            line_start = line_end + 1
+
+    @classmethod
+    def from_offsets(cls, text, width, starts, ends):
+        """
+        Create a layout from row offsets computed ahead of time, e.g. by
+        archive.pack, without wrapping the text again.
+
+        Args:
+            text (str): The wrapped text.
+            width (int): Number of characters per row.
+            starts (Sequence): Offset in the text where each row starts.
+            ends (Sequence): Offset in the text where each row ends.
+
+        Returns:
+            TextLayout: The layout.
+        """
+        layout = cls.__new__(cls)
+        layout._text = text
+        layout._width = width
+        layout._starts = starts
+        layout._ends = ends
+        return layout
+
+    @property
+    def width(self):
+        """
+        Retrieve the width the text was wrapped to.
+
+        Returns:
+            int: Characters per row.
+        """
+        return self._width
+
+    @property
+    def offsets(self):
+        """
+        Retrieve where each row starts and ends in the text.
+
+        Returns:
+            tuple: The start offsets and the end offsets.
+        """
+        return self._starts, self._ends
+
+    @property
+    def row_count(self):
+        """
+        Retrieve the number of wrapped rows.
+
+        Returns:
+            int: Number of rows.
+        """
+        return len(self._starts)
+
+    @property
+    def complete(self):
+        """
+        Check whether every row has been indexed.
+
+        Returns:
+            bool: Always True; the whole text is wrapped up front.
+        """
+        return True
+
+    def index_to(self, row):
+        """
+        Do nothing; every row is indexed up front.
+
+        Args:
+            row (int): Ignored.
+        """
+
+    def row_at(self, offset):
+        """
+        Find the row holding an offset in the text, indexing rows as far
+        as it if needed.
+
+        Args:
+            offset (int): Offset in the text, e.g. where a row started
+                before the text was wrapped to another width.
+
+        Returns:
+            int: Row number.
+        """
+        while not self.complete and (not self._ends or self._ends[-1] < offset):
+            self.index_to(self.row_count + 1)
+        return max(bisect_right(self._starts, offset) - 1, 0)
+
+    def row(self, index):
+        """
+        Return the text of one wrapped row.
+
+        Args:
+            index (int): Row number.
+
+        Returns:
+            str: The row's text.
+        """
+        return self._text[self._starts[index] : self._ends[index]]
+
+    def rows(self, start, stop):
+        """
+        Return the text of a range of wrapped rows.
+
+        Args:
+            start (int): First row number.
+            stop (int): Row number to stop before (clamped to the end).
+
+        Returns:
+            list: The rows' text.
+        """
+        stop = min(stop, self.row_count)
+        return [self.row(index) for index in range(start, stop)]
+
+
+class LazyLayout(TextLayout):
+    """
+    A text wrapped to a fixed width as far as it has been read.
+
+    Rows are found a block of lines at a time, only as far as they are
+    asked for, so the first page of a text of any size is ready after
+    wrapping a few kilobytes, and a resize only rewraps the part of the
+    text that is on screen. The text may be a str, or UTF-8 bytes (such
+    as a memory-mapped file) whose offsets are byte offsets.
+    """
+
+    # pylint: disable=super-init-not-called
+    def __init__(self, data, width):
+        """
+        Prepare to wrap some text; nothing is read yet.
+
+        Args:
+            data (str or bytes): The text, or UTF-8 bytes supporting find
+                and slicing, such as an mmap.
+            width (int): Number of characters per row.
+        """
+        self._text = data
+        self._width = width
+        self._decode = not isinstance(data, str)
+        self._newline = b"\n" if self._decode else "\n"
+        self._starts = array("Q")
+        self._ends = array("Q")
+        self._next_line = 0
+        self._complete = False
+
+    @property
+    def complete(self):
+        """
+        Check whether every row has been indexed.
+
+        Returns:
+            bool: True once the end of the text has been reached.
+        """
+        return self._complete
+
+    @timed("layout.wrap")
+    def index_to(self, row):
+        """
+        Index rows until at least a given number are known.
+
+        Args:
+            row (int): Number of rows needed, or None for all of them.
+        """
+        while not self._complete and (row is None or len(self._starts) < row):
+            self._index_block()
+
+    def _index_block(self):
+        """
+        Wrap the next block of whole lines.
+        """
+        data = self._text
+        width = max(self._width, 1)
+        data_length = len(data)
+        block_start = self._next_line
+        block_end = data.find(
+            self._newline, min(block_start + _BLOCK_SIZE, data_length)
+        )
+        if block_end == -1:
+            block_end = data_length
+        block = data[block_start:block_end]
+        lines = block.split(self._newline)
+        lengths = list(map(len, lines))
+        if (not self._decode or block.isascii()) and max(lengths) <= width:
+            # Every line fits on one row, so the rows are the lines
+            starts = list(
+                accumulate(
+                    (length + 1 for length in lengths[:-1]),
+                    initial=block_start,
+                )
+            )
+            self._starts.extend(starts)
+            self._ends.extend(map(add, starts, lengths))
+        else:
+            line_start = block_start
+            for line in lines:
+                self._wrap_line(line, line_start)
+                line_start += len(line) + 1
+        if block_end >= data_length:
+            self._complete = True
+        self._next_line = block_end + 1
+
+    def _wrap_line(self, line, line_start):
+        """
+        Split one line into rows.
+
+        Args:
+            line (str or bytes): The line, without its newline.
+            line_start (int): Offset of the line in the text.
+        """
+        width = max(self._width, 1)
+        if not self._decode or line.isascii():
+            # One offset per character, so rows are width offsets long
+            line_end = line_start + len(line)
+            row_start = line_start
+            while True:
+                row_end = min(row_start + width, line_end)
+                self._starts.append(row_start)
+                self._ends.append(row_end)
+                if row_end >= line_end:
+                    break
+                row_start = row_end
+        else:
+            # Wrap by characters, then convert back to byte offsets
+            text = line.decode("utf-8", errors="surrogateescape")
+            row_start = line_start
+            for offset in range(0, max(len(text), 1), width):
+                chunk = text[offset : offset + width]
+                row_end = row_start + len(
+                    chunk.encode("utf-8", errors="surrogateescape")
+                )
+                self._starts.append(row_start)
+                self._ends.append(row_end)
+                row_start = row_end
+
+    def row(self, index):
+        """
+        Return the text of one wrapped row.
+
+        Args:
+            index (int): Row number; it must already be indexed.
+
+        Returns:
+            str: The row's text.
+        """
+        text = self._text[self._starts[index] : self._ends[index]]
+        if self._decode:
+            return text.decode("utf-8", errors="replace")
+        return text
+
+
+class LayoutCache:
+    """
+    Least-recently-used cache of TextLayouts keyed by file and width.
+    """
+
+    def __init__(self, max_entries=32):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int): Maximum number of layouts kept.
+        """
+        self._max_entries = max_entries
+        self._layouts = OrderedDict()
+
+    def __len__(self):
+        """
+        Return the number of cached layouts.
+
+        Returns:
+            int: Number of layouts.
+        """
+        return len(self._layouts)
+
+    def get(self, file, width):
+        """
+        Return the layout of a text file, wrapping it if not cached and
+        not prebuilt.
+
+        Args:
+            file (TextFile): The file to lay out.
+            width (int): Number of characters per row.
+
+        Returns:
+            TextLayout: The prebuilt layout of the file, or a LazyLayout
+                that wraps it as it is read.
+        """
+        key = (file, width)
+        try:
+            layout = self._layouts[key]
+        except KeyError:
+            layout = file.prebuilt_layout(width)
+            if layout is None:
+                layout = LazyLayout(file.contents, width)
+            self._layouts[key] = layout
+            while len(self._layouts) > self._max_entries:
+                self._layouts.popitem(last=False)
+        else:
+            self._layouts.move_to_end(key)
+        return layout
+
+
+class Viewport:
+    """
+    Scroll position of a fixed-height window over a number of rows.
+    """
+
+    def __init__(self, row_count, height):
+        """
+        Create a viewport at the top of the rows.
+
+        Args:
+            row_count (int): Total number of rows.
+            height (int): Number of rows visible at once.
+        """
+        self._row_count = row_count
+        self._height = max(height, 1)
+        self._top = 0
+
+    @property
+    def top(self):
+        """
+        Retrieve the first visible row.
+
+        Returns:
+            int: Row number at the top of the window.
+        """
+        return self._top
+
+    @property
+    def height(self):
+        """
+        Retrieve the number of visible rows.
+
+        Returns:
+            int: Window height.
+        """
+        return self._height
+
+    @property
+    def bottom(self):
+        """
+        Retrieve the row number just past the last visible row.
+
+        Returns:
+            int: Row number to stop drawing before.
+        """
+        return min(self._top + self._height, self._row_count)
+
+    def resize(self, row_count):
+        """
+        Change the number of rows, e.g. as more of a file is indexed.
+
+        Args:
+            row_count (int): New total number of rows.
+        """
+        self._row_count = row_count
+
+    def scroll(self, rows):
+        """
+        Move the window, stopping at the first and last page.
+
+        Args:
+            rows (int): Number of rows to move down (negative moves up).
+
+        Returns:
+            bool: True if the window moved.
+        """
+        last_top = max(self._row_count - self._height, 0)
+        top = min(max(self._top + rows, 0), last_top)
+        moved = top != self._top
+        self._top = top
+        return moved
+
+    def page_down(self):
+        """
+        Move the window down one page.
+
+        Returns:
+            bool: True if the window moved.
+        """
+        return self.scroll(self._height)
+
+    def page_up(self):
+        """
+        Move the window up one page.
+
+        Returns:
+            bool: True if the window moved.
+        """
+        return self.scroll(-self._height)
+
+    def home(self):
+        """
+        Move the window to the first row.
+
+        Returns:
+            bool: True if the window moved.
+        """
+        return self.scroll(-self._top)
+
+    def end(self):
+        """
+        Move the window to the last page.
+
+        Returns:
+            bool: True if the window moved.
+        """
+        return self.scroll(self._row_count)
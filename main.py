@@ -2,68 +2,255 @@
 Main entry point for the terminal-based file explorer game.
 
 Initializes the model, controller, and view, and runs the main game loop.
+With --serve or --socket, hosts many players in one process instead.
+Documents that change on disk are reloaded while the game runs, unless
+they come from the packed archive.
 """
 
-from time import sleep
+import argparse
+import asyncio
+import getpass
+import os
 import curses
-from model import Model, Directory
+import metrics
+from model import Model, Directory, ContentCache, load_tree
+from archive import Archive
+from manifest import Manifest
 from view import View
 from controller import Controller
+from events import KeyEventLoop
+from server import GameServer
+from saves import SaveStore
+from search import SearchIndex
+from watcher import ContentWatcher
 
+ARCHIVE_PATH = "1documents.pak"
+INDEX_PATH = "1documents.idx"
+SAVE_PATH = "saves.db"
+# Server players are kept apart from local ones, whose saves have no
+# passphrase and could otherwise be claimed by anyone typing their name
+SERVER_SAVE_PATH = "server_saves.db"
 
-def main(stdscr):
+# Seconds between checks for changed documents
+WATCH_INTERVAL = 1.0
+
+
+def load_content(manifest, cache=None):
+    """
+    Load the game's documents, preferring the packed archive if built.
+
+    Args:
+        manifest (Manifest): Describes the content tree. Archives record
+            the lock levels and order they were packed with instead.
+        cache (ContentCache): Cache for lazy loading, or None to load the
+            whole tree up front.
+
+    Returns:
+        Directory: The top-level directory.
+
+    Raises:
+        ValueError: If the manifest names directories that do not exist.
+    """
+    if os.path.exists(ARCHIVE_PATH):
+        return Archive(ARCHIVE_PATH).root(cache)
+    manifest.check_tree()
+    name = os.path.basename(manifest.root)
+    path = os.path.dirname(manifest.root)
+    if cache is None:
+        return load_tree(name, path, manifest=manifest)
+    return Directory(name, path, cache=cache, manifest=manifest)
+
+
+def load_search_index(root):
+    """
+    Load the prebuilt search index if there is one, else index root.
+
+    A prebuilt index that no longer matches the tree is replaced by a new
+    index of root when it is first searched.
+
+    Args:
+        root (Directory): Top-level directory the index must describe.
+
+    Returns:
+        SearchIndex: The search index.
+    """
+    if os.path.exists(INDEX_PATH):
+        return SearchIndex.load(INDEX_PATH, root)
+    return SearchIndex(root)
+
+
+def watch_content(root):
+    """
+    Watch the documents for changes, unless they come from the archive.
+
+    Args:
+        root (Directory): Top-level directory returned by load_content.
+
+    Returns:
+        ContentWatcher: The watcher, or None for packed documents.
+    """
+    if os.path.exists(ARCHIVE_PATH):
+        return None
+    return ContentWatcher(root)
+
+
+def write_metrics(path, recorder):
+    """
+    Append a recorder's latency histograms to a file.
+
+    Args:
+        path (str): File to append to.
+        recorder (metrics.Recorder): The recorder to report.
+    """
+    with open(path, "a", encoding="utf-8") as file_obj:
+        file_obj.write(recorder.report())
+
+
+def main(stdscr, args=None):
     """
     Launch the game UI and handle navigation input.
 
     Args:
         stdscr (curses.window): The curses standard screen window.
+        args (argparse.Namespace): Command-line options, or None.
 
     Returns:
         None
     """
-    model = Model()
+    recorder = None
+    if args is not None and args.metrics:
+        recorder = metrics.enable(metrics.Recorder(getpass.getuser()))
+    if args is not None and args.profile:
+        metrics.install_profiler_signal()
+
+    manifest = Manifest.load()
+    model = Model(manifest.password_hashes)
+    model.set_player_name(getpass.getuser())
     controller = Controller(stdscr, model)
-    view = View(stdscr, controller, model)
+    view = View(
+        stdscr,
+        controller,
+        model,
+        image_window=args is not None
+        and args.image_window
+        and not args.text_only,
+        image_preview=args is None or not args.text_only,
+    )
 
-    basedir = Directory("1documents")
-    current_dir = basedir
-    current_dir_path = [current_dir]
+    root = load_content(manifest, ContentCache())
+    search_index = load_search_index(root)
+    saves = SaveStore(SAVE_PATH)
+    try:
+        controller.start(view, root, search_index, saves)
+        watcher = watch_content(root)
 
-    view.display_file(current_dir, current_dir_path)
+        def reload_content():
+            directories = watcher.poll()
+            if directories:
+                search_index.update(directories)
+                controller.content_changed(directories)
 
-    game_loop = True
-    while game_loop:
+        # Sleep until keys arrive and hand each one to the controller,
+        # checking for changed documents while idle and redrawing when the
+        # terminal is resized
+        KeyEventLoop(stdscr, watch_resize=True).run(
+            controller.handle_key,
+            None if watcher is None else reload_content,
+            WATCH_INTERVAL,
+        )
+    finally:
+        saves.close()
+        if recorder is not None:
+            write_metrics(args.metrics, recorder)
 
-        # get input from controller
-        input_key = controller.get_key_press()
 
-        # navigate back
-        if input_key in ("q", "Q"):
-            if len(current_dir_path) > 1:
-                current_dir = current_dir_path[-2]
-                current_dir_path = current_dir_path[:-1]
-                view.display_file(current_dir, current_dir_path)
+def parse_args():
+    """
+    Parse command-line options.
 
-        # open file
-        else:
-            try:
-                selected_file = current_dir.contents[int(input_key) - 1]
-                current_dir = selected_file
-                current_dir_path.append(current_dir)
-                view.display_file(selected_file, current_dir_path)
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Play terminal.")
+    parser.add_argument(
+        "--serve",
+        metavar="HOST:PORT",
+        help="host many players over TCP instead of playing locally",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="host many players over a Unix socket instead of playing locally",
+    )
+    parser.add_argument(
+        "--image-window",
+        action="store_true",
+        help="open images in a pygame window instead of in the terminal",
+    )
+    parser.add_argument(
+        "--text-only",
+        action="store_true",
+        help="never show images or load pygame",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="append latency histograms for each session to PATH on exit",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="start and stop cProfile with SIGUSR1 (writes profile-*.prof)",
+    )
+    return parser.parse_args()
 
-                if not isinstance(selected_file, Directory):
-                    if len(current_dir_path) > 1:
-                        current_dir = current_dir_path[-2]
-                        current_dir_path = current_dir_path[:-1]
-                        view.display_file(current_dir, current_dir_path)
 
-            except (IndexError, ValueError, AttributeError):
-                # Ignore invalid input or no key pressed
-                pass
+def serve(args):
+    """
+    Run the multi-player server until interrupted.
 
-        sleep(0.002)
+    Args:
+        args (argparse.Namespace): Options naming the address to listen on.
+    """
+    if args.profile:
+        metrics.install_profiler_signal()
+    manifest = Manifest.load()
+    root = load_content(manifest)
+    saves = SaveStore(SERVER_SAVE_PATH)
+    server = GameServer(
+        root,
+        load_search_index(root),
+        password_hashes=manifest.password_hashes,
+        saves=saves,
+        record_metrics=args.metrics is not None,
+        on_session_end=(
+            None
+            if args.metrics is None
+            else lambda session: write_metrics(args.metrics, session.recorder)
+        ),
+    )
+    watcher = watch_content(root)
+    if args.socket:
+        coroutine = server.serve_forever(unix_path=args.socket, watcher=watcher)
+    else:
+        host, _, port = args.serve.rpartition(":")
+        coroutine = server.serve_forever(
+            host or "127.0.0.1", int(port), watcher=watcher
+        )
+    try:
+        asyncio.run(coroutine)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        saves.close()
 
 
 if __name__ == "__main__":
-    curses.wrapper(main)
+    arguments = parse_args()
+    if arguments.serve or arguments.socket:
+        serve(arguments)
+    else:
+        # Let Escape through quickly instead of waiting a second for a
+        # possible escape sequence
+        os.environ.setdefault("ESCDELAY", "25")
+        curses.wrapper(main, arguments)
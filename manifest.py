@@ -0,0 +1,222 @@
+"""
+Content pack manifest: lock levels, password hashes and display order.
+
+A manifest is a JSON file that sits beside a content tree and describes it,
+so a content pack can add levels and locked directories without code
+changes. For example:
+
+    {
+        "root": "1documents",
+        "levels": {"2": "pbkdf2_sha256$...", "3": "pbkdf2_sha256$..."},
+        "directories": {
+            "2archive": {"lock": 2},
+            "3message": {"lock": 3, "order": ["1to_my_little_sister.txt"]}
+        }
+    }
+
+"root" is the content directory, relative to the manifest. "levels" maps
+each lock level above 1 to the hash of its password (see
+model.hash_password); levels must run from 2 up without gaps, since each
+password unlocks the next level. "directories" is keyed by on-disk path
+relative to the root, with "" for the root itself. A directory's "lock"
+is the level needed to open it (1 if omitted), and its optional "order"
+lists entry names to show first, in that order; other entries follow in
+name order.
+
+The manifest is validated when it is loaded. Lookups are keyed by absolute
+path and computed once, so building a tree costs one dict read per
+directory.
+"""
+
+import json
+import os
+import re
+
+MANIFEST_PATH = "manifest.json"
+
+_HASH = re.compile(
+    r"pbkdf2_sha256\$[1-9][0-9]*\$([0-9a-f]{2})+\$([0-9a-f]{2})+"
+)
+
+
+class Manifest:
+    """
+    Validated metadata for a content tree.
+    """
+
+    def __init__(self, data, base=os.getcwd(), source="manifest"):
+        """
+        Validate manifest data and index it by absolute path.
+
+        Args:
+            data (dict): Parsed manifest.
+            base (str): Directory the manifest's root is relative to.
+            source (str): Name used in error messages.
+
+        Raises:
+            ValueError: If the manifest is malformed.
+        """
+        if not isinstance(data, dict) or not isinstance(data.get("root"), str):
+            raise ValueError(f"{source}: 'root' must name a directory")
+        self._root = os.path.abspath(os.path.join(base, data["root"]))
+        self._password_hashes = self._read_levels(
+            data.get("levels", {}), source
+        )
+        self._locks = {}
+        self._orders = {}
+
+        directories = data.get("directories", {})
+        if not isinstance(directories, dict):
+            raise ValueError(f"{source}: 'directories' must be an object")
+        top_level = max(self._password_hashes, default=1)
+        for key, entry in directories.items():
+            where = f"{source}: directory {key!r}"
+            if not isinstance(entry, dict) or set(entry) - {"lock", "order"}:
+                raise ValueError(f"{where} may only set 'lock' and 'order'")
+            path = self._absolute(key)
+            lock = entry.get("lock", 1)
+            if not isinstance(lock, int) or not 1 <= lock <= top_level:
+                raise ValueError(f"{where} has lock {lock!r}; no such level")
+            if lock > 1:
+                self._locks[path] = lock
+            order = entry.get("order")
+            if order is not None:
+                if not isinstance(order, list) or not all(
+                    isinstance(name, str) for name in order
+                ):
+                    raise ValueError(f"{where} order must be a list of names")
+                self._orders[path] = {
+                    name: rank for rank, name in enumerate(order)
+                }
+
+    @staticmethod
+    def _read_levels(levels, source):
+        """
+        Validate the password hash of each level.
+
+        Args:
+            levels (dict): Level number (as a string) to password hash.
+            source (str): Name used in error messages.
+
+        Returns:
+            dict: Level number to password hash.
+
+        Raises:
+            ValueError: If a hash is malformed or a level is missing.
+        """
+        if not isinstance(levels, dict):
+            raise ValueError(f"{source}: 'levels' must be an object")
+        hashes = {}
+        for level, encoded in levels.items():
+            if not level.isdigit() or not isinstance(encoded, str):
+                raise ValueError(f"{source}: bad level {level!r}")
+            if not _HASH.fullmatch(encoded):
+                raise ValueError(
+                    f"{source}: level {level} has a malformed hash"
+                )
+            hashes[int(level)] = encoded
+        if sorted(hashes) != list(range(2, len(hashes) + 2)):
+            raise ValueError(f"{source}: levels must run from 2 without gaps")
+        return hashes
+
+    @classmethod
+    def load(cls, path=MANIFEST_PATH):
+        """
+        Read and validate a manifest file.
+
+        Args:
+            path (str): Path to the manifest.
+
+        Returns:
+            Manifest: The loaded manifest.
+
+        Raises:
+            ValueError: If the file is not a valid manifest.
+        """
+        with open(path, "r", encoding="utf-8") as file_obj:
+            try:
+                data = json.load(file_obj)
+            except json.JSONDecodeError as error:
+                raise ValueError(f"{path}: {error}") from error
+        return cls(data, os.path.dirname(os.path.abspath(path)), path)
+
+    def _absolute(self, key):
+        """
+        Convert a path relative to the root into an absolute path.
+
+        Args:
+            key (str): /-separated on-disk path, or "" for the root.
+
+        Returns:
+            str: Absolute path, built the way Directory builds its paths.
+        """
+        if not key:
+            return self._root
+        return os.path.join(self._root, *key.split("/"))
+
+    @property
+    def root(self):
+        """
+        Retrieve the content directory.
+
+        Returns:
+            str: Absolute path to the root of the content tree.
+        """
+        return self._root
+
+    @property
+    def password_hashes(self):
+        """
+        Retrieve the password hash of each level.
+
+        Returns:
+            dict: Level-hash mapping.
+        """
+        return dict(self._password_hashes)
+
+    def lock_level(self, path):
+        """
+        Return the level needed to open a directory.
+
+        Args:
+            path (str): Absolute path of the directory.
+
+        Returns:
+            int: The lock level; 1 if the manifest does not lock it.
+        """
+        return self._locks.get(path, 1)
+
+    def sort(self, path, names):
+        """
+        Put the entries of a directory in display order.
+
+        Args:
+            path (str): Absolute path of the directory.
+            names (list): On-disk names of its entries.
+
+        Returns:
+            list: The names, manifest order first and the rest by name.
+        """
+        ranks = self._orders.get(path)
+        if ranks is None:
+            return sorted(names)
+        last = len(ranks)
+        return sorted(names, key=lambda name: (ranks.get(name, last), name))
+
+    def check_tree(self):
+        """
+        Check that every directory and ordered entry named exists on disk.
+
+        Raises:
+            ValueError: If something the manifest names is missing.
+        """
+        for path in self._locks.keys() | self._orders.keys():
+            if not os.path.isdir(path):
+                raise ValueError(f"manifest names missing directory {path}")
+        for path, ranks in self._orders.items():
+            missing = set(ranks) - set(os.listdir(path))
+            if missing:
+                raise ValueError(
+                    f"manifest orders missing entries {sorted(missing)} in"
+                    f" {path}"
+                )
@@ -0,0 +1,24 @@
+"""
+Deferred loading of pygame.
+
+Importing pygame initialises SDL, which costs startup time and memory that
+text-only sessions never need, so nothing imports it at module level.
+Code that decodes or shows an image calls load_pygame first instead.
+"""
+
+import importlib
+import os
+
+
+def load_pygame():
+    """
+    Import pygame, the first time only.
+
+    pygame's greeting is silenced because it would be printed over the
+    curses screen.
+
+    Returns:
+        module: The pygame module.
+    """
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    return importlib.import_module("pygame")
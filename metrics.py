@@ -0,0 +1,278 @@
+"""
+Opt-in timing of the game's hot paths, and a profiler hook.
+
+Functions decorated with timed record how long each call takes into the
+active Recorder, as a latency histogram per name. With no recorder active
+(the default) a timed function only checks one global before calling
+through, so the instrumentation can stay in place.
+
+install_profiler_signal lets a running game be profiled: the first signal
+starts cProfile and the next one stops it and writes the stats to a file
+for pstats or snakeviz. Sampling profilers such as py-spy need no hook and
+can attach to the process directly.
+"""
+
+import cProfile
+import functools
+import os
+import signal
+from contextlib import contextmanager
+from time import perf_counter
+
+# Recorder that timed functions report to, or None when disabled
+_recorder = None
+
+
+class Histogram:
+    """
+    Latency histogram with power-of-two microsecond buckets.
+    """
+
+    def __init__(self):
+        """
+        Create an empty histogram.
+        """
+        self._buckets = {}
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    @property
+    def count(self):
+        """
+        Retrieve the number of samples.
+
+        Returns:
+            int: How many times the path ran.
+        """
+        return self._count
+
+    def add(self, seconds):
+        """
+        Record one sample.
+
+        Args:
+            seconds (float): How long the call took.
+        """
+        bucket = int(seconds * 1_000_000).bit_length()
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self._count += 1
+        self._total += seconds
+        self._max = max(self._max, seconds)
+
+    def percentile(self, fraction):
+        """
+        Estimate a percentile from the buckets.
+
+        Args:
+            fraction (float): Percentile as a fraction, e.g. 0.99.
+
+        Returns:
+            float: Upper bound of the bucket holding it, in seconds.
+        """
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= fraction * self._count:
+                return min((1 << bucket) / 1_000_000, self._max)
+        return self._max
+
+    def summary(self):
+        """
+        Describe the histogram on one line.
+
+        Returns:
+            str: Count, mean, p50, p99 and max in milliseconds.
+        """
+        mean = self._total / self._count if self._count else 0.0
+        return (
+            f"n={self._count} mean={mean * 1000:.3f}ms "
+            f"p50<={self.percentile(0.5) * 1000:.3f}ms "
+            f"p99<={self.percentile(0.99) * 1000:.3f}ms "
+            f"max={self._max * 1000:.3f}ms"
+        )
+
+
+class Recorder:
+    """
+    Latency histograms and counters for one session.
+    """
+
+    def __init__(self, name="session"):
+        """
+        Create an empty recorder.
+
+        Args:
+            name (str): Label used in the report.
+        """
+        self.name = name
+        self._histograms = {}
+        self._counters = {}
+
+    def record(self, path, seconds):
+        """
+        Add a timing sample.
+
+        Args:
+            path (str): Name of the timed path.
+            seconds (float): How long it took.
+        """
+        histogram = self._histograms.get(path)
+        if histogram is None:
+            histogram = self._histograms[path] = Histogram()
+        histogram.add(seconds)
+
+    def count(self, path, amount=1):
+        """
+        Add to a counter.
+
+        Args:
+            path (str): Name of the counter.
+            amount (int): Amount to add.
+        """
+        self._counters[path] = self._counters.get(path, 0) + amount
+
+    def histogram(self, path):
+        """
+        Return the histogram of a timed path.
+
+        Args:
+            path (str): Name of the timed path.
+
+        Returns:
+            Histogram: Its samples, or None if it never ran.
+        """
+        return self._histograms.get(path)
+
+    def report(self):
+        """
+        Describe every histogram and counter.
+
+        Returns:
+            str: One line per path, after a line naming the session.
+        """
+        lines = [f"[{self.name}]"]
+        for path in sorted(self._histograms):
+            lines.append(f"{path}: {self._histograms[path].summary()}")
+        for path in sorted(self._counters):
+            lines.append(f"{path}: {self._counters[path]}")
+        return "\n".join(lines) + "\n"
+
+
+def enable(recorder=None):
+    """
+    Start recording into a recorder.
+
+    Args:
+        recorder (Recorder): Recorder to use, or None for a new one.
+
+    Returns:
+        Recorder: The active recorder.
+    """
+    global _recorder  # pylint: disable=global-statement
+    _recorder = recorder if recorder is not None else Recorder()
+    return _recorder
+
+
+def disable():
+    """
+    Stop recording.
+    """
+    global _recorder  # pylint: disable=global-statement
+    _recorder = None
+
+
+@contextmanager
+def recording(recorder):
+    """
+    Record into a recorder for the duration of a with block, e.g. while one
+    server session handles its input.
+
+    Args:
+        recorder (Recorder): Recorder to use, or None to record nothing.
+
+    Yields:
+        Recorder: The recorder.
+    """
+    global _recorder  # pylint: disable=global-statement
+    previous = _recorder
+    _recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _recorder = previous
+
+
+def count(path, amount=1):
+    """
+    Add to a counter of the active recorder, if there is one.
+
+    Args:
+        path (str): Name of the counter.
+        amount (int): Amount to add.
+    """
+    if _recorder is not None:
+        _recorder.count(path, amount)
+
+
+def timed(path):
+    """
+    Decorate a function to record its duration under a name.
+
+    Args:
+        path (str): Name of the timed path, e.g. "view.display_text_file".
+
+    Returns:
+        callable: The decorator.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            recorder = _recorder
+            if recorder is None:
+                return function(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                recorder.record(path, perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def install_profiler_signal(signum=signal.SIGUSR1, directory="."):
+    """
+    Toggle cProfile on a running process with a signal.
+
+    The first signal starts profiling; the next one stops it and writes
+    the stats to directory/profile-<pid>-<n>.prof.
+
+    Args:
+        signum (int): Signal to listen for.
+        directory (str): Where to write the stats.
+
+    Returns:
+        callable: The installed signal handler.
+    """
+    state = {"profile": None, "dumps": 0}
+
+    def toggle(_signum, _frame):
+        profile = state["profile"]
+        if profile is None:
+            state["profile"] = cProfile.Profile()
+            state["profile"].enable()
+            return
+        profile.disable()
+        state["profile"] = None
+        state["dumps"] += 1
+        profile.dump_stats(
+            os.path.join(
+                directory, f"profile-{os.getpid()}-{state['dumps']}.prof"
+            )
+        )
+
+    signal.signal(signum, toggle)
+    return toggle
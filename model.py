@@ -2,8 +2,163 @@
 Model module for managing game state, file access, and directory structure.
 """
 
+import hashlib
+import hmac
+import mmap
 import os
-import pygame
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from media import load_pygame
+from metrics import count, timed
+
+# Work factor for newly hashed passwords; stored hashes record their own
+KDF_ITERATIONS = 100_000
+
+# Text files larger than this are streamed from disk instead of read whole
+STREAMING_THRESHOLD = 4 * 1024 * 1024
+
+# Failed attempts allowed before the player has to wait, and the longest wait
+FREE_ATTEMPTS = 3
+MAX_WAIT = 30.0
+
+
+def hash_password(password, iterations=KDF_ITERATIONS, salt=None):
+    """
+    Hash a password with a random salt using PBKDF2-HMAC-SHA256.
+
+    Args:
+        password (str): The password to hash.
+        iterations (int): PBKDF2 work factor.
+        salt (bytes): Salt to use, or None for a random 16-byte salt.
+
+    Returns:
+        str: The hash as pbkdf2_sha256$iterations$salt$digest, in hex.
+    """
+    if salt is None:
+        salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac(
+        "sha256", password.encode("utf-8"), salt, iterations
+    )
+    return f"pbkdf2_sha256${iterations}${salt.hex()}${digest.hex()}"
+
+
+def check_password(password, encoded):
+    """
+    Check a password against a hash made by hash_password.
+
+    The digests are compared in constant time.
+
+    Args:
+        password (str): The password to check.
+        encoded (str): The stored hash.
+
+    Returns:
+        bool: True if the password matches.
+    """
+    _, iterations, salt, digest = encoded.split("$")
+    attempt = hashlib.pbkdf2_hmac(
+        "sha256",
+        password.encode("utf-8"),
+        bytes.fromhex(salt),
+        int(iterations),
+    )
+    return hmac.compare_digest(attempt, bytes.fromhex(digest))
+
+
+class AttemptThrottle:
+    """
+    Failed password attempts and waits, per player or per network peer.
+
+    After FREE_ATTEMPTS failures in a row an attempter must wait, twice as
+    long after each further failure up to MAX_WAIT seconds. Each attempter
+    may only have one attempt being checked at a time. A server shares one
+    throttle between its sessions, so reconnecting does not reset it.
+    """
+
+    def __init__(self, clock=time.monotonic, max_entries=10_000):
+        """
+        Create a throttle with no failures recorded.
+
+        Args:
+            clock (callable): Returns the current time in seconds.
+            max_entries (int): Number of attempters to remember failures
+                of; those whose wait is over are forgotten first.
+        """
+        self._clock = clock
+        self._max_entries = max_entries
+        self._failures = {}  # Attempter to (failures in a row, retry time)
+        self._checking = set()
+
+    def retry_after(self, key):
+        """
+        Return how long an attempter must wait before trying a password.
+
+        Args:
+            key (Hashable): The attempter, e.g. a peer address.
+
+        Returns:
+            float: Seconds left to wait, or 0 if a password can be tried.
+        """
+        _, retry_at = self._failures.get(key, (0, 0.0))
+        return max(0.0, retry_at - self._clock())
+
+    def begin(self, key):
+        """
+        Start an attempt, unless the attempter has to wait or is already
+        having one checked.
+
+        Args:
+            key (Hashable): The attempter.
+
+        Returns:
+            bool: True if the attempt may be checked; finish must follow.
+        """
+        if key in self._checking or self.retry_after(key) > 0:
+            return False
+        self._checking.add(key)
+        return True
+
+    def checking(self, key):
+        """
+        Tell whether an attempter has an attempt being checked.
+
+        Args:
+            key (Hashable): The attempter.
+
+        Returns:
+            bool: True between begin and finish.
+        """
+        return key in self._checking
+
+    def finish(self, key, matched):
+        """
+        Record the outcome of an attempt started with begin.
+
+        Args:
+            key (Hashable): The attempter.
+            matched (bool): Whether the password was right.
+        """
+        self._checking.discard(key)
+        if matched:
+            self._failures.pop(key, None)
+            return
+        failures = self._failures.pop(key, (0, 0.0))[0] + 1
+        retry_at = 0.0
+        if failures >= FREE_ATTEMPTS:
+            wait = min(2.0 ** (failures - FREE_ATTEMPTS), MAX_WAIT)
+            retry_at = self._clock() + wait
+        if len(self._failures) >= self._max_entries:
+            now = self._clock()
+            self._failures = {
+                other: entry
+                for other, entry in self._failures.items()
+                if entry[1] > now
+            }
+            while len(self._failures) >= self._max_entries:
+                del self._failures[next(iter(self._failures))]
+        self._failures[key] = (failures, retry_at)
 
 
 class Model:
@@ -11,16 +166,54 @@ class Model:
     Handles game state including unlock level, and file system access.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        password_hashes=None,
+        clock=time.monotonic,
+        throttle=None,
+        attempter=None,
+    ):
         """
         Initialize the model with default player state.
+
+        Args:
+            password_hashes (dict): Hash of the password for each level
+                above 1, usually from the content pack's Manifest. Without
+                them no level can be unlocked.
+            clock (callable): Returns the current time in seconds; used to
+                throttle password attempts if no throttle is given.
+            throttle (AttemptThrottle): Throttle shared with other models,
+                or None for one of this model's own.
+            attempter (Hashable): Who this player's attempts count against
+                in the throttle, e.g. their peer address.
         """
         self._player_name = "____"
         self._unlock_level = 1  # Player starts with only level 1 unlocked
-        self._unlock_password = {  # Passwords required to unlock higher levels
-            2: "vires_in_silentio",
-            3: "CENTINEL-1",
-        }
+        # Hashes of the passwords that unlock each level above 1
+        self._password_hashes = dict(password_hashes or {})
+        self._throttle = (
+            AttemptThrottle(clock) if throttle is None else throttle
+        )
+        self._attempter = attempter
+
+    @property
+    def player_name(self):
+        """
+        Retrieve the player's name.
+
+        Returns:
+            str: The name progress is saved under.
+        """
+        return self._player_name
+
+    def set_player_name(self, name):
+        """
+        Set the player's name.
+
+        Args:
+            name (str): The name to save progress under.
+        """
+        self._player_name = name
 
     @property
     def unlock_level(self):
@@ -33,14 +226,93 @@ class Model:
         return self._unlock_level
 
     @property
-    def passwords(self):
+    def password_hashes(self):
         """
-        Access the password dictionary.
+        Access the password hashes.
 
         Returns:
-            dict: Level-password mapping.
+            dict: Level-hash mapping.
         """
-        return self._unlock_password
+        return self._password_hashes
+
+    def retry_after(self):
+        """
+        Return how long the player must wait before trying a password.
+
+        Returns:
+            float: Seconds left to wait, or 0 if a password can be tried.
+        """
+        return self._throttle.retry_after(self._attempter)
+
+    def attempt_in_progress(self):
+        """
+        Tell whether another of the player's attempts is being checked, e.g.
+        from a second connection at the same address.
+
+        Returns:
+            bool: True if begin_attempt would refuse for that reason.
+        """
+        return self._throttle.checking(self._attempter)
+
+    def begin_attempt(self):
+        """
+        Start a password attempt, unless the throttle refuses it.
+
+        Returns:
+            bool: True if password_matches may be called; finish_attempt
+                must follow with its result.
+        """
+        return self._throttle.begin(self._attempter)
+
+    def password_matches(self, level, password):
+        """
+        Hash a password and compare it with a lock level's hash.
+
+        This is the slow part of an attempt. It changes no state, so it can
+        run on a worker thread.
+
+        Args:
+            level (int): The lock level to unlock.
+            password (str): The password typed by the player.
+
+        Returns:
+            bool: True if the password is right.
+        """
+        encoded = self._password_hashes.get(level)
+        return encoded is not None and check_password(password, encoded)
+
+    def finish_attempt(self, matched):
+        """
+        Record the outcome of an attempt started with begin_attempt.
+
+        Args:
+            matched (bool): Result of password_matches.
+
+        Returns:
+            bool: matched.
+        """
+        self._throttle.finish(self._attempter, matched)
+        return matched
+
+    def verify_password(self, level, password):
+        """
+        Check a password for a lock level, throttling repeated failures.
+
+        Attempts refused by the throttle are rejected without hashing
+        anything. The hash is computed on the calling thread; servers use
+        begin_attempt, password_matches and finish_attempt instead, to
+        hash on a worker thread.
+
+        Args:
+            level (int): The lock level to unlock.
+            password (str): The password typed by the player.
+
+        Returns:
+            bool: True if the password is right and was not throttled.
+        """
+        if not self.begin_attempt():
+            return False
+        return self.finish_attempt(self.password_matches(level, password))
 
     def increase_level(self):
         """
@@ -58,22 +330,140 @@ class Model:
         self._unlock_level = level
 
 
-class File:
+class ContentCache:
     """
-    Base class representing a generic file in the game.
+    Bounded least-recently-used cache of loaded file contents.
+
+    Lazily loaded files and directories keep their contents here instead of
+    on the node itself, so memory stays flat no matter how much of the tree
+    is browsed. Evicted contents are simply loaded again on next access.
     """
 
-    def __init__(self, name, path):
+    def __init__(self, max_entries=128):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int): Maximum number of nodes kept loaded at once.
+        """
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        """
+        Return the number of nodes currently loaded.
+
+        Returns:
+            int: Number of cached entries.
+        """
+        return len(self._entries)
+
+    def __contains__(self, node):
+        """
+        Check whether a node's contents are currently loaded.
+
+        Args:
+            node (File): The node to look up.
+
+        Returns:
+            bool: True if the node's contents are cached.
+        """
+        return node in self._entries
+
+    def get(self, node):
+        """
+        Return a node's contents, loading them if they are not cached.
+
+        Args:
+            node (File): The node whose contents are requested.
+
+        Returns:
+            Any: Contents of the node.
+        """
+        try:
+            contents = self._entries[node]
+        except KeyError:
+            count("cache.content_miss")
+            contents = node.load()
+            self._entries[node] = contents
+            # Drop least recently used entries once over capacity
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(node)
+        return contents
+
+    def peek(self, node):
+        """
+        Return a node's contents if they are cached, without loading them or
+        counting as a use.
+
+        Args:
+            node (File): The node to look up.
+
+        Returns:
+            Any: Contents of the node, or None if they are not cached.
+        """
+        return self._entries.get(node)
+
+    def put(self, node, contents):
+        """
+        Replace a node's cached contents.
+
+        Args:
+            node (File): The node.
+            contents (Any): Its new contents.
+        """
+        self._entries[node] = contents
+        self._entries.move_to_end(node)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+
+class File(ABC):
+    """
+    Base class representing a generic file in the game. Each kind of file
+    says how its contents are read by implementing load.
+
+    Nodes use __slots__ rather than a per-instance __dict__, which keeps
+    content trees with many thousands of files compact.
+    """
+
+    __slots__ = (
+        "_name",
+        "_path",
+        "_cache",
+        "_executor",
+        "_parent",
+        "_display_path",
+        "_contents",
+    )
+
+    def __init__(self, name, path, cache=None, executor=None, parent=None):
         """
         Initialize a file object and set its name and path.
 
+        Nodes never change the working directory; every read goes through
+        the node's full path, so trees can be loaded from several threads.
+
         Args:
             name (str): File name with a prepended identifier character.
             path (str): Path to the file's directory.
+            cache (ContentCache): Cache to load contents into on demand, or
+                None to load contents immediately.
+            executor (concurrent.futures.Executor): Executor to load
+                contents on when not using a cache, or None to load them on
+                the calling thread.
+            parent (Directory): Directory holding this file, or None for
+                the root.
         """
         self._name = name[1:]  # Remove the leading metadata character
+        self._path = os.path.join(path, name)
+        self._cache = cache
+        self._executor = executor
+        self._parent = parent
+        self._display_path = None
         self._contents = None
-        os.chdir(path)  # Move to the specified path
 
     @property
     def name(self):
@@ -85,6 +475,33 @@ class File:
         """
         return self._name
 
+    @property
+    def parent(self):
+        """
+        Retrieve the directory holding this file.
+
+        Returns:
+            Directory: The parent, or None for the root.
+        """
+        return self._parent
+
+    @property
+    def display_path(self):
+        """
+        Retrieve the /-separated path shown to the player, e.g.
+        /documents/work_documents/nda.txt.
+
+        It is built from the parent's path once and then remembered, so it
+        costs the same at any depth.
+
+        Returns:
+            str: Path from the root to this file.
+        """
+        if self._display_path is None:
+            prefix = "" if self._parent is None else self._parent.display_path
+            self._display_path = f"{prefix}/{self._name}"
+        return self._display_path
+
     @property
     def contents(self):
         """
@@ -93,46 +510,170 @@ class File:
         Returns:
             Any: Contents of the file (text, image, etc.).
         """
+        if self._cache is not None:
+            return self._cache.get(self)
+        if isinstance(self._contents, Future):
+            # Wait for a background load to finish (re-raising its error)
+            self._contents = self._contents.result()
+        elif self._contents is None:
+            # Images are only decoded once something asks for them
+            self._contents = self.load()
         return self._contents
 
+    @property
+    def path(self):
+        """
+        Retrieve the file's full path on disk.
+
+        Returns:
+            str: Path to the file.
+        """
+        return self._path
+
+    @abstractmethod
+    def load(self):
+        """
+        Read the file's contents from disk.
+
+        Returns:
+            Any: Contents of the file.
+        """
+
+    def _load_eagerly(self):
+        """
+        Load contents now, or schedule them on the executor if there is one.
+        """
+        if self._executor is None:
+            self._contents = self.load()
+        else:
+            self._contents = self._executor.submit(self.load)
+
 
 class TextFile(File):
     """
     TextFile represents a readable .txt file within the game.
     """
 
-    def __init__(self, filename, path):
+    __slots__ = ()
+
+    def __init__(self, filename, path, cache=None, executor=None, parent=None):
         """
         Read a .txt file and store its contents.
 
         Args:
             filename (str): The file name.
             path (str): Directory containing the file.
+            cache (ContentCache): Cache for lazy loading, or None.
+            executor (concurrent.futures.Executor): Executor for eager
+                loading, or None.
+            parent (Directory): Directory holding the file, or None.
+        """
+        super().__init__(filename, path, cache, executor, parent)
+        if cache is None:
+            self._load_eagerly()
+
+    @timed("tree.read_text")
+    def load(self):
+        """
+        Read the text file from disk.
+
+        Returns:
+            str: Contents of the file.
+        """
+        # Open the file using UTF-8 encoding and return its contents
+        with open(self._path, "r", encoding="utf-8") as file_obj:
+            return file_obj.read()
+
+    def prebuilt_layout(self, width):  # pylint: disable=unused-argument
+        """
+        Return the file wrapped to a width ahead of time, if it was.
+
+        Args:
+            width (int): Number of characters per row.
+
+        Returns:
+            TextLayout: The layout, or None to wrap the text when needed.
+        """
+        return None
+
+    def lines(self):
+        """
+        Return the lines of the file.
+
+        Returns:
+            iterable: Each line as a str, without its newline.
+        """
+        return self.contents.split("\n")
+
+
+class StreamingTextFile(TextFile):
+    """
+    A large text file that is mapped into memory instead of read.
+
+    Its contents are the raw bytes of the file as a read-only mmap, so
+    pages are only read from disk as the viewer reaches them, and the
+    operating system can drop them again under memory pressure.
+    """
+
+    __slots__ = ()
+
+    def _load_eagerly(self):
         """
-        super().__init__(filename, path)
+        Do nothing; streamed files are never read up front.
+        """
+
+    @timed("tree.map_text")
+    def load(self):
+        """
+        Map the file into memory.
 
-        # Open the file using UTF-8 encoding and store its contents
-        with open(filename, "r", encoding="utf-8") as file_obj:
-            self._contents = file_obj.read()
+        Returns:
+            mmap.mmap: The file's bytes (or b"" for an empty file).
+        """
+        with open(self._path, "rb") as file_obj:
+            if os.fstat(file_obj.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def lines(self):
+        """
+        Decode the lines of the file one at a time.
+
+        Yields:
+            str: Each line, without its newline.
+        """
+        data = self.contents
+        start = 0
+        while True:
+            end = data.find(b"\n", start)
+            if end == -1:
+                yield data[start:].decode("utf-8", errors="replace")
+                return
+            yield data[start:end].decode("utf-8", errors="replace")
+            start = end + 1
 
 
 class ImageFile(File):
     """
     ImageFile represents a .png image within the game.
+
+    The image is decoded when its contents are first needed rather than when
+    the tree is built, so pygame is only loaded by sessions that open an
+    image.
     """
 
-    def __init__(self, filename, path):
-        """
-        Load a .png image file using pygame.
+    __slots__ = ()
 
-        Args:
-            filename (str): The file name.
-            path (str): Directory containing the file.
+    @timed("tree.decode_image")
+    def load(self):
         """
-        super().__init__(filename, path)
+        Decode the image from disk.
 
+        Returns:
+            pygame.Surface: The decoded image.
+        """
         # Use pygame to load the image
-        self._contents = pygame.image.load(filename)
+        return load_pygame().image.load(self._path)
 
 
 class Directory(File):
@@ -140,41 +681,164 @@ class Directory(File):
     Directory represents a navigable folder with other files or directories.
     """
 
-    def __init__(self, filename, path=os.getcwd()):
+    __slots__ = ("_lock_level", "_manifest")
+
+    def __init__(
+        self,
+        filename,
+        path=os.getcwd(),
+        cache=None,
+        executor=None,
+        parent=None,
+        manifest=None,
+    ):
         """
-        Recursively load contents of a directory and set lock level.
+        Load contents of a directory and set lock level.
+
+        Without a cache the whole subtree is loaded recursively. With a cache
+        the directory is lazy: nothing is read until its contents are first
+        accessed, and then only its own entries are listed.
 
         Args:
             filename (str): Name of the directory.
             path (str): Path to parent directory.
+            cache (ContentCache): Cache for lazy loading, or None.
+            executor (concurrent.futures.Executor): Executor that file
+                contents are loaded on when loading eagerly, or None.
+            parent (Directory): Directory holding this one, or None for the
+                root.
+            manifest (Manifest): Lock levels and display order of the tree,
+                or None to inherit the parent's. Without one every
+                directory is open and listed in name order.
         """
-        super().__init__(filename, path)
+        super().__init__(filename, path, cache, executor, parent)
 
-        # Set unlock level based on folder name
+        # Look up the unlock level in the manifest
+        if manifest is None and parent is not None:
+            manifest = parent.manifest
+        self._manifest = manifest
         self._lock_level = 1
-        if filename == "2archive":
-            self._lock_level = 2
-        elif filename == "3message":
-            self._lock_level = 3
-
-        # Go into the specified subdirectory
-        path = os.path.join(path, filename)
-        os.chdir(path)
-
-        self._contents = []
-
-        # Get list of files in directory
-        names = os.listdir(path)
-        names.sort()
-
-        # Recursively load files or subdirectories
-        for name in names:
-            if name.endswith(".txt"):
-                self._contents.append(TextFile(name, path))
-            elif name.endswith(".png"):
-                self._contents.append(ImageFile(name, path))
-            else:
-                self._contents.append(Directory(name, path))
+        if manifest is not None:
+            self._lock_level = manifest.lock_level(self._path)
+
+        if cache is None:
+            # Directory listings are always read on this thread
+            self._contents = self.load()
+
+    @timed("tree.list_directory")
+    def load(self):
+        """
+        List the directory and create a node for each entry.
+
+        Returns:
+            list: File and Directory objects in display order.
+        """
+        return [
+            self._create_node(name, self._executor)
+            for name in self._sorted_names()
+        ]
+
+    def _sorted_names(self):
+        """
+        List the on-disk names of the directory's entries.
+
+        Returns:
+            list: The names, in display order.
+        """
+        names = os.listdir(self._path)
+        if self._manifest is None:
+            return sorted(names)
+        return self._manifest.sort(self._path, names)
+
+    def _create_node(self, name, executor):
+        """
+        Create the node for one entry of the directory.
+
+        Args:
+            name (str): On-disk name of the entry.
+            executor (concurrent.futures.Executor): Executor for eager
+                loading, or None.
+
+        Returns:
+            File: A TextFile, StreamingTextFile, ImageFile or Directory.
+        """
+        path = self._path
+        if name.endswith(".txt"):
+            node_class = TextFile
+            size = os.path.getsize(os.path.join(path, name))
+            if size > STREAMING_THRESHOLD:
+                node_class = StreamingTextFile
+        elif name.endswith(".png"):
+            node_class = ImageFile
+        else:
+            node_class = Directory
+        return node_class(name, path, self._cache, executor, self)
+
+    @property
+    def loaded_contents(self):
+        """
+        Retrieve the directory's entries if they have been listed, without
+        listing them.
+
+        Returns:
+            list: The entries, or None if the directory has not been listed
+                (or its listing was dropped from the cache).
+        """
+        if self._cache is not None:
+            return self._cache.peek(self)
+        return self._contents
+
+    def reload(self, changed=()):
+        """
+        List the directory again, reusing the nodes of unchanged entries.
+
+        Nodes are created, and loaded as on first listing, only for new
+        entries and for those named in changed. The result is not swapped
+        in; pass it to replace_contents.
+
+        Args:
+            changed (set): On-disk names of entries that changed on disk.
+
+        Returns:
+            list: The new entries in display order.
+        """
+        previous = {
+            os.path.basename(node.path): node
+            for node in self.loaded_contents or ()
+        }
+        return [
+            (
+                previous[name]
+                if name in previous and name not in changed
+                else self._create_node(name, None)
+            )
+            for name in self._sorted_names()
+        ]
+
+    def replace_contents(self, contents):
+        """
+        Swap in a new listing, e.g. one made by reload.
+
+        The swap is a single assignment, so a reader sees either the old
+        listing or the new one.
+
+        Args:
+            contents (list): The new entries.
+        """
+        if self._cache is not None:
+            self._cache.put(self, contents)
+        else:
+            self._contents = contents
+
+    @property
+    def manifest(self):
+        """
+        Retrieve the manifest describing this directory's tree.
+
+        Returns:
+            Manifest: The manifest, or None.
+        """
+        return self._manifest
 
     @property
     def lock_level(self):
@@ -182,6 +846,32 @@ class Directory(File):
         Return the required unlock level for this directory.
 
         Returns:
-            int: The lock level (1–3).
+            int: The lock level, from 1 (always open) up to the highest
+                level the manifest defines.
         """
         return self._lock_level
+
+
+def load_tree(filename, path=os.getcwd(), max_workers=None, manifest=None):
+    """
+    Eagerly load a whole directory tree, reading files in parallel.
+
+    The directory structure is listed on the calling thread while text files
+    are read on a thread pool. Every directory and text file has its
+    contents by the time this returns; a file that failed to load raises
+    its error when its contents are accessed. Images are decoded when they
+    are first used.
+
+    Args:
+        filename (str): Name of the root directory.
+        path (str): Path to the root directory's parent.
+        max_workers (int): Number of loader threads, or None for the
+            ThreadPoolExecutor default.
+        manifest (Manifest): Lock levels and display order, or None.
+
+    Returns:
+        Directory: The fully loaded root directory.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        root = Directory(filename, path, executor=executor, manifest=manifest)
+    return root
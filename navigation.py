@@ -0,0 +1,160 @@
+"""
+Navigation state: the stack of files from the root to the open one.
+"""
+
+from model import Directory
+
+
+class NavigationStack:
+    """
+    The files from the root down to the file that is open.
+
+    Opening a file and going back are O(1), and the path shown to the player
+    comes from the open file's remembered display_path rather than being
+    rebuilt on every draw. The child index each file was opened at is kept
+    alongside it, so the path can be saved without searching listings,
+    whose nodes may have been replaced since (e.g. by a ContentCache). The
+    stack holds no UI state, so any front end (curses, a server session or
+    a headless driver) can use it.
+    """
+
+    def __init__(self, root):
+        """
+        Start at the root directory.
+
+        Args:
+            root (Directory): Top-level directory.
+        """
+        self._nodes = [root]
+        # Index of each file below the root in its parent, or None if it
+        # has been removed from the tree
+        self._indices = []
+
+    def __len__(self):
+        """
+        Return the number of files on the stack.
+
+        Returns:
+            int: Depth of the open file, counting the root as 1.
+        """
+        return len(self._nodes)
+
+    def __iter__(self):
+        """
+        Iterate from the root to the open file.
+
+        Returns:
+            iterator: The files on the stack.
+        """
+        return iter(self._nodes)
+
+    @property
+    def root(self):
+        """
+        Retrieve the top-level directory.
+
+        Returns:
+            Directory: The root.
+        """
+        return self._nodes[0]
+
+    @property
+    def current(self):
+        """
+        Retrieve the open file.
+
+        Returns:
+            File: The file at the top of the stack.
+        """
+        return self._nodes[-1]
+
+    @property
+    def path_string(self):
+        """
+        Retrieve the /-separated path of the open file.
+
+        Returns:
+            str: Path shown to the player.
+        """
+        return self._nodes[-1].display_path
+
+    @property
+    def indices(self):
+        """
+        Retrieve the child index of each file below the root, the form
+        open_path takes, e.g. to save the path.
+
+        Returns:
+            tuple: Index of each file in its parent's contents, stopping
+                before the first file that was removed from the tree.
+        """
+        try:
+            return tuple(self._indices[: self._indices.index(None)])
+        except ValueError:
+            return tuple(self._indices)
+
+    def push(self, file, index):
+        """
+        Open a file inside the current directory.
+
+        Args:
+            file (File): The file to open.
+            index (int): Its index in the directory's contents.
+        """
+        self._nodes.append(file)
+        self._indices.append(index)
+
+    def pop(self):
+        """
+        Go back to the parent of the open file, unless at the root.
+
+        Returns:
+            bool: True if the stack changed.
+        """
+        if len(self._nodes) > 1:
+            self._nodes.pop()
+            self._indices.pop()
+            return True
+        return False
+
+    def open_path(self, indices):
+        """
+        Replace the stack with the files reached from the root by child
+        index, e.g. to open a search result.
+
+        The stack is left alone if the path does not lead anywhere in the
+        tree, e.g. because the tree changed since the path was recorded.
+
+        Args:
+            indices (tuple): Index of each child on the way down.
+
+        Returns:
+            bool: True if the path was opened.
+        """
+        nodes = [self._nodes[0]]
+        for index in indices:
+            if not isinstance(nodes[-1], Directory):
+                return False
+            contents = nodes[-1].contents
+            if not 0 <= index < len(contents):
+                return False
+            nodes.append(contents[index])
+        self._nodes = nodes
+        self._indices = list(indices)
+        return True
+
+    def reindex(self, directories):
+        """
+        Find the files on the stack again in directories whose listings were
+        replaced, since their indices may have changed.
+
+        Args:
+            directories (set): The directories that changed.
+        """
+        for position, parent in enumerate(self._nodes[:-1]):
+            if parent in directories:
+                try:
+                    index = parent.contents.index(self._nodes[position + 1])
+                except ValueError:
+                    index = None  # Removed; the path is saved up to here
+                self._indices[position] = index
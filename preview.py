@@ -0,0 +1,369 @@
+"""
+In-terminal image previews drawn with half-block characters.
+
+Each character cell shows two pixels: an upper half block in the colour of
+the top pixel, over a background in the colour of the bottom pixel. An
+image is scaled to fit the cell grid with pygame.transform.smoothscale,
+its pixels are matched to the terminal's palette, and each foreground and
+background combination is given a curses colour pair. Renders are cached
+per image and grid size, so reopening an image, or showing it to many
+server sessions, only costs the draw.
+"""
+
+import curses
+from collections import Counter, OrderedDict
+from operator import add
+from media import load_pygame
+from metrics import timed
+
+HALF_BLOCK = "▀"
+
+# Colour pairs reachable through curses.color_pair attributes
+MAX_PAIRS = 255
+
+# Channel levels of the xterm 256-colour cube (colours 16 to 231)
+_CUBE_LEVELS = (0, 95, 135, 175, 215, 255)
+
+
+class Palette:
+    """
+    The colours a terminal can show, as a cube of channel levels.
+    """
+
+    def __init__(self, colors):
+        """
+        Choose the palette for a number of terminal colours.
+
+        Args:
+            colors (int): Number of colours the terminal supports, at least
+                8. With 256 or more the xterm colour cube is used, otherwise
+                the 8 basic colours.
+        """
+        if colors >= 256:
+            self._levels = _CUBE_LEVELS
+            self._numbers = [
+                16 + 36 * red + 6 * green + blue
+                for red in range(6)
+                for green in range(6)
+                for blue in range(6)
+            ]
+        else:
+            # curses numbers the basic colours with red, green and blue bits
+            self._levels = (0, 255)
+            self._numbers = [
+                red + 2 * green + 4 * blue
+                for red in range(2)
+                for green in range(2)
+                for blue in range(2)
+            ]
+        size = len(self._levels)
+        self._rgb = [
+            (self._levels[red], self._levels[green], self._levels[blue])
+            for red in range(size)
+            for green in range(size)
+            for blue in range(size)
+        ]
+        # Nearest level for every channel value, pre-multiplied by its
+        # place in the colour's index
+        nearest = []
+        for value in range(256):
+            distances = [abs(level - value) for level in self._levels]
+            nearest.append(distances.index(min(distances)))
+        self._red = [level * size * size for level in nearest]
+        self._green = [level * size for level in nearest]
+        self._blue = nearest
+
+    def quantize(self, pixels):
+        """
+        Match RGB pixels to the palette.
+
+        Args:
+            pixels (bytes): Three bytes per pixel.
+
+        Returns:
+            list: Palette index of each pixel.
+        """
+        red, green, blue = self._red, self._green, self._blue
+        return [
+            red[pixels[offset]]
+            + green[pixels[offset + 1]]
+            + blue[pixels[offset + 2]]
+            for offset in range(0, len(pixels), 3)
+        ]
+
+    def number(self, index):
+        """
+        Return the terminal's number for a palette colour.
+
+        Args:
+            index (int): Palette index.
+
+        Returns:
+            int: Colour number for curses.init_pair.
+        """
+        return self._numbers[index]
+
+    def rgb(self, index):
+        """
+        Return the red, green and blue values of a palette colour.
+
+        Args:
+            index (int): Palette index.
+
+        Returns:
+            tuple: The channel values.
+        """
+        return self._rgb[index]
+
+
+class ImagePreview:  # pylint: disable=too-few-public-methods
+    """
+    An image rendered to a grid of character cells.
+
+    Attributes:
+        pairs (list): Foreground and background colour numbers of each
+            colour pair used, for pair numbers counting from 1.
+        rows (list): For each row of cells, (column, text, pair) runs of
+            cells sharing a colour pair.
+    """
+
+    def __init__(self, pairs, rows):
+        """
+        Store a rendered preview.
+
+        Args:
+            pairs (list): Colour numbers of each pair.
+            rows (list): Runs of cells on each row.
+        """
+        self.pairs = pairs
+        self.rows = rows
+
+
+def _scale_to_grid(surface, cols, rows):
+    """
+    Scale an image to fit a grid of cells, two pixels per cell.
+
+    Args:
+        surface (pygame.Surface): The image.
+        cols (int): Grid width in cells.
+        rows (int): Grid height in cells.
+
+    Returns:
+        pygame.Surface: The image scaled to at most cols by 2 * rows
+            pixels, keeping its aspect ratio.
+    """
+    pygame = load_pygame()
+    width, height = surface.get_size()
+    scale = min(cols / width, 2 * rows / height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if surface.get_bitsize() not in (24, 32):
+        # smoothscale only works on 24 and 32-bit surfaces
+        copy = pygame.Surface(surface.get_size(), 0, 32)
+        copy.blit(surface, (0, 0))
+        surface = copy
+    return pygame.transform.smoothscale(surface, size)
+
+
+def _choose_pairs(cells, palette, max_pairs):
+    """
+    Give colour pairs to the most common cell colours, and map every other
+    combination to the closest one that has a pair.
+
+    Args:
+        cells (list): (top, bottom) palette indices of each cell.
+        palette (Palette): The palette the indices refer to.
+        max_pairs (int): Number of colour pairs available.
+
+    Returns:
+        tuple: The combinations given pairs, in pair order, and the pair
+            number (from 1) to draw each combination with.
+    """
+    counts = Counter(cells)
+    chosen = [combination for combination, _ in counts.most_common(max_pairs)]
+    pair_of = {combination: pair for pair, combination in enumerate(chosen, 1)}
+
+    # Squared distance from a palette colour to the top (or bottom) colour
+    # of every chosen combination, worked out once per colour
+    halves = (
+        [palette.rgb(top) for top, _ in chosen],
+        [palette.rgb(bottom) for _, bottom in chosen],
+    )
+    distances = ({}, {})
+
+    def distance_row(half, index):
+        row = distances[half].get(index)
+        if row is None:
+            red, green, blue = palette.rgb(index)
+            row = distances[half][index] = [
+                (red - r) ** 2 + (green - g) ** 2 + (blue - b) ** 2
+                for r, g, b in halves[half]
+            ]
+        return row
+
+    for top, bottom in counts:
+        if (top, bottom) not in pair_of:
+            costs = list(
+                map(add, distance_row(0, top), distance_row(1, bottom))
+            )
+            pair_of[top, bottom] = costs.index(min(costs)) + 1
+    return chosen, pair_of
+
+
+@timed("preview.render")
+def render_preview(surface, cols, rows, colors, max_pairs=MAX_PAIRS):
+    """
+    Render an image as half-block characters.
+
+    Args:
+        surface (pygame.Surface): The image.
+        cols (int): Width available in cells.
+        rows (int): Height available in cells.
+        colors (int): Number of colours the terminal supports.
+        max_pairs (int): Number of colour pairs available.
+
+    Returns:
+        ImagePreview: The rendered image, centred horizontally.
+    """
+    pygame = load_pygame()
+    palette = Palette(colors)
+    scaled = _scale_to_grid(surface, cols, rows)
+    width, height = scaled.get_size()
+    indices = palette.quantize(pygame.image.tobytes(scaled, "RGB"))
+    if height % 2:
+        # Give the last row of cells a black bottom half
+        indices.extend([0] * width)
+        height += 1
+    cells = [
+        (indices[top + x], indices[top + width + x])
+        for top in range(0, height * width, 2 * width)
+        for x in range(width)
+    ]
+    chosen, pair_of = _choose_pairs(cells, palette, max_pairs)
+
+    left = (cols - width) // 2
+    preview_rows = []
+    for start in range(0, len(cells), width):
+        runs = []
+        run_start = 0
+        run_pair = pair_of[cells[start]]
+        for x in range(1, width + 1):
+            pair = pair_of[cells[start + x]] if x < width else None
+            if pair != run_pair:
+                runs.append(
+                    (left + run_start, HALF_BLOCK * (x - run_start), run_pair)
+                )
+                run_start, run_pair = x, pair
+        preview_rows.append(runs)
+
+    pairs = [
+        (palette.number(top), palette.number(bottom)) for top, bottom in chosen
+    ]
+    return ImagePreview(pairs, preview_rows)
+
+
+class PreviewCache:
+    """
+    Least-recently-used cache of image previews per image and grid size.
+    """
+
+    def __init__(self, max_entries=64):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int): Maximum number of previews kept.
+        """
+        self._max_entries = max_entries
+        self._previews = OrderedDict()
+
+    def __len__(self):
+        """
+        Return the number of cached previews.
+
+        Returns:
+            int: Number of entries.
+        """
+        return len(self._previews)
+
+    def get(self, file, cols, rows, colors, max_pairs=MAX_PAIRS):
+        """
+        Return the preview of an image, rendering it if not cached.
+
+        Args:
+            file (ImageFile): The image.
+            cols (int): Width available in cells.
+            rows (int): Height available in cells.
+            colors (int): Number of colours the terminal supports.
+            max_pairs (int): Number of colour pairs available.
+
+        Returns:
+            ImagePreview: The rendered image.
+        """
+        key = (file, cols, rows, colors, max_pairs)
+        try:
+            preview = self._previews[key]
+        except KeyError:
+            preview = render_preview(
+                file.contents, cols, rows, colors, max_pairs
+            )
+            self._previews[key] = preview
+            while len(self._previews) > self._max_entries:
+                self._previews.popitem(last=False)
+        else:
+            self._previews.move_to_end(key)
+        return preview
+
+
+class TerminalColors:
+    """
+    The colour support of a screen, and the colour pairs defined on it.
+
+    Screens that are not curses windows (such as VirtualScreen) provide
+    their own colors, color_pairs, init_pair and color_pair.
+    """
+
+    def __init__(self, stdscr):
+        """
+        Read a screen's colour support.
+
+        Args:
+            stdscr: Curses window, after curses.start_color, or a screen
+                with its own colour methods.
+        """
+        self.colors = getattr(stdscr, "colors", None)
+        pair_count = getattr(stdscr, "color_pairs", None)
+        if self.colors is None:
+            self.colors = curses.COLORS if curses.has_colors() else 0
+            pair_count = curses.COLOR_PAIRS if self.colors else 0
+        self.max_pairs = max(0, min(MAX_PAIRS, pair_count - 1))
+        self._init_pair = getattr(stdscr, "init_pair", curses.init_pair)
+        self._color_pair = getattr(stdscr, "color_pair", curses.color_pair)
+        self._defined = {}
+
+    @property
+    def usable(self):
+        """
+        Check whether previews can be drawn in colour.
+
+        Returns:
+            bool: True if there are at least 8 colours and a pair.
+        """
+        return self.colors >= 8 and self.max_pairs > 0
+
+    def attributes(self, pairs):
+        """
+        Define colour pairs, skipping those already defined the same way.
+
+        Args:
+            pairs (list): Foreground and background of pairs 1, 2 and on.
+
+        Returns:
+            list: The attribute to draw with for each pair.
+        """
+        attributes = []
+        for pair, colors in enumerate(pairs, 1):
+            if self._defined.get(pair) != colors:
+                self._init_pair(pair, *colors)
+                self._defined[pair] = colors
+            attributes.append(self._color_pair(pair))
+        return attributes
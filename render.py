@@ -0,0 +1,107 @@
+"""
+Differential screen rendering.
+
+FrameRenderer collects the text for a whole screen, compares it with the
+screen it drew last time, and only rewrites the rows that changed, so
+moving between screens never forces a full terminal repaint. Each frame
+is sent with a single noutrefresh/doupdate. Text that falls outside the
+screen, e.g. just after the terminal shrank, is cut off rather than drawn,
+as is the bottom-right cell, which curses cannot write.
+"""
+
+import curses
+from metrics import timed
+
+
+class FrameRenderer:
+    """
+    Draws frames of text, rewriting only rows that differ from the last.
+    """
+
+    def __init__(self, stdscr):
+        """
+        Initialize a renderer for a blank screen.
+
+        Args:
+            stdscr: Curses window to draw on. Screens that are not curses
+                windows (such as VirtualScreen) provide their own doupdate.
+        """
+        self._stdscr = stdscr
+        self._doupdate = getattr(stdscr, "doupdate", curses.doupdate)
+        self._frame = {}
+        self._shown = {}
+
+    def begin(self):
+        """
+        Start a new, empty frame.
+        """
+        self._frame = {}
+
+    def put(self, row, col, text, attr=0):
+        """
+        Add text to the frame.
+
+        Args:
+            row (int): Screen row.
+            col (int): Screen column.
+            text (str): Text to show there.
+            attr (int): Curses attribute, such as a colour pair, or 0.
+        """
+        self._frame.setdefault(row, []).append((col, text, attr))
+
+    def clear_rows(self, start, stop):
+        """
+        Remove rows from the frame.
+
+        Args:
+            start (int): First row to remove.
+            stop (int): Row to stop before.
+        """
+        for row in range(start, stop):
+            self._frame.pop(row, None)
+
+    @timed("render.present")
+    def present(self, cursor=None):
+        """
+        Draw the rows of the frame that changed and update the terminal.
+
+        Args:
+            cursor (tuple): Row and column to leave the cursor at, or None.
+        """
+        height, width = self._stdscr.getmaxyx()
+        for row in sorted(self._frame.keys() | self._shown.keys()):
+            if row >= height:
+                continue
+            # Curses fails writing the bottom-right cell, so the last row
+            # stops one column short
+            end = width - 1 if row == height - 1 else width
+            segments = tuple(
+                (col, text[: end - col], attr)
+                for col, text, attr in self._frame.get(row, ())
+                if col < end
+            )
+            if segments == self._shown.get(row, ()):
+                continue
+            self._stdscr.move(row, 0)
+            self._stdscr.clrtoeol()
+            for col, text, attr in segments:
+                if attr:
+                    self._stdscr.addstr(row, col, text, attr)
+                else:
+                    self._stdscr.addstr(row, col, text)
+            if segments:
+                self._shown[row] = segments
+            else:
+                del self._shown[row]
+        if cursor is not None:
+            row, col = cursor
+            self._stdscr.move(min(row, height - 1), min(col, width - 1))
+        self._stdscr.noutrefresh()
+        self._doupdate()
+
+    def invalidate(self):
+        """
+        Forget what is on screen so the next frame repaints every row.
+        """
+        self._stdscr.clear()
+        self._shown = {}
@@ -0,0 +1,175 @@
+"""
+Persistent save state for players.
+
+SaveStore keeps each player's unlock level and open path in a SQLite
+database, along with a hash of the passphrase server players prove their
+name with. Every save is held in memory and handed to a background thread,
+which writes whatever has piled up in one transaction, so saving never
+waits on the disk. Resuming reads the in-memory copy, which is filled from
+the database once when the store opens.
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+from time import monotonic
+
+SaveState = namedtuple(
+    "SaveState", ["unlock_level", "path", "secret"], defaults=(None,)
+)
+SaveState.__doc__ = """
+What a player had reached when they last played.
+
+Attributes:
+    unlock_level (int): The player's unlock level.
+    path (tuple): Child index of each file from the root to the one open.
+    secret (str): model.hash_password hash of the passphrase that proves
+        the player's name, or None if they never chose one.
+"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS saves (
+    player TEXT PRIMARY KEY,
+    unlock_level INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    secret TEXT
+)
+"""
+
+
+class SaveStore:
+    """
+    Player saves in a SQLite database, written in the background.
+    """
+
+    def __init__(self, path, flush_interval=0.5):
+        """
+        Open (or create) a save database and read every save into memory.
+
+        Args:
+            path (str): Path to the SQLite database.
+            flush_interval (float): Seconds the writer collects saves for
+                before writing them together.
+        """
+        self._path = path
+        self._flush_interval = flush_interval
+        connection = sqlite3.connect(path)
+        try:
+            with connection:
+                connection.execute(_SCHEMA)
+                columns = {
+                    row[1]
+                    for row in connection.execute("PRAGMA table_info(saves)")
+                }
+                if "secret" not in columns:
+                    # Databases from before passphrases
+                    connection.execute(
+                        "ALTER TABLE saves ADD COLUMN secret TEXT"
+                    )
+            rows = connection.execute(
+                "SELECT player, unlock_level, path, secret FROM saves"
+            ).fetchall()
+        finally:
+            connection.close()
+        self._states = {
+            player: SaveState(level, tuple(json.loads(indices)), secret)
+            for player, level, indices, secret in rows
+        }
+        self._pending = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    def load(self, player):
+        """
+        Return a player's last save.
+
+        Args:
+            player (str): The player's name.
+
+        Returns:
+            SaveState: The save, or None for a new player.
+        """
+        return self._states.get(player)
+
+    def save(self, player, unlock_level, path):
+        """
+        Record a player's progress; it is written to disk shortly after.
+
+        Args:
+            player (str): The player's name.
+            unlock_level (int): The player's unlock level.
+            path (tuple): Child index of each file on the open path.
+        """
+        previous = self._states.get(player)
+        secret = None if previous is None else previous.secret
+        self._put(player, SaveState(unlock_level, tuple(path), secret))
+
+    def claim(self, player, secret):
+        """
+        Give a player name a passphrase, starting its progress afresh.
+
+        Args:
+            player (str): The player's name.
+            secret (str): model.hash_password hash of the passphrase.
+        """
+        self._put(player, SaveState(1, (), secret))
+
+    def _put(self, player, state):
+        """
+        Keep a save in memory and queue it to be written.
+
+        Args:
+            player (str): The player's name.
+            state (SaveState): The save.
+        """
+        if self._states.get(player) != state:
+            self._states[player] = state
+            self._pending.put((player, state))
+
+    def _write_loop(self):
+        """
+        Write saves to the database until close puts None in the queue.
+        """
+        connection = sqlite3.connect(self._path)
+        running = True
+        while running:
+            batch = {}
+            item = self._pending.get()
+            deadline = monotonic() + self._flush_interval
+            # Gather the saves made in the next flush_interval, keeping only
+            # each player's latest
+            while item is not None:
+                batch[item[0]] = item[1]
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            else:
+                running = False
+            if batch:
+                with connection:
+                    connection.executemany(
+                        "INSERT OR REPLACE INTO saves VALUES (?, ?, ?, ?)",
+                        [
+                            (
+                                player,
+                                state.unlock_level,
+                                json.dumps(state.path),
+                                state.secret,
+                            )
+                            for player, state in batch.items()
+                        ],
+                    )
+        connection.close()
+
+    def close(self):
+        """
+        Write any saves still pending and stop the writer.
+        """
+        self._pending.put(None)
+        self._writer.join()
@@ -0,0 +1,382 @@
+"""
+Virtual terminal screen for sessions that are not attached to curses.
+
+VirtualScreen implements the parts of the curses window interface that the
+View uses, keeps the screen contents in memory, and on refresh writes the
+changed rows as ANSI escape sequences. Colour pairs are sent as 256-colour
+SGR codes, which players' terminals are assumed to support. KeyDecoder
+turns the bytes a terminal sends into the key names curses' getkey
+returns.
+"""
+
+import curses
+
+
+class VirtualScreen:
+    """
+    An in-memory stand-in for a curses window.
+    """
+
+    def __init__(self, rows=24, cols=80, write=None):
+        """
+        Create a blank screen.
+
+        Args:
+            rows (int): Screen height.
+            cols (int): Screen width.
+            write (callable): Called with the bytes produced by each
+                refresh, or None to discard them.
+        """
+        self._rows = rows
+        self._cols = cols
+        self._write = write
+        self._lines = [""] * rows
+        self._shown = [""] * rows
+        # Colour pair of each character on rows that have colour, else None
+        self._colors = [None] * rows
+        self._shown_colors = [None] * rows
+        self._pairs = {}
+        self._cleared = True
+        self._cursor = (0, 0)
+        self._keys = []
+
+    def getmaxyx(self):
+        """
+        Return the screen size.
+
+        Returns:
+            tuple: Number of rows and columns.
+        """
+        return self._rows, self._cols
+
+    def resize(self, rows, cols):
+        """
+        Change the screen size, as when the player's terminal is resized.
+
+        The screen is blanked and repainted in full on the next update,
+        since the terminal's contents are unknown after a resize.
+
+        Args:
+            rows (int): New height.
+            cols (int): New width.
+        """
+        self._rows = rows
+        self._cols = cols
+        self.clear()
+
+    @property
+    def colors(self):
+        """
+        Retrieve the number of colours the screen can show.
+
+        Returns:
+            int: Always 256.
+        """
+        return 256
+
+    @property
+    def color_pairs(self):
+        """
+        Retrieve the number of colour pairs, counting the default pair 0.
+
+        Returns:
+            int: Always 256.
+        """
+        return 256
+
+    def init_pair(self, pair, foreground, background):
+        """
+        Define a colour pair, recolouring text already drawn with it.
+
+        Args:
+            pair (int): Pair number, from 1.
+            foreground (int): Colour number of the text.
+            background (int): Colour number behind it.
+        """
+        if self._pairs.get(pair) == (foreground, background):
+            return
+        self._pairs[pair] = (foreground, background)
+        for row, colors in enumerate(self._colors):
+            if colors is not None and pair in colors:
+                self._shown_colors[row] = ()  # Resend the row
+
+    @staticmethod
+    def color_pair(pair):
+        """
+        Return the attribute that draws text in a colour pair.
+
+        Args:
+            pair (int): Pair number.
+
+        Returns:
+            int: The attribute, encoded as curses encodes it.
+        """
+        return pair << 8
+
+    @property
+    def lines(self):
+        """
+        Retrieve the text on each row of the screen.
+
+        Returns:
+            list: One string per row.
+        """
+        return list(self._lines)
+
+    def nodelay(self, flag):
+        """
+        Accept the curses call; reads from this screen never block.
+
+        Args:
+            flag (bool): Ignored.
+        """
+
+    def push_keys(self, keys):
+        """
+        Queue keys to be returned by getkey.
+
+        Args:
+            keys (list): Key names.
+        """
+        self._keys.extend(keys)
+
+    def getkey(self):
+        """
+        Return the next queued key.
+
+        Returns:
+            str: Key name.
+
+        Raises:
+            curses.error: If no key is queued.
+        """
+        if not self._keys:
+            raise curses.error("no input")
+        return self._keys.pop(0)
+
+    def clear(self):
+        """
+        Blank the screen and repaint everything on the next refresh.
+        """
+        self._lines = [""] * self._rows
+        self._colors = [None] * self._rows
+        self._cleared = True
+        self._cursor = (0, 0)
+
+    def move(self, row, col):
+        """
+        Move the cursor.
+
+        Args:
+            row (int): Row to move to.
+            col (int): Column to move to.
+        """
+        self._cursor = (row, col)
+
+    def clrtoeol(self):
+        """
+        Erase from the cursor to the end of its row.
+        """
+        row, col = self._cursor
+        self._lines[row] = self._lines[row][:col]
+        colors = self._colors[row]
+        if colors is not None:
+            self._colors[row] = colors[:col] if any(colors[:col]) else None
+
+    def addstr(self, *args):
+        """
+        Write text at a position, or at the cursor if none is given.
+
+        Args:
+            *args: (text,) or (row, col, text), optionally followed by an
+                attribute holding a colour pair.
+
+        Raises:
+            curses.error: If the position is off the screen, or the text
+                fills the bottom-right cell.
+        """
+        if len(args) >= 3:
+            row, col, text, *attr = args
+        else:
+            (row, col), (text, *attr) = self._cursor, args
+        if not (0 <= row < self._rows and 0 <= col < self._cols):
+            raise curses.error("addstr() returned ERR")
+        text = str(text)[: self._cols - col]
+        # Like curses, fail after filling the bottom-right cell
+        corner = row == self._rows - 1 and col + len(text) == self._cols
+        line = self._lines[row].ljust(col)
+        self._lines[row] = line[:col] + text + line[col + len(text) :]
+        self._cursor = (row, col + len(text))
+
+        pair = (attr[0] >> 8) & 0xFF if attr else 0
+        colors = self._colors[row]
+        if pair or colors is not None:
+            colors = list(colors or ())
+            colors.extend([0] * (len(self._lines[row]) - len(colors)))
+            colors[col : col + len(text)] = [pair] * len(text)
+            self._colors[row] = colors if any(colors) else None
+        if corner:
+            raise curses.error("addstr() returned ERR")
+
+    def noutrefresh(self):
+        """
+        Accept the curses call; changes are sent by doupdate.
+        """
+
+    def refresh(self):
+        """
+        Send the rows that changed since the last refresh.
+        """
+        self.doupdate()
+
+    def _colored_row(self, row, line, colors):
+        """
+        Encode a whole row with the SGR codes of its colour pairs.
+
+        Args:
+            row (int): Screen row.
+            line (str): Its text.
+            colors (list): Colour pair of each character, or None.
+
+        Returns:
+            str: Escape sequences that redraw the row.
+        """
+        output = [f"\x1b[{row + 1};1H"]
+        current = 0
+        for char, pair in zip(line, colors or [0] * len(line)):
+            if pair != current:
+                if pair:
+                    foreground, background = self._pairs.get(pair, (7, 0))
+                    output.append(f"\x1b[38;5;{foreground};48;5;{background}m")
+                else:
+                    output.append("\x1b[0m")
+                current = pair
+            output.append(char)
+        output.append("\x1b[0m\x1b[K")
+        return "".join(output)
+
+    def doupdate(self):
+        """
+        Send the changes since the last update.
+
+        Like curses, only the changed part of each row is rewritten, and
+        rows that became blank at the bottom are erased in one go.
+        """
+        output = []
+        if self._cleared:
+            output.append("\x1b[H\x1b[2J")
+            self._shown = [""] * self._rows
+            self._shown_colors = [None] * self._rows
+            self._cleared = False
+
+        # Erase everything below the last row that still has text
+        last = max(
+            (row for row, line in enumerate(self._lines) if line), default=-1
+        )
+        if any(self._shown[last + 1 :]):
+            output.append(f"\x1b[{last + 2};1H\x1b[J")
+            self._shown[last + 1 :] = [""] * (self._rows - last - 1)
+            self._shown_colors[last + 1 :] = [None] * (self._rows - last - 1)
+
+        for row, line in enumerate(self._lines):
+            shown = self._shown[row]
+            colors = self._colors[row]
+            if colors is not None or self._shown_colors[row] is not None:
+                if line != shown or colors != self._shown_colors[row]:
+                    output.append(self._colored_row(row, line, colors))
+                    self._shown[row] = line
+                    self._shown_colors[row] = colors
+                continue
+            if line == shown:
+                continue
+            # Skip the part of the row that is already on screen
+            start = 0
+            limit = min(len(line), len(shown))
+            while start < limit and line[start] == shown[start]:
+                start += 1
+            output.append(f"\x1b[{row + 1};{start + 1}H{line[start:]}")
+            if len(line) < len(shown):
+                output.append("\x1b[K")
+            self._shown[row] = line
+        row, col = self._cursor
+        output.append(f"\x1b[{row + 1};{col + 1}H")
+        if self._write is not None:
+            self._write("".join(output).encode("utf-8"))
+
+
+class KeyDecoder:
+    """
+    Converts terminal input bytes into curses-style key names.
+    """
+
+    _SEQUENCES = {
+        "\x1b[A": "KEY_UP",
+        "\x1b[B": "KEY_DOWN",
+        "\x1b[C": "KEY_RIGHT",
+        "\x1b[D": "KEY_LEFT",
+        "\x1b[H": "KEY_HOME",
+        "\x1b[F": "KEY_END",
+        "\x1b[1~": "KEY_HOME",
+        "\x1b[4~": "KEY_END",
+        "\x1b[5~": "KEY_PPAGE",
+        "\x1b[6~": "KEY_NPAGE",
+        "\x1bOA": "KEY_UP",
+        "\x1bOB": "KEY_DOWN",
+        "\x1bOH": "KEY_HOME",
+        "\x1bOF": "KEY_END",
+    }
+    _PREFIXES = {
+        sequence[:length]
+        for sequence in _SEQUENCES
+        for length in range(1, len(sequence))
+    }
+
+    def __init__(self):
+        """
+        Create a decoder with nothing buffered.
+        """
+        self._pending = ""
+
+    def feed(self, data):
+        """
+        Decode a chunk of input.
+
+        An escape sequence split across chunks is held until the rest of it
+        arrives.
+
+        Args:
+            data (bytes): Bytes read from the terminal.
+
+        Returns:
+            list: Key names in the order they were typed.
+        """
+        text = self._pending + data.decode("utf-8", errors="ignore")
+        self._pending = ""
+        keys = []
+        index = 0
+        while index < len(text):
+            char = text[index]
+            if char == "\x1b":
+                for sequence, name in self._SEQUENCES.items():
+                    if text.startswith(sequence, index):
+                        keys.append(name)
+                        index += len(sequence)
+                        break
+                else:
+                    # Hold a partial sequence, but a lone Escape is a key
+                    if text[index:] in self._PREFIXES and len(text) > index + 1:
+                        self._pending = text[index:]
+                        return keys
+                    keys.append(char)
+                    index += 1
+                continue
+            if char == "\r":
+                char = "\n"
+                # Terminals may send \r\n or \r\0 for Enter
+                if text[index + 1 : index + 2] in ("\n", "\0"):
+                    index += 1
+            elif char in ("\x7f", "\x08"):
+                char = "KEY_BACKSPACE"
+            keys.append(char)
+            index += 1
+        return keys
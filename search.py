@@ -0,0 +1,482 @@
+"""
+Full-text search over the text files in a content tree.
+
+SearchIndex keeps an inverted index from each word to the documents and
+line numbers it appears on. Results are ranked by TF-IDF and filtered by
+the lock levels of the directories holding each document. An index can
+be saved as a prebuilt artifact with python search.py 1documents
+1documents.idx, and loaded instead of indexing at startup. A saved index
+records a fingerprint of the tree it describes, and is rebuilt rather
+than used if the tree no longer matches it. When listings change while
+the game runs, only the documents below the changed directories are
+indexed again.
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import sys
+from collections import namedtuple
+from manifest import MANIFEST_PATH, Manifest
+from model import Directory, TextFile
+
+WORD = re.compile(r"\w+")
+
+SearchHit = namedtuple("SearchHit", ["indices", "path", "score", "lines"])
+SearchHit.__doc__ = """
+A document matching a search.
+
+Attributes:
+    indices (tuple): Child index of each node on the way from the root.
+    path (str): /-separated path of the document.
+    score (float): Relevance; higher is better.
+    lines (list): Line numbers (from 1) where query words appear.
+"""
+
+
+def tree_fingerprint(root):
+    """
+    Summarise a tree, to tell whether an index still describes it.
+
+    The fingerprint covers the name, kind and lock level of every node in
+    listing order, and the size and modification time of files on disk, so
+    adding, removing, reordering, relocking or editing a file changes it.
+
+    Args:
+        root (Directory): Top-level directory.
+
+    Returns:
+        str: The fingerprint, in hex.
+    """
+    digest = hashlib.sha256()
+    nodes = [(root, 0)]
+    while nodes:
+        node, depth = nodes.pop()
+        if isinstance(node, Directory):
+            entry = f"{depth} dir {node.name} {node.lock_level}"
+            nodes.extend(
+                (child, depth + 1) for child in reversed(node.contents)
+            )
+        else:
+            kind = "text" if isinstance(node, TextFile) else "file"
+            try:
+                stat = os.stat(node.path)
+                entry = f"{depth} {kind} {node.name} {stat.st_size} "
+                entry += str(stat.st_mtime_ns)
+            except OSError:
+                entry = f"{depth} {kind} {node.name}"
+        digest.update(entry.encode("utf-8", errors="surrogateescape") + b"\n")
+    return digest.hexdigest()
+
+
+def tokenize(text):
+    """
+    Split text into lowercase words.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        list: The words.
+    """
+    return WORD.findall(text.lower())
+
+
+def word_lines(text_lines):
+    """
+    Find the lines each word of a file appears on.
+
+    Args:
+        text_lines (iterable): The file's lines.
+
+    Returns:
+        dict: Line numbers (from 1) of each word.
+    """
+    lines_by_word = {}
+    for line_number, line in enumerate(text_lines, start=1):
+        for word in tokenize(line):
+            lines_by_word.setdefault(word, []).append(line_number)
+    return lines_by_word
+
+
+class SearchIndex:
+    """
+    Inverted index of the words in a tree's text files.
+    """
+
+    def __init__(
+        self, root=None, documents=None, postings=None, fingerprint=None
+    ):
+        """
+        Create an index of a tree.
+
+        The tree is read the first time the index is searched, so creating
+        an index does not slow down startup.
+
+        Args:
+            root (Directory): Top-level directory to index, or None.
+            documents (list): Already indexed documents, as loaded by load.
+            postings (dict): Already indexed words, as loaded by load.
+            fingerprint (str): tree_fingerprint of the tree the documents
+                and postings were indexed from. Unless root still matches
+                it, root is indexed again.
+        """
+        self._tree = root
+        self._root = root
+        # Documents removed by apply_update are None until compacted
+        self._documents = [] if documents is None else documents
+        self._live = len(self._documents)
+        # The TextFile each document was read from, or None if loaded
+        self._sources = [None] * len(self._documents)
+        self._postings = {} if postings is None else postings
+        self._fingerprint = fingerprint
+
+    @property
+    def document_count(self):
+        """
+        Retrieve the number of indexed text files.
+
+        Returns:
+            int: Number of documents.
+        """
+        self.build()
+        return self._live
+
+    def rebuild(self, root):
+        """
+        Index a tree again the next time the index is searched, e.g. after
+        its content changed.
+
+        Args:
+            root (Directory): Top-level directory to index.
+        """
+        self._tree = root
+        self._root = root
+        self._documents = []
+        self._live = 0
+        self._sources = []
+        self._postings = {}
+        self._fingerprint = None
+
+    def build(self):
+        """
+        Index the tree if that has not happened yet, or check that a loaded
+        index still matches it.
+
+        Searching does this first, so calling it is only needed to do the
+        work ahead of time, e.g. on a worker thread before a server starts
+        taking searches.
+        """
+        if self._root is None:
+            return
+        root, self._root = self._root, None
+        fingerprint, self._fingerprint = self._fingerprint, None
+        if fingerprint is not None and tree_fingerprint(root) == fingerprint:
+            return
+        self._documents = []
+        self._live = 0
+        self._sources = []
+        self._postings = {}
+        for node, indices, path, lock_level in self._text_files(
+            root, (), root.display_path, root.lock_level
+        ):
+            self._add_document(
+                node, indices, path, lock_level, word_lines(node.lines())
+            )
+
+    def _text_files(self, directory, indices, path, lock_level):
+        """
+        Find every text file below a directory.
+
+        Args:
+            directory (Directory): The directory.
+            indices (tuple): Child indices leading to the directory.
+            path (str): /-separated path of the directory.
+            lock_level (int): Highest lock level on the way to it.
+
+        Yields:
+            tuple: The file, its child indices, its path and the lock level
+                needed to reach it.
+        """
+        for index, child in enumerate(directory.contents):
+            child_indices = indices + (index,)
+            child_path = f"{path}/{child.name}"
+            if isinstance(child, Directory):
+                yield from self._text_files(
+                    child,
+                    child_indices,
+                    child_path,
+                    max(lock_level, child.lock_level),
+                )
+            elif isinstance(child, TextFile):
+                yield child, child_indices, child_path, lock_level
+
+    def _add_document(self, node, indices, path, lock_level, lines_by_word):
+        """
+        Add one text file to the index.
+
+        Args:
+            node (TextFile): The file.
+            indices (tuple): Child indices leading to the file.
+            path (str): /-separated path of the file.
+            lock_level (int): Lock level needed to reach the file.
+            lines_by_word (dict): The file's word_lines.
+        """
+        document = len(self._documents)
+        self._documents.append((indices, path, lock_level))
+        self._sources.append(node)
+        self._live += 1
+        for word, lines in lines_by_word.items():
+            self._postings.setdefault(word, []).append((document, lines))
+
+    def _locate(self, directory, changed):
+        """
+        Find where a changed directory now sits in the indexed tree.
+
+        Args:
+            directory (Directory): The directory.
+            changed (set): All the directories that changed.
+
+        Returns:
+            tuple: Its child indices and the highest lock level on the way
+                to it, or None if a directory above it changed too or it is
+                no longer in the tree.
+        """
+        indices = []
+        lock_level = directory.lock_level
+        node = directory
+        while node.parent is not None:
+            parent = node.parent
+            if parent in changed:
+                return None
+            try:
+                indices.append(parent.contents.index(node))
+            except ValueError:
+                return None
+            lock_level = max(lock_level, parent.lock_level)
+            node = parent
+        if node is not self._tree:
+            return None
+        return tuple(reversed(indices)), lock_level
+
+    def prepare_update(self, directories):
+        """
+        Read the text files below directories whose listings were replaced,
+        ready for apply_update.
+
+        Only files the index has not read before are read, and the index
+        itself is left alone, so this can run on a worker thread while the
+        index is searched.
+
+        Args:
+            directories (set): The directories that changed.
+
+        Returns:
+            list: A (path, files) pair for each changed directory below no
+                other changed directory, where files holds the node, child
+                indices, path, lock level and word_lines (None if already
+                indexed) of each text file below it.
+        """
+        if self._root is not None or self._tree is None:
+            return []  # The first search indexes the tree as it is then
+        indexed = set(self._sources)
+        patch = []
+        for directory in directories:
+            located = self._locate(directory, directories)
+            if located is None:
+                continue
+            indices, lock_level = located
+            files = [
+                (
+                    node,
+                    file_indices,
+                    path,
+                    file_lock_level,
+                    None if node in indexed else word_lines(node.lines()),
+                )
+                for node, file_indices, path, file_lock_level in (
+                    self._text_files(
+                        directory, indices, directory.display_path, lock_level
+                    )
+                )
+            ]
+            patch.append((directory.display_path, files))
+        return patch
+
+    def apply_update(self, patch):
+        """
+        Replace the documents below changed directories with the files
+        prepare_update found there.
+
+        Documents of files that are still in the tree keep their postings
+        and only move to their new indices. Removed documents are dropped
+        from results, and from the postings once they outnumber the rest.
+
+        Args:
+            patch (list): Result of prepare_update.
+        """
+        if self._root is not None:
+            return  # Rebuilt since; the first search indexes the tree
+        for prefix, files in patch:
+            stale = {
+                document
+                for document, entry in enumerate(self._documents)
+                if entry is not None
+                and (entry[1] == prefix or entry[1].startswith(prefix + "/"))
+            }
+            reusable = {
+                self._sources[document]: document
+                for document in stale
+                if self._sources[document] is not None
+            }
+            for node, indices, path, lock_level, lines_by_word in files:
+                if node in reusable:
+                    document = reusable.pop(node)
+                    stale.discard(document)
+                    self._documents[document] = (indices, path, lock_level)
+                    continue
+                if lines_by_word is None:
+                    # Indexed elsewhere when prepare_update ran
+                    lines_by_word = word_lines(node.lines())
+                self._add_document(
+                    node, indices, path, lock_level, lines_by_word
+                )
+            for document in stale:
+                self._documents[document] = None
+                self._sources[document] = None
+                self._live -= 1
+        if len(self._documents) > 2 * self._live:
+            self._compact()
+
+    def update(self, directories):
+        """
+        Index the documents below directories whose listings were replaced.
+
+        Args:
+            directories (set): The directories that changed.
+        """
+        self.apply_update(self.prepare_update(directories))
+
+    def _compact(self):
+        """
+        Drop removed documents for good and number the rest from 0 again.
+        """
+        renumbered = {}
+        documents = []
+        sources = []
+        for document, entry in enumerate(self._documents):
+            if entry is not None:
+                renumbered[document] = len(documents)
+                documents.append(entry)
+                sources.append(self._sources[document])
+        postings = {}
+        for word, word_postings in self._postings.items():
+            kept = [
+                (renumbered[document], lines)
+                for document, lines in word_postings
+                if document in renumbered
+            ]
+            if kept:
+                postings[word] = kept
+        self._documents = documents
+        self._sources = sources
+        self._postings = postings
+
+    def search(self, query, unlock_level, limit=20):
+        """
+        Find the documents a player may open that contain query words.
+
+        Args:
+            query (str): Words to look for.
+            unlock_level (int): The player's unlock level.
+            limit (int): Maximum number of hits.
+
+        Returns:
+            list: SearchHits, best match first.
+        """
+        self.build()
+        document_count = self._live
+        scores = {}
+        lines = {}
+        for word in set(tokenize(query)):
+            postings = self._postings.get(word, [])
+            if not postings:
+                continue
+            idf = math.log(1 + document_count / len(postings))
+            for document, found_lines in postings:
+                entry = self._documents[document]
+                if entry is None or entry[2] > unlock_level:
+                    continue
+                scores[document] = scores.get(document, 0) + idf * (
+                    1 + math.log(len(found_lines))
+                )
+                lines.setdefault(document, set()).update(found_lines)
+
+        ranked = heapq.nlargest(limit, scores, key=scores.get)
+        return [
+            SearchHit(
+                self._documents[document][0],
+                self._documents[document][1],
+                scores[document],
+                sorted(lines[document]),
+            )
+            for document in ranked
+        ]
+
+    def save(self, path):
+        """
+        Write the index to a file.
+
+        Args:
+            path (str): File to write.
+        """
+        self.build()
+        if self._live < len(self._documents):
+            self._compact()
+        data = {"documents": self._documents, "postings": self._postings}
+        if self._tree is not None:
+            data["fingerprint"] = tree_fingerprint(self._tree)
+        with open(path, "w", encoding="utf-8") as file_obj:
+            json.dump(data, file_obj, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path, root=None):
+        """
+        Read an index written by save.
+
+        Args:
+            path (str): File to read.
+            root (Directory): The tree the index is used with. It is
+                indexed again when first searched if it has changed since
+                the index was saved. With None, the index is trusted.
+
+        Returns:
+            SearchIndex: The loaded index.
+        """
+        with open(path, "r", encoding="utf-8") as file_obj:
+            data = json.load(file_obj)
+        documents = [
+            (tuple(indices), document_path, lock_level)
+            for indices, document_path, lock_level in data["documents"]
+        ]
+        postings = {
+            word: [(document, lines) for document, lines in word_postings]
+            for word, word_postings in data["postings"].items()
+        }
+        return cls(root, documents, postings, data.get("fingerprint"))
+
+
+if __name__ == "__main__":
+    source = os.path.abspath(sys.argv[1])
+    SearchIndex(
+        Directory(
+            os.path.basename(source),
+            os.path.dirname(source),
+            manifest=Manifest.load(
+                sys.argv[3] if len(sys.argv) > 3 else MANIFEST_PATH
+            ),
+        )
+    ).save(sys.argv[2])
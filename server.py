@@ -0,0 +1,457 @@
+"""
+Server mode hosting many game sessions in one process.
+
+Every connection gets its own Model, Controller and View drawing to a
+VirtualScreen, while all sessions share one fully loaded content tree and
+caches of wrapped text and image previews. Passwords are hashed on worker
+threads, so checking one never holds up other players, and failed attempts
+are throttled per TCP peer address across all of its connections, and per
+connection on a Unix socket. With a
+SaveStore, players enter a name and passphrase when they connect. A new
+name is claimed with the passphrase chosen for it, and a known name
+resumes where it left off only with its passphrase. Clients
+should put their terminal in raw mode, e.g.
+socat -,raw,echo=0 TCP:localhost:7777 or
+socat -,raw,echo=0 UNIX-CONNECT:terminal.sock.
+"""
+
+import asyncio
+import functools
+import itertools
+import math
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from controller import Controller
+from layout import LayoutCache
+from model import AttemptThrottle, Model, check_password, hash_password
+from preview import PreviewCache
+from screen import KeyDecoder, VirtualScreen
+from view import View
+
+NAME_PROMPT = "Player name: "
+PASSPHRASE_PROMPT = "Passphrase: "
+
+# Passwords hashed at once; more attempts queue rather than use more cores
+PASSWORD_WORKERS = 2
+
+
+class Session:
+    """
+    State of one connected player.
+    """
+
+    def __init__(
+        self,
+        root,
+        layouts,
+        write,
+        rows=24,
+        cols=80,
+        search_index=None,
+        password_hashes=None,
+        saves=None,
+        recorder=None,
+        previews=None,
+        throttle=None,
+        peer=None,
+        run_blocking=None,
+    ):
+        """
+        Create a session and draw its first screen.
+
+        With a save store the player is first asked for their name, and
+        picks up where that name left off.
+
+        Args:
+            root (Directory): Shared top-level directory.
+            layouts (LayoutCache): Shared cache of wrapped text.
+            write (callable): Called with the bytes to send to the player.
+            rows (int): Terminal height.
+            cols (int): Terminal width.
+            search_index (SearchIndex): Shared search index, or None.
+            password_hashes (dict): Hash of the password for each level.
+            saves (SaveStore): Shared store of player progress, or None.
+            recorder (metrics.Recorder): Records the latency of this
+                session's hot paths, or None.
+            previews (PreviewCache): Shared cache of images drawn in the
+                terminal, or None for a cache of this session's own.
+            throttle (AttemptThrottle): Password throttle shared between
+                sessions, or None for one of this session's own.
+            peer (Hashable): Address of the player, which their failed
+                password attempts count against.
+            run_blocking (callable): Runs a password check off the event
+                loop and returns a future of its result, or None to check
+                passwords in place.
+        """
+        self.recorder = recorder
+        self.model = Model(password_hashes, throttle=throttle, attempter=peer)
+        self.screen = VirtualScreen(rows, cols, write)
+        self.controller = Controller(self.screen, self.model, run_blocking)
+        self._run_blocking = run_blocking
+        self._view = View(
+            self.screen,
+            self.controller,
+            self.model,
+            layouts=layouts,
+            image_window=False,
+            previews=previews,
+        )
+        self._decoder = KeyDecoder()
+        self._start = (root, search_index, saves)
+        # Name and passphrase typed so far, until the game starts
+        self._name = None
+        self._passphrase = None
+        self._checking = False
+        if saves is None:
+            with metrics.recording(recorder):
+                self.controller.start(self._view, root, search_index)
+        else:
+            self._name = []
+            self._draw_sign_in()
+
+    def _draw_sign_in(self, message=""):
+        """
+        Show the name and passphrase typed so far, with a message below.
+
+        Args:
+            message (str): Message for the player, or "".
+        """
+        rows = [NAME_PROMPT + "".join(self._name)]
+        if self._passphrase is not None:
+            rows.append(PASSPHRASE_PROMPT + "*" * len(self._passphrase))
+        cursor = (len(rows) - 1, len(rows[-1]))
+        rows.extend(["", message] if len(rows) == 1 else [message])
+        for row, text in enumerate(rows):
+            self.screen.move(row, 0)
+            self.screen.clrtoeol()
+            self.screen.addstr(text)
+        self.screen.move(*cursor)
+        self.screen.refresh()
+
+    def _enter_name_key(self, key):
+        """
+        Edit the player name, then the passphrase, and submit them on
+        newline. Escape goes back from the passphrase to the name.
+
+        Args:
+            key (str): Key name.
+        """
+        if self._checking:
+            return
+        typing = self._name if self._passphrase is None else self._passphrase
+        if key == "\n" and typing:
+            if self._passphrase is None:
+                self._passphrase = []
+                self._draw_sign_in()
+            else:
+                self._submit_passphrase()
+            return
+        if key == "\x1b":
+            self._passphrase = None
+        elif key == "KEY_BACKSPACE":
+            del typing[-1:]
+        elif len(key) == 1 and key.isprintable() and len(typing) < 32:
+            typing.append(key)
+        self._draw_sign_in()
+
+    def _submit_passphrase(self):
+        """
+        Claim a new name with the passphrase, or check it for a known one.
+
+        Hashing runs through run_blocking, so the event loop carries on
+        while it does. Failed checks count against the player's peer in the
+        password throttle.
+        """
+        name = "".join(self._name)
+        passphrase = "".join(self._passphrase)
+        state = self._start[2].load(name)
+        if state is None or state.secret is None:
+            work = functools.partial(hash_password, passphrase)
+            done = functools.partial(self._name_claimed, name)
+        elif self.model.begin_attempt():
+            work = functools.partial(check_password, passphrase, state.secret)
+            done = functools.partial(self._passphrase_checked, name)
+        elif self.model.attempt_in_progress():
+            # Keep the passphrase so Enter can submit it again
+            self._draw_sign_in(
+                "Another check is in progress; press Enter again."
+            )
+            return
+        else:
+            self._passphrase = []
+            wait = math.ceil(self.model.retry_after())
+            self._draw_sign_in(f"Too many attempts. Try again in {wait}s.")
+            return
+        self._passphrase = []
+        self._checking = True
+        self._draw_sign_in("Checking passphrase...")
+        if self._run_blocking is None:
+            done(work())
+            return
+
+        def finished(future):
+            failed = future.cancelled() or future.exception() is not None
+            done(None if failed else future.result())
+
+        self._run_blocking(work).add_done_callback(finished)
+
+    def _name_claimed(self, name, secret):
+        """
+        Save a new player's passphrase hash and start their game.
+
+        Args:
+            name (str): The player's name.
+            secret (str): Hash of their passphrase, or None if hashing
+                failed.
+        """
+        self._checking = False
+        saves = self._start[2]
+        state = saves.load(name)
+        if secret is None or (state is not None and state.secret is not None):
+            # Another player claimed the name while this one was hashing
+            self._passphrase = None
+            self._draw_sign_in("That name was just taken; choose another.")
+            return
+        saves.claim(name, secret)
+        self._begin(name)
+
+    def _passphrase_checked(self, name, matched):
+        """
+        Start a returning player's game if their passphrase was right.
+
+        Args:
+            name (str): The player's name.
+            matched (bool): Whether the passphrase was right, or None if
+                checking failed.
+        """
+        self._checking = False
+        if self.model.finish_attempt(bool(matched)):
+            self._begin(name)
+        else:
+            self._draw_sign_in("Wrong passphrase.")
+
+    def _begin(self, name):
+        """
+        Start the game as a signed-in player, where their save left off.
+
+        Args:
+            name (str): The player's name.
+        """
+        with metrics.recording(self.recorder):
+            self.model.set_player_name(name)
+            self._name = None
+            self._passphrase = None
+            self._view.invalidate()
+            if self.recorder is not None:
+                self.recorder.name = name
+            self.controller.start(self._view, *self._start)
+
+    def feed(self, data):
+        """
+        Handle input received from the player.
+
+        Args:
+            data (bytes): Raw terminal input.
+
+        Returns:
+            bool: False once the session should end.
+        """
+        with metrics.recording(self.recorder):
+            for key in self._decoder.feed(data):
+                if key == "\x04":
+                    return False
+                if self._name is not None:
+                    self._enter_name_key(key)
+                elif not self.controller.handle_key(key):
+                    return False
+        return True
+
+    def content_changed(self, directories):
+        """
+        Redraw if the content tree changed under the player.
+
+        Args:
+            directories (set): Directories whose listings were replaced.
+        """
+        if self._name is None:
+            with metrics.recording(self.recorder):
+                self.controller.content_changed(directories)
+
+
+class GameServer:
+    """
+    Asyncio server running a Session per connection.
+    """
+
+    def __init__(
+        self,
+        root,
+        search_index=None,
+        rows=24,
+        cols=80,
+        password_hashes=None,
+        saves=None,
+        record_metrics=False,
+        on_session_end=None,
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            root (Directory): Fully loaded content tree. It is shared by all
+                sessions, so it should be loaded eagerly (e.g. with
+                model.load_tree) rather than through a cache, and only
+                changed through watch_content.
+            search_index (SearchIndex): Index shared by all sessions, or
+                None to disable search.
+            rows (int): Terminal height assumed for every session.
+            cols (int): Terminal width assumed for every session.
+            password_hashes (dict): Hash of the password for each level,
+                usually from the content pack's Manifest.
+            saves (SaveStore): Store of player progress, so players can
+                reconnect where they left off, or None to not save.
+            record_metrics (bool): Give each session a metrics.Recorder of
+                its own hot-path latencies.
+            on_session_end (callable): Called with each Session after its
+                player leaves, e.g. to report its recorder, or None.
+        """
+        self._root = root
+        self._rows = rows
+        self._cols = cols
+        self._layouts = LayoutCache(max_entries=256)
+        self._previews = PreviewCache()
+        self._search_index = search_index
+        self._password_hashes = password_hashes
+        self._saves = saves
+        self._record_metrics = record_metrics
+        self._on_session_end = on_session_end
+        self._throttle = AttemptThrottle()
+        self._unix_peers = itertools.count(1)
+        self._password_checks = ThreadPoolExecutor(
+            PASSWORD_WORKERS, thread_name_prefix="password"
+        )
+        self.sessions = set()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Run one player's session until they disconnect or press Ctrl-D.
+
+        Args:
+            reader (asyncio.StreamReader): Player input.
+            writer (asyncio.StreamWriter): Player output.
+        """
+        # Unix socket peers have no address, so each connection is its own
+        peer = writer.get_extra_info("peername")
+        if isinstance(peer, tuple):
+            peer = peer[0]
+        else:
+            peer = ("unix", next(self._unix_peers))
+        loop = asyncio.get_running_loop()
+        session = Session(
+            self._root,
+            self._layouts,
+            writer.write,
+            self._rows,
+            self._cols,
+            self._search_index,
+            self._password_hashes,
+            self._saves,
+            metrics.Recorder() if self._record_metrics else None,
+            self._previews,
+            self._throttle,
+            peer,
+            functools.partial(loop.run_in_executor, self._password_checks),
+        )
+        self.sessions.add(session)
+        try:
+            await writer.drain()
+            while True:
+                data = await reader.read(1024)
+                if not data or not session.feed(data):
+                    break
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions.discard(session)
+            writer.close()
+            if self._on_session_end is not None:
+                self._on_session_end(session)
+
+    async def start(self, host="127.0.0.1", port=7777, unix_path=None):
+        """
+        Start listening for players.
+
+        The search index is built, or a prebuilt one checked against the
+        tree, on a worker thread first, so the first search does not hold up
+        every session.
+
+        Args:
+            host (str): Address to listen on for TCP.
+            port (int): TCP port to listen on.
+            unix_path (str): Listen on this Unix socket instead of TCP.
+
+        Returns:
+            asyncio.Server: The listening server.
+        """
+        if self._search_index is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._search_index.build
+            )
+        if unix_path is not None:
+            return await asyncio.start_unix_server(
+                self.handle_connection, path=unix_path
+            )
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def watch_content(self, watcher, interval=1.0):
+        """
+        Reload changed content for every session until cancelled.
+
+        The disk is scanned on a worker thread; the new listings are swapped
+        in on the event loop, between the sessions' key presses. The search
+        index reads the changed documents on a worker thread too, and only
+        swaps their postings in on the loop.
+
+        Args:
+            watcher (ContentWatcher): Watcher of the shared tree.
+            interval (float): Seconds between scans.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            changes = await loop.run_in_executor(None, watcher.scan)
+            if not changes:
+                continue
+            directories = watcher.apply(changes)
+            for session in list(self.sessions):
+                session.content_changed(directories)
+            if self._search_index is not None:
+                patch = await loop.run_in_executor(
+                    None, self._search_index.prepare_update, directories
+                )
+                self._search_index.apply_update(patch)
+
+    async def serve_forever(
+        self, host="127.0.0.1", port=7777, unix_path=None, watcher=None
+    ):
+        """
+        Listen for players until cancelled.
+
+        Args:
+            host (str): Address to listen on for TCP.
+            port (int): TCP port to listen on.
+            unix_path (str): Listen on this Unix socket instead of TCP.
+            watcher (ContentWatcher): Watcher of the shared tree, to reload
+                content that changes while serving, or None.
+        """
+        server = await self.start(host, port, unix_path)
+        watching = None
+        if watcher is not None:
+            watching = asyncio.create_task(self.watch_content(watcher))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if watching is not None:
+                watching.cancel()
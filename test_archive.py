@@ -0,0 +1,95 @@
+"""
+Unit tests for packing and reading content archives.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from archive import LAYOUT_WIDTHS, Archive, pack
+from headless import HeadlessGame
+from layout import TextLayout
+from model import ContentCache, Directory, ImageFile, TextFile
+
+
+class TestArchive(unittest.TestCase):
+    """
+    Test that an archive serves the same tree as the loose files.
+    """
+
+    def setUp(self):
+        """Pack the bundled content tree into a temporary archive."""
+        self._tmp = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        self.path = os.path.join(self._tmp.name, "content.pak")
+        pack("1documents", self.path)
+        self.archive = Archive(self.path)
+
+    def tearDown(self):
+        """Remove the temporary archive."""
+        self._tmp.cleanup()
+
+    def assert_same_tree(self, packed, loose):
+        """
+        Recursively compare an archived node against a loose one.
+
+        Args:
+            packed (File): Node read from the archive.
+            loose (File): Node read from the content directory.
+        """
+        self.assertEqual(packed.name, loose.name)
+        self.assertEqual(type(packed).__mro__[1], type(loose))
+        if isinstance(loose, Directory):
+            self.assertEqual(packed.lock_level, loose.lock_level)
+            self.assertEqual(len(packed.contents), len(loose.contents))
+            for packed_child, loose_child in zip(
+                packed.contents, loose.contents
+            ):
+                self.assert_same_tree(packed_child, loose_child)
+        elif isinstance(loose, TextFile):
+            self.assertEqual(packed.contents, loose.contents)
+            for width in LAYOUT_WIDTHS:
+                self.assertEqual(
+                    packed.prebuilt_layout(width).rows(0, 10**6),
+                    TextLayout(loose.contents, width).rows(0, 10**6),
+                )
+            self.assertIsNone(packed.prebuilt_layout(37))
+        elif isinstance(loose, ImageFile):
+            size = loose.contents.get_size()
+            self.assertEqual(packed.contents.get_size(), size)
+            for point in [(0, 0), (size[0] // 2, size[1] // 2)]:
+                self.assertEqual(
+                    packed.contents.get_at(point), loose.contents.get_at(point)
+                )
+
+    def test_archive_matches_directory(self):
+        """Test that every node, lock level and file body round-trips."""
+        loose = Directory("1documents", os.getcwd())
+        self.assert_same_tree(self.archive.root(), loose)
+        self.assert_same_tree(self.archive.root(ContentCache()), loose)
+
+    def test_raw_data_is_a_view(self):
+        """Test that raw file data is served without copying."""
+        text_file = self.archive.root().contents[0].contents[1]
+        self.assertIsInstance(text_file.raw, memoryview)
+        self.assertEqual(str(text_file.raw, "utf-8"), text_file.contents)
+
+    def test_sessions_use_prebuilt_layouts(self):
+        """Test that games on common terminals read without wrapping."""
+        loose = Directory("1documents", os.getcwd())
+        for cols in (80, 100, 120, 132):
+            game = HeadlessGame(self.archive.root(), cols=cols)
+            with mock.patch("layout.LazyLayout") as lazy_layout:
+                game.play("1 2 PGDN")
+            lazy_layout.assert_not_called()
+            expected = HeadlessGame(loose, cols=cols)
+            expected.play("1 2 PGDN")
+            self.assertEqual(game.lines, expected.lines)
+
+    def test_rejects_other_files(self):
+        """Test that opening a non-archive raises ValueError."""
+        with self.assertRaises(ValueError):
+            Archive(os.path.join("1documents", "1work_documents", "3nda.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
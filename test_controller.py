@@ -4,7 +4,10 @@ Unit tests for the Controller class using pytest.
 Simulates user input via a mock stdscr interface to test keyboard interaction.
 """
 
+from unittest.mock import MagicMock
 from controller import Controller
+from manifest import Manifest
+from model import AttemptThrottle, Directory, Model, TextFile
 
 
 class MockStdscr:  # pylint: disable=too-few-public-methods
@@ -30,18 +33,40 @@ class MockStdscr:  # pylint: disable=too-few-public-methods
         return key
 
 
-class MockModel:  # pylint: disable=too-few-public-methods
+def make_tree():
     """
-    Dummy model stub to satisfy Controller dependencies.
+    Build a root directory holding a text file and a locked directory.
+
+    Returns:
+        tuple: The root, the text file and the locked directory.
+    """
+    text_file = MagicMock(spec=TextFile)
+    locked = MagicMock(spec=Directory)
+    locked.lock_level = 2
+    locked.contents = []
+    root = MagicMock(spec=Directory)
+    root.lock_level = 1
+    root.contents = [text_file, locked]
+    return root, text_file, locked
+
+
+def shown(view):
     """
+    Return the file last displayed and the path it was displayed with.
 
-    def __init__(self):
-        pass
+    Args:
+        view (MagicMock): Mock view passed to the controller.
 
+    Returns:
+        list: The file followed by each file on its path.
+    """
+    file, path = view.display_file.call_args.args
+    return [file] + list(path)
 
-def test_get_key_press_returns_character():
+
+def test_handle_key_opens_and_closes_files():
     """
-    Test that get_key_press returns a key character from input sequence.
+    Test that number keys open children and q returns to the directory.
 
     Args:
         None
@@ -49,17 +74,111 @@ def test_get_key_press_returns_character():
     Returns:
         None
     """
-    stdscr = MockStdscr(["a"])
-    model = MockModel()
-    controller = Controller(stdscr, model)
+    root, text_file, _ = make_tree()
+    view = MagicMock()
+    controller = Controller(MockStdscr([]), Model())
+    controller.start(view, root)
+
+    controller.handle_key("1")
+    assert shown(view) == [text_file, root, text_file]
+    controller.handle_key("KEY_DOWN")
+    view.scroll_text.assert_called_with("KEY_DOWN")
+    controller.handle_key("q")
+    assert shown(view) == [root, root]
+    controller.handle_key("9")
+    assert view.display_file.call_count == 3
+
+
+def test_handle_key_unlocks_with_password():
+    """
+    Test that typing the right password at a locked directory unlocks it.
 
-    result = controller.get_key_press()
-    assert result == "a"
+    Args:
+        None
 
+    Returns:
+        None
+    """
+    root, _, locked = make_tree()
+    view = MagicMock()
+    model = Model(Manifest.load().password_hashes)
+    controller = Controller(MockStdscr([]), model)
+    controller.start(view, root)
+
+    controller.handle_key("2")
+    for key in "wrong\n":
+        controller.handle_key(key)
+    assert model.unlock_level == 1
+    for key in "vires_in_silentio\n":
+        controller.handle_key(key)
+    assert model.unlock_level == 2
+    view.echo_password_key.assert_called_with("o")
+    assert shown(view) == [locked, root, locked]
+
+
+def test_password_is_kept_while_another_is_checked():
+    """
+    Test that a password submitted while the same attempter has another
+    being checked is kept for Enter to submit again, not thrown away.
+
+    Args:
+        None
 
-def test_enter_password_collects_until_newline():
+    Returns:
+        None
+    """
+    root, _, _ = make_tree()
+    view = MagicMock()
+    hashes = Manifest.load().password_hashes
+    throttle = AttemptThrottle()
+    other = Model(hashes, throttle=throttle, attempter="peer")
+    model = Model(hashes, throttle=throttle, attempter="peer")
+    controller = Controller(MockStdscr([]), model)
+    controller.start(view, root)
+
+    assert other.begin_attempt()
+    controller.handle_key("2")
+    for key in "vires_in_silentio\n":
+        controller.handle_key(key)
+    view.show_password_busy.assert_called_once()
+    assert model.unlock_level == 1
+    other.finish_attempt(False)
+    controller.handle_key("\n")
+    assert model.unlock_level == 2
+
+
+def test_search_opens_hit():
+    """
+    Test typing a search, then opening a result by number.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    root, text_file, _ = make_tree()
+    view = MagicMock()
+    index = MagicMock()
+    index.search.return_value = [MagicMock(indices=(0,))]
+    controller = Controller(MockStdscr([]), Model())
+    controller.start(view, root, index)
+
+    for key in "/ab":
+        controller.handle_key(key)
+    controller.handle_key("KEY_RESIZE")
+    view.resize.assert_called_once_with()
+    controller.handle_key("KEY_BACKSPACE")
+    view.display_search_prompt.assert_called_with("a")
+    controller.handle_key("\n")
+    index.search.assert_called_with("a", 1, limit=9)
+    controller.handle_key("1")
+    assert shown(view) == [text_file, root, text_file]
+
+
+def test_multi_digit_selection_and_filter():
     """
-    Test that enter_password collects characters until newline ('\\n').
+    Test opening an entry past the ninth by number, and keeping a filter.
 
     Args:
         None
@@ -67,10 +186,49 @@ def test_enter_password_collects_until_newline():
     Returns:
         None
     """
-    input_sequence = list("secret123") + ["\n"]
-    stdscr = MockStdscr(input_sequence)
-    model = MockModel()
-    controller = Controller(stdscr, model)
+    root, _, _ = make_tree()
+    files = [MagicMock(spec=TextFile) for _ in range(30)]
+    root.contents = files
+    view = MagicMock()
+    controller = Controller(MockStdscr([]), Model())
+    controller.start(view, root)
+
+    controller.handle_key("1")
+    view.show_listing_status.assert_called_with("1")
+    controller.handle_key("2")
+    controller.handle_key("\n")
+    assert shown(view) == [files[11], root, files[11]]
+    controller.handle_key("q")
+    controller.handle_key("5")
+    assert shown(view) == [files[4], root, files[4]]
+    controller.handle_key("q")
+
+    controller.handle_key("f")
+    controller.handle_key("x")
+    view.filter_listing.assert_called_with("x", typing=True)
+    controller.handle_key("\n")
+    view.filter_listing.assert_called_with("x")
+    controller.handle_key("KEY_NPAGE")
+    view.scroll_listing.assert_called_with("KEY_NPAGE")
+
+
+def test_search_hit_outside_tree_is_ignored():
+    """
+    Test that a hit from an index older than the tree does not crash.
 
-    password = controller.enter_password()
-    assert password == "secret123"
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    root, _, _ = make_tree()
+    view = MagicMock()
+    index = MagicMock()
+    index.search.return_value = [MagicMock(indices=(5,))]
+    controller = Controller(MockStdscr([]), Model())
+    controller.start(view, root, index)
+
+    for key in "/a\n1":
+        controller.handle_key(key)
+    assert shown(view) == [root, root]
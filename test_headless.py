@@ -0,0 +1,131 @@
+"""
+Unit tests for the headless game driver.
+"""
+
+import os
+import subprocess
+import sys
+from unittest import mock
+from headless import HeadlessGame, parse_script
+from manifest import Manifest
+from model import load_tree
+
+
+def test_parse_script():
+    """
+    Test that named keys are single keys and other words are typed.
+    """
+    assert parse_script("1 ENTER KEY_NPAGE ab") == [
+        "1",
+        "\n",
+        "KEY_NPAGE",
+        "a",
+        "b",
+    ]
+
+
+def test_scripted_playthrough():
+    """
+    Test replaying a script that reads a file and unlocks the archive.
+    """
+    manifest = Manifest.load()
+    root = load_tree(
+        os.path.basename(manifest.root),
+        os.path.dirname(manifest.root),
+        manifest=manifest,
+    )
+    game = HeadlessGame(root, password_hashes=manifest.password_hashes)
+    game.play("1 2")
+    assert game.lines[0].startswith("/documents/work_documents/job_offer.txt")
+    game.play("q q 2")
+    assert "Enter password" in game.text
+    game.play("vires_in_silentio ENTER")
+    assert game.model.unlock_level == 2
+    assert "1. diary_cont/" in game.lines
+
+
+def test_streamed_file_scrolls_to_end(tmp_path):
+    """
+    Test paging through a large file that is streamed from disk.
+    """
+    (tmp_path / "1docs").mkdir()
+    (tmp_path / "1docs" / "1log.txt").write_text(
+        "".join(f"entry {index}\n" for index in range(1000)), encoding="utf-8"
+    )
+    with mock.patch("model.STREAMING_THRESHOLD", 0):
+        game = HeadlessGame(load_tree("1docs", str(tmp_path)))
+    game.play("1")
+    assert game.lines[2] == "entry 0"
+    game.play("PGDN DOWN")
+    assert game.lines[2] == "entry 23"
+    game.play("END")
+    assert game.lines[-2:] == ["entry 999", ""]
+
+
+def test_resize_keeps_top_line_in_view(tmp_path):
+    """
+    Test that rewrapping a file for a new width keeps the line at the top
+    of the screen there, and that a tiny screen does not crash the game.
+    """
+    (tmp_path / "1docs").mkdir()
+    (tmp_path / "1docs" / "1log.txt").write_text(
+        "".join(f"entry number {index}\n" for index in range(1000)),
+        encoding="utf-8",
+    )
+    game = HeadlessGame(load_tree("1docs", str(tmp_path)))
+    game.play("1 PGDN PGDN")
+    assert game.lines[2] == "entry number 44"
+    game.resize(30, 10)
+    assert game.lines[2:5] == ["entry num", "ber 44", "entry num"]
+    assert len(game.screen.lines) == 30
+    game.resize(2, 5)
+    game.resize(24, 80)
+    assert game.lines[2] == "entry number 44"
+    assert "Press Q to go back" in game.lines[0]
+
+
+def test_resize_redraws_listing_and_prompt():
+    """
+    Test that the listing and password prompt are drawn at the new size.
+    """
+    manifest = Manifest.load()
+    root = load_tree(
+        os.path.basename(manifest.root),
+        os.path.dirname(manifest.root),
+        manifest=manifest,
+    )
+    game = HeadlessGame(root, password_hashes=manifest.password_hashes)
+    game.resize(10, 60)
+    assert game.lines[0].endswith("Press Q to go back")
+    assert game.lines[2].startswith("1. ")
+    game.play("2 abc")
+    game.resize(24, 120)
+    assert game.lines[2].endswith("entry: abc")
+
+
+def test_narrow_header_keeps_title():
+    """
+    Test that instructions never cover the path on narrow terminals.
+    """
+    game = HeadlessGame(load_tree("1documents"))
+    game.play("1 1")
+    path = "/documents/work_documents/email_log"
+    for cols in (20, 30, 40):
+        game.resize(10, cols)
+        assert game.lines[0] == path[: cols - 1]
+    game.resize(10, 60)
+    assert game.lines[0].startswith(path[:28] + " Press Q to go back")
+
+
+def test_command_line_can_search():
+    """
+    Test that the scripted command line game searches the documents.
+    """
+    output = subprocess.run(
+        [sys.executable, "headless.py", "/ sister ENTER"],
+        capture_output=True,
+        check=True,
+        text=True,
+    ).stdout
+    assert output.startswith("Search: sister")
+    assert "1. /documents/" in output
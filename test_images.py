@@ -0,0 +1,105 @@
+"""
+Unit tests for the background image cache.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+import pygame
+from images import ImageCache
+from model import ContentCache, Directory, ImageFile
+
+
+class TestImageCache(unittest.TestCase):
+    """
+    Test decoding, conversion and eviction in ImageCache.
+    """
+
+    def setUp(self):
+        """Write a few images and open a headless display."""
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        self._tmp = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        folder = os.path.join(self._tmp.name, "1pics")
+        os.makedirs(folder)
+        for index in range(1, 4):
+            surface = pygame.Surface((32 * index, 32))
+            pygame.image.save(surface, os.path.join(folder, f"{index}a.png"))
+        directory = Directory("1pics", self._tmp.name, ContentCache())
+        self.files = directory.contents
+        self.cache = ImageCache()
+
+    def tearDown(self):
+        """Stop decoding and remove the images."""
+        self.cache.close()
+        pygame.display.quit()
+        self._tmp.cleanup()
+
+    def test_prefetch_and_get(self):
+        """Test that prefetched images are decoded once and reused."""
+        first = self.cache.get(self.files[0])
+        self.assertIsInstance(self.files[0], ImageFile)
+        self.assertEqual(first.get_size(), (32, 32))
+        self.assertIs(self.cache.get(self.files[0]), first)
+        self.cache.prefetch(self.files)
+        self.assertEqual(self.cache.get(self.files[1]).get_size(), (64, 32))
+
+    def test_no_prefetch_before_first_image(self):
+        """Test that nothing is decoded until an image has been opened."""
+        image = MagicMock(spec=ImageFile)
+        self.cache.prefetch([image])
+        self.cache.close()
+        image.load.assert_not_called()
+
+    def test_text_session_never_imports_pygame(self):
+        """Test that browsing and reading text does not load pygame."""
+        script = (
+            "import sys\n"
+            "from headless import HeadlessGame\n"
+            "from model import load_tree\n"
+            "game = HeadlessGame(load_tree('1documents'))\n"
+            "game.play('1 4 ENTER 1 DOWN q q')\n"
+            "print('pygame' in sys.modules)\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        self.assertEqual(output.strip(), "False")
+
+    def test_converted_surface_is_cached_per_format(self):
+        """Test that conversion to the display format happens once."""
+        pygame.display.init()
+        pygame.display.set_mode((10, 10))
+        surface_format = (32, (1, 2, 3, 4))
+        converted = self.cache.get(self.files[1], surface_format)
+        self.assertIs(self.cache.get(self.files[1], surface_format), converted)
+        self.assertIsNot(self.cache.get(self.files[1]), converted)
+
+    def test_byte_budget_evicts_oldest(self):
+        """Test that the cache stays within its byte budget."""
+        cache = ImageCache(max_bytes=32 * 32 * 4 * 3)
+        for file in self.files:
+            cache.get(file)
+        self.assertLessEqual(cache.size, 32 * 32 * 4 * 3)
+        cache.close()
+
+    def test_unopened_prefetches_stay_within_budget(self):
+        """Test that prefetched images are cached even if never opened."""
+        # Room for the largest and smallest images, but not all three
+        budget = (96 + 32) * 32 * 3
+        cache = ImageCache(max_bytes=budget)
+        cache.get(self.files[0])
+        cache.prefetch(self.files)
+        cache.close(wait=True)
+        self.assertFalse(cache._pending)  # pylint: disable=protected-access
+        self.assertLessEqual(cache.size, budget)
+        self.assertGreater(cache.size, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Unit tests for text wrapping and the layout cache.
+"""
+
+from layout import LayoutCache, LazyLayout, TextLayout, Viewport
+
+
+class MockTextFile:
+    """
+    Stand-in for a TextFile that counts how often its contents are read.
+    """
+
+    def __init__(self, contents):
+        self._contents = contents
+        self.reads = 0
+
+    @property
+    def contents(self):
+        """
+        Return the text and count the read.
+
+        Returns:
+            str: The file's text.
+        """
+        self.reads += 1
+        return self._contents
+
+    def prebuilt_layout(self, _width):
+        """
+        Report that the file has no prebuilt layouts.
+
+        Returns:
+            None: Always.
+        """
+        return None
+
+
+def test_wraps_long_lines_and_keeps_empty_lines():
+    """
+    Test that long lines wrap at the width and empty lines take a row.
+    """
+    layout = TextLayout("abcdefg\n\nxy", 3)
+    assert layout.rows(0, layout.row_count) == ["abc", "def", "g", "", "xy"]
+
+
+def test_exact_width_line_takes_one_row():
+    """
+    Test that a line exactly as wide as the screen is not followed by a
+    blank row.
+    """
+    layout = TextLayout("abc\nd", 3)
+    assert layout.rows(0, 10) == ["abc", "d"]
+
+
+def test_lazy_layout_matches_text_layout():
+    """
+    Test that indexing text or UTF-8 bytes gives the same rows as wrapping
+    the text up front.
+    """
+    for text in [
+        "abcdefg\n\nxy",
+        "abc\n",
+        "",
+        "ab\ncd\n",
+        "h\u00e9llo w\u00f6rld\n\u2603" * 3,
+    ]:
+        expected = TextLayout(text, 3)
+        for data in (text, text.encode("utf-8")):
+            layout = LazyLayout(data, 3)
+            layout.index_to(None)
+            assert layout.complete
+            assert layout.rows(0, 100) == expected.rows(0, 100)
+
+
+def test_lazy_layout_indexes_on_demand():
+    """
+    Test that a lazy layout only reads as far as it is asked to.
+    """
+    layout = LazyLayout(b"line\n" * 100_000, 80)
+    layout.index_to(10)
+    assert not layout.complete
+    assert 10 <= layout.row_count < 100_000
+    assert layout.row(9) == "line"
+    layout.index_to(None)
+    assert layout.row_count == 100_001
+
+
+def test_row_at_finds_offset_in_other_width():
+    """
+    Test that the row holding an offset is found after rewrapping.
+    """
+    text = "".join(f"line {index:05}\n" for index in range(50_000))
+    narrow = LazyLayout(text, 4)
+    offset = text.index("line 40000")
+    row = narrow.row_at(offset)
+    assert narrow.row(row) == "line"
+    assert narrow.offsets[0][row] == offset
+    assert not narrow.complete
+    assert TextLayout("abc", 3).row_at(10) == 0
+
+
+def test_cache_reuses_layout_per_width():
+    """
+    Test that a file is wrapped once per width.
+    """
+    cache = LayoutCache()
+    file = MockTextFile("hello world")
+    first = cache.get(file, 5)
+    assert cache.get(file, 5) is first
+    assert file.reads == 1
+    assert cache.get(file, 4) is not first
+    assert file.reads == 2
+
+
+def test_cache_evicts_least_recently_used():
+    """
+    Test that the cache holds at most max_entries layouts.
+    """
+    cache = LayoutCache(max_entries=2)
+    files = [MockTextFile(str(index)) for index in range(3)]
+    for file in files:
+        cache.get(file, 10)
+    assert len(cache) == 2
+    cache.get(files[0], 10)
+    assert files[0].reads == 2
+
+
+def test_viewport_clamps_scrolling():
+    """
+    Test that scrolling and paging stop at the first and last page.
+    """
+    viewport = Viewport(row_count=25, height=10)
+    assert not viewport.scroll(-1)
+    assert viewport.page_down() and viewport.top == 10
+    assert viewport.page_down() and viewport.top == 15
+    assert not viewport.scroll(1)
+    assert viewport.bottom == 25
+    assert viewport.home() and viewport.top == 0
+    assert viewport.end() and viewport.top == 15
+    assert viewport.page_up() and viewport.top == 5
+
+
+def test_viewport_shorter_than_screen():
+    """
+    Test that a short text never scrolls.
+    """
+    viewport = Viewport(row_count=3, height=10)
+    assert not viewport.end()
+    assert viewport.bottom == 3
@@ -0,0 +1,86 @@
+"""
+Unit tests for content pack manifests.
+"""
+
+import os
+import tempfile
+import unittest
+from manifest import Manifest
+from model import ContentCache, Directory, hash_password, load_tree
+
+
+class TestManifest(unittest.TestCase):
+    """
+    Tests for loading, validating and applying manifests.
+    """
+
+    def setUp(self):
+        """Create a small content tree in a temporary directory."""
+        self._tmp = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        for folder in ("vault", "open", "deep/inner"):
+            os.makedirs(os.path.join(self._tmp.name, "1docs", folder))
+        for name in ("1b.txt", "1a.txt", "1c.txt"):
+            path = os.path.join(self._tmp.name, "1docs", "open", name)
+            with open(path, "w", encoding="utf-8") as file_obj:
+                file_obj.write(name)
+        self.data = {
+            "root": "1docs",
+            "levels": {
+                "2": hash_password("two", 1000),
+                "3": hash_password("three", 1000),
+            },
+            "directories": {
+                "vault": {"lock": 3},
+                "deep/inner": {"lock": 2},
+                "open": {"order": ["1c.txt"]},
+            },
+        }
+
+    def tearDown(self):
+        """Remove the temporary tree."""
+        self._tmp.cleanup()
+
+    def test_tree_uses_manifest_locks_and_order(self):
+        """Test that directories get their lock level and order."""
+        manifest = Manifest(self.data, self._tmp.name)
+        manifest.check_tree()
+        for root in (
+            load_tree("1docs", self._tmp.name, manifest=manifest),
+            Directory(
+                "1docs", self._tmp.name, ContentCache(), manifest=manifest
+            ),
+        ):
+            deep, open_dir, vault = root.contents
+            self.assertEqual(vault.lock_level, 3)
+            self.assertEqual(deep.contents[0].lock_level, 2)
+            self.assertEqual(open_dir.lock_level, 1)
+            self.assertEqual(
+                [file.name for file in open_dir.contents],
+                ["c.txt", "a.txt", "b.txt"],
+            )
+
+    def test_invalid_manifests_are_rejected(self):
+        """Test that malformed manifests raise ValueError."""
+        gap = dict(self.data, levels={"3": self.data["levels"]["3"]})
+        unknown_level = dict(self.data, directories={"vault": {"lock": 4}})
+        bad_hash = dict(self.data, levels={"2": "hunter2"})
+        bad_key = dict(self.data, directories={"vault": {"locked": 2}})
+        for data in (gap, unknown_level, bad_hash, bad_key, {}):
+            with self.assertRaises(ValueError):
+                Manifest(data, self._tmp.name)
+
+    def test_check_tree_finds_missing_directories(self):
+        """Test that a manifest naming a missing directory fails the check."""
+        self.data["directories"]["gone"] = {"lock": 2}
+        with self.assertRaises(ValueError):
+            Manifest(self.data, self._tmp.name).check_tree()
+
+    def test_shipped_manifest_matches_documents(self):
+        """Test that the bundled manifest is valid for the bundled tree."""
+        manifest = Manifest.load()
+        manifest.check_tree()
+        self.assertEqual(sorted(manifest.password_hashes), [2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Unit tests for hot-path instrumentation and the profiler hook.
+"""
+
+import os
+import signal
+import tempfile
+import metrics
+from headless import HeadlessGame
+from model import ContentCache, Directory
+
+
+@metrics.timed("test.double")
+def double(value):
+    """
+    Return twice a value; timed for the tests.
+
+    Args:
+        value (int): The value.
+
+    Returns:
+        int: value * 2.
+    """
+    return value * 2
+
+
+def test_timed_records_only_while_enabled():
+    """
+    Test that samples are recorded only into an active recorder.
+    """
+    recorder = metrics.Recorder()
+    assert double(2) == 4
+    assert recorder.histogram("test.double") is None
+    with metrics.recording(recorder):
+        for value in range(10):
+            double(value)
+        metrics.count("test.count", 3)
+    double(1)
+    histogram = recorder.histogram("test.double")
+    assert histogram.count == 10
+    assert histogram.percentile(0.5) <= histogram.percentile(0.99)
+    report = recorder.report()
+    assert "test.double: n=10" in report
+    assert "test.count: 3" in report
+
+
+def test_session_hot_paths_are_recorded():
+    """
+    Test that browsing records tree loads, key handling and wrapping.
+    """
+    recorder = metrics.enable()
+    try:
+        root = Directory("1documents", os.getcwd(), ContentCache())
+        game = HeadlessGame(root)
+        game.play("1 2 DOWN")
+    finally:
+        metrics.disable()
+    assert recorder.histogram("controller.handle_key").count == 3
+    for path in ("tree.list_directory", "tree.read_text", "layout.wrap"):
+        assert recorder.histogram(path).count >= 1
+
+
+def test_profiler_signal_writes_stats():
+    """
+    Test that a second signal stops profiling and writes the stats.
+    """
+    previous = signal.getsignal(signal.SIGUSR1)
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            metrics.install_profiler_signal(signal.SIGUSR1, tmp)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            double(1)
+            os.kill(os.getpid(), signal.SIGUSR1)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+        assert os.listdir(tmp) == [f"profile-{os.getpid()}-1.prof"]
@@ -4,8 +4,22 @@ Unit tests for the updated Model class using unittest.
 Covers bookmarking, unlock logic, folder accessibility, and content visibility.
 """
 
+import os
+import tempfile
 import unittest
-from model import Model
+from unittest import mock
+from manifest import Manifest
+from model import (
+    AttemptThrottle,
+    Model,
+    Directory,
+    StreamingTextFile,
+    TextFile,
+    ContentCache,
+    check_password,
+    hash_password,
+    load_tree,
+)
 
 
 class TestModel(unittest.TestCase):
@@ -22,14 +36,55 @@ class TestModel(unittest.TestCase):
 
     def setUp(self):
         """Initialize a fresh model for each test."""
-        self.model = Model()
+        self.model = Model(Manifest.load().password_hashes)
 
     def test_initial_state(self):
-        """Test initial unlock level, passwords, and bookmarks."""
+        """Test initial unlock level and that passwords are not stored."""
         self.assertEqual(self.model.unlock_level, 1)
-        self.assertEqual(
-            self.model.passwords, {2: "vires_in_silentio", 3: "CENTENIEL-1"}
+        self.assertEqual(set(self.model.password_hashes), {2, 3})
+        for encoded in self.model.password_hashes.values():
+            self.assertTrue(encoded.startswith("pbkdf2_sha256$"))
+        self.assertTrue(self.model.verify_password(2, "vires_in_silentio"))
+        self.assertTrue(self.model.verify_password(3, "CENTINEL-1"))
+        self.assertFalse(self.model.verify_password(3, "vires_in_silentio"))
+
+    def test_hash_password_round_trip(self):
+        """Test that a hashed password checks out and others do not."""
+        encoded = hash_password("swordfish", iterations=1000)
+        self.assertTrue(check_password("swordfish", encoded))
+        self.assertFalse(check_password("swordfish!", encoded))
+        self.assertNotEqual(encoded, hash_password("swordfish", 1000))
+
+    def test_failed_attempts_are_throttled(self):
+        """Test that repeated failures make the player wait."""
+        now = [0.0]
+        model = Model(self.model.password_hashes, clock=lambda: now[0])
+        for _ in range(3):
+            self.assertFalse(model.verify_password(2, "guess"))
+        self.assertEqual(model.retry_after(), 1.0)
+        # Even the right password is refused while waiting
+        self.assertFalse(model.verify_password(2, "vires_in_silentio"))
+        now[0] = 1.0
+        self.assertTrue(model.verify_password(2, "vires_in_silentio"))
+        self.assertEqual(model.retry_after(), 0.0)
+
+    def test_throttle_is_shared_per_attempter(self):
+        """Test that models sharing a throttle share their failures."""
+        throttle = AttemptThrottle(clock=lambda: 0.0)
+        for _ in range(3):
+            model = Model(self.model.password_hashes, throttle=throttle)
+            self.assertFalse(model.verify_password(2, "guess"))
+        reconnected = Model(self.model.password_hashes, throttle=throttle)
+        self.assertGreater(reconnected.retry_after(), 0)
+        other = Model(
+            self.model.password_hashes, throttle=throttle, attempter="peer"
         )
+        self.assertTrue(other.begin_attempt())
+        # Only one attempt per attempter is checked at a time
+        self.assertTrue(other.attempt_in_progress())
+        self.assertFalse(other.begin_attempt())
+        other.finish_attempt(other.password_matches(2, "vires_in_silentio"))
+        self.assertTrue(other.verify_password(3, "CENTINEL-1"))
 
     def test_increase_level(self):
         """Test that unlock level increases correctly."""
@@ -39,5 +94,110 @@ class TestModel(unittest.TestCase):
         self.assertEqual(self.model.unlock_level, 3)
 
 
+class TestLazyDirectory(unittest.TestCase):
+    """
+    Tests for lazily loaded directories backed by a ContentCache.
+    """
+
+    def setUp(self):
+        """Create a small content tree in a temporary directory."""
+        self._tmp = tempfile.TemporaryDirectory()  # pylint: disable=R1732
+        root = os.path.join(self._tmp.name, "1docs")
+        os.makedirs(os.path.join(root, "2archive"))
+        for index in (1, 3, 4, 5, 6):
+            name = os.path.join(root, f"{index}note.txt")
+            with open(name, "w", encoding="utf-8") as file_obj:
+                file_obj.write(f"note {index}")
+        self.root = root
+        self.manifest = Manifest(
+            {
+                "root": "1docs",
+                "levels": {"2": hash_password("pw", 1000)},
+                "directories": {"2archive": {"lock": 2}},
+            },
+            self._tmp.name,
+        )
+
+    def tearDown(self):
+        """Remove the temporary tree."""
+        self._tmp.cleanup()
+
+    def test_nothing_loaded_until_opened(self):
+        """Test that a lazy directory reads nothing on construction."""
+        cache = ContentCache()
+        directory = Directory("1docs", self._tmp.name, cache)
+        self.assertEqual(len(cache), 0)
+        names = [item.name for item in directory.contents]
+        self.assertEqual(names, ["note.txt", "archive"] + ["note.txt"] * 4)
+        self.assertEqual(len(cache), 1)
+
+    def test_lazy_contents_match_eager(self):
+        """Test that lazy and eager loading expose the same data."""
+        eager = Directory("1docs", self._tmp.name, manifest=self.manifest)
+        lazy = Directory(
+            "1docs", self._tmp.name, ContentCache(), manifest=self.manifest
+        )
+        for eager_item, lazy_item in zip(eager.contents, lazy.contents):
+            self.assertEqual(eager_item.name, lazy_item.name)
+            if isinstance(eager_item, TextFile):
+                self.assertEqual(eager_item.contents, lazy_item.contents)
+        self.assertEqual(lazy.contents[1].lock_level, 2)
+
+    def test_cache_is_bounded(self):
+        """Test that the cache evicts old entries and reloads them."""
+        cache = ContentCache(max_entries=2)
+        directory = Directory("1docs", self._tmp.name, cache)
+        files = [f for f in directory.contents if isinstance(f, TextFile)]
+        for file in files:
+            self.assertTrue(file.contents.startswith("note"))
+            self.assertLessEqual(len(cache), 2)
+        self.assertNotIn(files[0], cache)
+        self.assertEqual(files[0].contents, "note 1")
+
+    def test_nodes_have_no_instance_dict(self):
+        """Test that nodes are slotted rather than carrying a __dict__."""
+        directory = Directory("1docs", self._tmp.name, ContentCache())
+        for node in [directory] + directory.contents:
+            self.assertFalse(hasattr(node, "__dict__"))
+
+    def test_large_files_are_streamed(self):
+        """Test that text files over the threshold are read through mmap."""
+        with mock.patch("model.STREAMING_THRESHOLD", 5):
+            directory = Directory("1docs", self._tmp.name, ContentCache())
+            streamed = [
+                file
+                for file in directory.contents
+                if isinstance(file, StreamingTextFile)
+            ]
+        self.assertEqual(len(streamed), 5)
+        self.assertEqual(bytes(streamed[0].contents), b"note 1")
+        self.assertEqual(list(streamed[0].lines()), ["note 1"])
+
+
+class TestLoadTree(unittest.TestCase):
+    """
+    Tests for parallel eager loading with load_tree.
+    """
+
+    def test_parallel_load_matches_serial(self):
+        """Test that load_tree loads the same tree without changing cwd."""
+        with tempfile.TemporaryDirectory() as tmp:
+            for index in range(1, 10):
+                folder = os.path.join(tmp, "1docs", f"{index}folder")
+                os.makedirs(folder)
+                with open(
+                    os.path.join(folder, "1a.txt"), "w", encoding="utf-8"
+                ) as file_obj:
+                    file_obj.write(f"text {index}")
+            cwd = os.getcwd()
+            parallel = load_tree("1docs", tmp, max_workers=4)
+            serial = Directory("1docs", tmp)
+            self.assertEqual(os.getcwd(), cwd)
+            for left, right in zip(parallel.contents, serial.contents):
+                self.assertEqual(
+                    left.contents[0].contents, right.contents[0].contents
+                )
+
+
 if __name__ == "__main__":
     unittest.main()
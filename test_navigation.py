@@ -0,0 +1,63 @@
+"""
+Unit tests for the navigation stack and node path strings.
+"""
+
+import os
+from model import ContentCache, Directory
+from navigation import NavigationStack
+
+
+def test_push_pop_and_path_string():
+    """
+    Test that the stack tracks the open file and its display path.
+    """
+    root = Directory("1documents", os.getcwd(), ContentCache())
+    stack = NavigationStack(root)
+    assert not stack.pop()
+
+    work = root.contents[0]
+    stack.push(work, 0)
+    stack.push(work.contents[1], 1)
+    assert stack.path_string == "/documents/work_documents/job_offer.txt"
+    assert [node.name for node in stack] == [
+        "documents",
+        "work_documents",
+        "job_offer.txt",
+    ]
+    assert stack.pop()
+    assert stack.current is work
+    assert len(stack) == 2
+
+
+def test_open_path_follows_child_indices():
+    """
+    Test that open_path rebuilds the stack from the root.
+    """
+    root = Directory("1documents", os.getcwd(), ContentCache())
+    stack = NavigationStack(root)
+    stack.open_path((0, 3, 0))
+    assert stack.path_string == "/documents/work_documents/diary/diary.txt"
+    assert stack.current.parent.parent.parent is root
+    # Paths that lead nowhere leave the stack as it was
+    assert not stack.open_path((0, 99))
+    assert not stack.open_path((0, 3, 0, 0))
+    assert stack.path_string == "/documents/work_documents/diary/diary.txt"
+    assert stack.indices == (0, 3, 0)
+
+
+def test_reindex_follows_replaced_listings():
+    """
+    Test that indices are looked up again when a listing changes, and that
+    a removed file cuts the saved path short.
+    """
+    root = Directory("1documents", os.getcwd(), ContentCache())
+    stack = NavigationStack(root)
+    stack.open_path((0, 1))
+    work = stack.current.parent
+    job_offer = stack.current
+    work.replace_contents([work.contents[0], work.contents[2], job_offer])
+    stack.reindex({work})
+    assert stack.indices == (0, 2)
+    work.replace_contents([work.contents[0]])
+    stack.reindex({work})
+    assert stack.indices == (0,)
@@ -0,0 +1,84 @@
+"""
+Unit tests for drawing images in the terminal.
+"""
+
+import os
+import pygame
+from headless import HeadlessGame
+from model import ContentCache, Directory
+from preview import HALF_BLOCK, PreviewCache, render_preview
+
+
+def two_tone(width, height):
+    """
+    Create an image that is red on top and blue below.
+
+    Args:
+        width (int): Image width.
+        height (int): Image height.
+
+    Returns:
+        pygame.Surface: The image.
+    """
+    surface = pygame.Surface((width, height))
+    surface.fill((255, 0, 0))
+    surface.fill((0, 0, 255), (0, height // 2, width, height - height // 2))
+    return surface
+
+
+def test_image_fits_grid_and_keeps_aspect_ratio():
+    """
+    Test that a wide image is scaled to the grid width and centred.
+    """
+    preview = render_preview(two_tone(100, 50), 40, 20, 256)
+    assert len(preview.rows) == 10
+    for runs in preview.rows:
+        assert "".join(text for _, text, _ in runs) == HALF_BLOCK * 40
+    # Red over red, then blue over blue, in the xterm colour cube
+    assert preview.pairs == [(196, 196), (21, 21)]
+
+    narrow = render_preview(two_tone(10, 40), 40, 10, 256)
+    assert len(narrow.rows) == 10
+    assert narrow.rows[0][0][0] == 17  # Five cells wide, centred
+
+
+def test_basic_colors_and_pair_limit():
+    """
+    Test that 8-colour terminals get basic colours and that no more pairs
+    are used than are available.
+    """
+    preview = render_preview(two_tone(8, 8), 8, 4, 8)
+    assert preview.pairs == [(1, 1), (4, 4)]
+
+    noise = pygame.image.frombuffer(os.urandom(60 * 40 * 3), (60, 40), "RGB")
+    preview = render_preview(noise, 60, 20, 256, max_pairs=16)
+    assert len(preview.pairs) == 16
+    assert all(1 <= pair <= 16 for runs in preview.rows for _, _, pair in runs)
+
+
+def test_cache_renders_once_per_size(tmp_path):
+    """
+    Test that a preview is rendered once per image and grid size.
+    """
+    (tmp_path / "1pics").mkdir()
+    pygame.image.save(two_tone(20, 20), str(tmp_path / "1pics" / "1a.png"))
+    image = Directory("1pics", str(tmp_path), ContentCache()).contents[0]
+    cache = PreviewCache()
+    first = cache.get(image, 40, 10, 256)
+    assert cache.get(image, 40, 10, 256) is first
+    assert cache.get(image, 30, 10, 256) is not first
+    assert len(cache) == 2
+
+
+def test_headless_game_draws_image():
+    """
+    Test that opening an image without a window draws it in the terminal.
+    """
+    output = []
+    game = HeadlessGame(Directory("1documents", os.getcwd()))
+    game.screen._write = output.append  # pylint: disable=protected-access
+    game.play("1 4 ENTER 2")
+    assert game.lines[2].strip().startswith(HALF_BLOCK)
+    assert b"\x1b[38;5;" in b"".join(output)
+    game.play("q")
+    assert "2. sunrise.png" in game.lines
@@ -0,0 +1,86 @@
+"""
+Unit tests for differential frame rendering.
+"""
+
+from unittest.mock import MagicMock
+from render import FrameRenderer
+from screen import VirtualScreen
+
+
+def test_unchanged_rows_are_not_redrawn():
+    """
+    Test that presenting the same frame twice writes nothing the second
+    time, and that only changed rows are rewritten.
+    """
+    stdscr = MagicMock()
+    stdscr.getmaxyx.return_value = (24, 80)
+    renderer = FrameRenderer(stdscr)
+    renderer.put(0, 0, "title")
+    renderer.put(2, 0, "first")
+    renderer.present()
+    assert stdscr.addstr.call_count == 2
+
+    stdscr.reset_mock()
+    renderer.begin()
+    renderer.put(0, 0, "title")
+    renderer.put(2, 0, "second")
+    renderer.present()
+    stdscr.addstr.assert_called_once_with(2, 0, "second")
+    stdscr.noutrefresh.assert_called_once()
+    stdscr.doupdate.assert_called_once()
+
+
+def test_rows_missing_from_frame_are_erased():
+    """
+    Test that a row present last frame but not this one is cleared.
+    """
+    screen = VirtualScreen(5, 20)
+    renderer = FrameRenderer(screen)
+    renderer.put(3, 0, "old")
+    renderer.present()
+    renderer.begin()
+    renderer.put(1, 0, "new")
+    renderer.present()
+    assert screen.lines[1:4] == ["new", "", ""]
+
+
+def test_invalidate_repaints_everything():
+    """
+    Test that after invalidate the next frame redraws every row.
+    """
+    output = []
+    screen = VirtualScreen(5, 20, output.append)
+    renderer = FrameRenderer(screen)
+    renderer.put(0, 0, "title")
+    renderer.present()
+    renderer.invalidate()
+    renderer.present()
+    assert output[-1].startswith(b"\x1b[H\x1b[2J")
+    assert b"title" in output[-1]
+
+
+def test_text_outside_screen_is_cut_off():
+    """
+    Test that a frame laid out for a bigger screen draws what fits.
+    """
+    screen = VirtualScreen(3, 10)
+    renderer = FrameRenderer(screen)
+    renderer.put(0, 4, "a long title")
+    renderer.put(1, 20, "off the edge")
+    renderer.put(5, 0, "below")
+    renderer.present(cursor=(5, 30))
+    assert screen.lines == ["    a long", "", ""]
+
+
+def test_last_row_skips_bottom_right_cell():
+    """
+    Test that a full-width last row is drawn without the corner cell,
+    which curses cannot write.
+    """
+    screen = VirtualScreen(3, 10)
+    renderer = FrameRenderer(screen)
+    renderer.put(0, 0, "x" * 10)
+    renderer.put(2, 0, "y" * 10)
+    renderer.put(2, 8, "zz")
+    renderer.present()
+    assert screen.lines == ["x" * 10, "", "y" * 8 + "z"]
@@ -0,0 +1,125 @@
+"""
+Unit tests for persistent player saves.
+"""
+
+import os
+import tempfile
+from unittest.mock import MagicMock
+from controller import Controller
+from model import ContentCache, Directory, Model
+from saves import SaveState, SaveStore
+from search import SearchIndex
+from server import Session
+
+
+def test_saves_survive_reopening():
+    """
+    Test that the latest save of each player is written to disk.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "saves.db")
+        store = SaveStore(path, flush_interval=0.01)
+        for level in range(1, 4):
+            store.save("ada", level, (0, level))
+        store.save("bob", 1, ())
+        assert store.load("ada") == SaveState(3, (0, 3))
+        store.close()
+
+        reopened = SaveStore(path)
+        assert reopened.load("ada") == SaveState(3, (0, 3))
+        assert reopened.load("bob") == SaveState(1, ())
+        assert reopened.load("eve") is None
+        reopened.close()
+
+
+def test_controller_resumes_saved_path():
+    """
+    Test that a returning player reopens their level and path.
+    """
+    root = Directory("1documents", os.getcwd(), ContentCache())
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SaveStore(os.path.join(tmp, "saves.db"))
+        store.save("ada", 2, (0, 1))
+        store.save("bob", 1, (7, 7))
+
+        model = Model()
+        model.set_player_name("ada")
+        view = MagicMock()
+        Controller(None, model).start(view, root, saves=store)
+        file, path = view.display_file.call_args.args
+        assert model.unlock_level == 2
+        assert path.path_string == "/documents/work_documents/job_offer.txt"
+        assert file is path.current
+
+        # A path the tree no longer has falls back to the root
+        model = Model()
+        model.set_player_name("bob")
+        controller = Controller(None, model)
+        controller.start(view, root, saves=store)
+        assert view.display_file.call_args.args[0] is root
+        controller.handle_key("1")
+        assert store.load("bob") == SaveState(1, (0,))
+        store.close()
+
+
+def test_path_is_saved_after_listing_is_evicted():
+    """
+    Test that the path is still saved once a ContentCache has dropped and
+    re-listed the open directory, replacing its nodes.
+    """
+    root = Directory("1documents", os.getcwd(), ContentCache(max_entries=6))
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SaveStore(os.path.join(tmp, "saves.db"))
+        model = Model()
+        model.set_player_name("ada")
+        controller = Controller(None, model)
+        controller.start(MagicMock(), root, SearchIndex(root), store)
+        # Searching reads the whole tree, evicting the open listing
+        for key in ["1", "/", "x", "\n", "q", "2"]:
+            controller.handle_key(key)
+        assert store.load("ada") == SaveState(1, (0, 1))
+        store.close()
+
+
+def test_session_asks_for_player_name():
+    """
+    Test that server players name themselves before the game starts, and
+    that a name without a passphrase is claimed afresh.
+    """
+    root = Directory("1documents", os.getcwd(), ContentCache())
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SaveStore(os.path.join(tmp, "saves.db"))
+        store.save("ada", 2, (0,))
+        session = Session(root, None, None, saves=store)
+        assert session.screen.lines[0] == "Player name: "
+        session.feed(b"adx\x7fa\r")
+        assert session.screen.lines[1] == "Passphrase: "
+        session.feed(b"engine\r")
+        assert session.model.player_name == "ada"
+        assert session.model.unlock_level == 1
+        assert session.screen.lines[0].startswith("/documents ")
+        assert store.load("ada").secret is not None
+        store.close()
+
+
+def test_wrong_passphrase_does_not_resume_save():
+    """
+    Test that a claimed name resumes its save only with its passphrase.
+    """
+    root = Directory("1documents", os.getcwd(), ContentCache())
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SaveStore(os.path.join(tmp, "saves.db"))
+        Session(root, None, None, saves=store).feed(b"ada\rengine\r")
+        store.save("ada", 2, (0,))
+
+        session = Session(root, None, None, saves=store)
+        session.feed(b"ada\rguess\r")
+        assert session.model.player_name == "____"
+        assert session.model.unlock_level == 1
+        assert session.screen.lines[2] == "Wrong passphrase."
+
+        session.feed(b"engine\r")
+        assert session.model.player_name == "ada"
+        assert session.model.unlock_level == 2
+        assert session.screen.lines[0].startswith("/documents/work_documents")
+        store.close()
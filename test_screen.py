@@ -0,0 +1,70 @@
+"""
+Unit tests for the virtual screen and key decoder.
+"""
+
+from screen import KeyDecoder, VirtualScreen
+
+
+def test_refresh_sends_only_changed_rows():
+    """
+    Test that a refresh after the first one only repaints changed rows.
+    """
+    output = []
+    screen = VirtualScreen(5, 20, output.append)
+    screen.addstr(0, 0, "header")
+    screen.addstr(2, 0, "first")
+    screen.refresh()
+    assert output[-1].startswith(b"\x1b[H\x1b[2J")
+
+    screen.addstr(2, 0, "second")
+    screen.refresh()
+    assert b"second" in output[-1]
+    assert b"header" not in output[-1]
+    assert screen.lines[2] == "second"
+
+
+def test_addstr_at_cursor_and_clrtoeol():
+    """
+    Test writing at the cursor and clearing the rest of a row.
+    """
+    screen = VirtualScreen(3, 20)
+    screen.addstr(1, 2, "abcdef")
+    screen.move(1, 4)
+    screen.clrtoeol()
+    screen.addstr("XY")
+    assert screen.lines[1] == "  abXY"
+
+
+def test_color_pairs_become_sgr_codes():
+    """
+    Test that coloured text is sent with 256-colour SGR codes, and resent
+    when its colour pair is redefined.
+    """
+    output = []
+    screen = VirtualScreen(3, 20, output.append)
+    screen.init_pair(1, 196, 21)
+    screen.addstr(1, 2, "ab", screen.color_pair(1))
+    screen.addstr(1, 4, "c")
+    screen.refresh()
+    assert b"\x1b[38;5;196;48;5;21mab\x1b[0mc\x1b[0m" in output[-1]
+
+    screen.refresh()
+    assert b"ab" not in output[-1]
+    screen.init_pair(1, 46, 21)
+    screen.refresh()
+    assert b"\x1b[38;5;46;48;5;21mab" in output[-1]
+
+    screen.move(1, 0)
+    screen.clrtoeol()
+    screen.refresh()
+    assert screen.lines[1] == ""
+
+
+def test_decoder_handles_sequences_split_across_reads():
+    """
+    Test that escape sequences become key names even when split.
+    """
+    decoder = KeyDecoder()
+    assert decoder.feed(b"1\x1b[") == ["1"]
+    assert decoder.feed(b"6~q\r\n") == ["KEY_NPAGE", "q", "\n"]
+    assert decoder.feed(b"\x1b[A\x7f") == ["KEY_UP", "KEY_BACKSPACE"]
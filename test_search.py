@@ -0,0 +1,127 @@
+"""
+Unit tests for the full-text search index.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from model import ContentCache, Directory, TextFile, load_tree
+from search import SearchIndex, tokenize
+from watcher import ContentWatcher
+
+
+class TestSearchIndex(unittest.TestCase):
+    """
+    Test indexing, ranking, lock filtering and saving.
+    """
+
+    def setUp(self):
+        """Index the bundled documents."""
+        self.root = Directory("1documents", os.getcwd(), ContentCache())
+        self.index = SearchIndex(self.root)
+
+    def test_tokenize_lowercases_words(self):
+        """Test that punctuation is dropped and words are lowercased."""
+        self.assertEqual(
+            tokenize("Hello, World! x_1"), ["hello", "world", "x_1"]
+        )
+
+    def test_hits_point_at_matching_lines(self):
+        """Test that each hit's indices and lines locate the query."""
+        hits = self.index.search("sister", unlock_level=3)
+        self.assertTrue(hits)
+        for hit in hits:
+            node = self.root
+            for index in hit.indices:
+                node = node.contents[index]
+            lines = node.contents.split("\n")
+            for line in hit.lines:
+                self.assertIn("sister", lines[line - 1].lower())
+        scores = [hit.score for hit in hits]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_locked_documents_are_hidden(self):
+        """Test that documents in locked directories are not returned."""
+        paths = [hit.path for hit in self.index.search("sister", 1)]
+        self.assertTrue(paths)
+        self.assertFalse([path for path in paths if "/archive/" in path])
+        unlocked = [hit.path for hit in self.index.search("sister", 3)]
+        self.assertIn("/documents/message/to_my_little_sister.txt", unlocked)
+
+    def test_save_and_load(self):
+        """Test that a saved index gives the same results."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.json")
+            self.index.save(path)
+            loaded = SearchIndex.load(path)
+        self.assertEqual(
+            loaded.search("diary notes", 3), self.index.search("diary notes", 3)
+        )
+
+    def test_stale_index_is_rebuilt(self):
+        """Test that a saved index is not used after the tree changed."""
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "1docs"))
+            for name in ("1a.txt", "2b.txt"):
+                with open(
+                    os.path.join(tmp, "1docs", name), "w", encoding="utf-8"
+                ) as file_obj:
+                    file_obj.write(f"shared words in {name}")
+            path = os.path.join(tmp, "index.json")
+            SearchIndex(load_tree("1docs", tmp)).save(path)
+            unchanged = SearchIndex.load(path, load_tree("1docs", tmp))
+            self.assertEqual(unchanged.document_count, 2)
+
+            os.remove(os.path.join(tmp, "1docs", "1a.txt"))
+            root = load_tree("1docs", tmp)
+            hits = SearchIndex.load(path, root).search("shared", 1)
+        self.assertEqual([hit.indices for hit in hits], [(0,)])
+        self.assertEqual(hits[0].path, "/docs/b.txt")
+
+    def test_update_reads_only_changed_directories(self):
+        """Test that changed listings are indexed without a full rebuild."""
+        with tempfile.TemporaryDirectory() as tmp:
+            docs = os.path.join(tmp, "1docs")
+            for name in ("1sub/1a.txt", "1sub/2b.txt", "2other/1c.txt"):
+                os.makedirs(
+                    os.path.dirname(os.path.join(docs, name)), exist_ok=True
+                )
+                with open(
+                    os.path.join(docs, name), "w", encoding="utf-8"
+                ) as file_obj:
+                    file_obj.write(f"shared words in {name}")
+            root = Directory("1docs", tmp)
+            index = SearchIndex(root)
+            self.assertEqual(index.document_count, 3)
+            watcher = ContentWatcher(root)
+
+            os.remove(os.path.join(docs, "1sub", "1a.txt"))
+            with open(
+                os.path.join(docs, "1sub", "0new.txt"), "w", encoding="utf-8"
+            ) as file_obj:
+                file_obj.write("shared fresh words")
+            directories = watcher.poll()
+            with mock.patch.object(
+                TextFile, "lines", autospec=True, side_effect=TextFile.lines
+            ) as lines:
+                index.update(directories)
+            self.assertEqual(
+                [call.args[0].name for call in lines.call_args_list],
+                ["new.txt"],
+            )
+            hits = index.search("shared", 1)
+            self.assertEqual(index.document_count, 3)
+            self.assertEqual(
+                sorted((hit.path, hit.indices) for hit in hits),
+                [
+                    ("/docs/other/c.txt", (1, 0)),
+                    ("/docs/sub/b.txt", (0, 1)),
+                    ("/docs/sub/new.txt", (0, 0)),
+                ],
+            )
+            self.assertEqual(index.search("1a", 1), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
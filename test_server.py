@@ -0,0 +1,175 @@
+"""
+Unit tests for the multi-session server.
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+from manifest import Manifest
+from model import load_tree
+from search import SearchIndex
+from server import GameServer
+
+
+async def run_clients(path, count):
+    """
+    Connect several players, open a file in each, then disconnect.
+
+    Args:
+        path (str): Unix socket path of the server.
+        count (int): Number of players.
+
+    Returns:
+        list: Output received by each player.
+    """
+
+    async def client():
+        reader, writer = await asyncio.open_unix_connection(path)
+        output = await reader.read(4096)
+        writer.write(b"1")
+        output += await reader.read(4096)
+        writer.write(b"2")
+        output += await reader.read(4096)
+        writer.write(b"\x04")
+        output += await reader.read()
+        writer.close()
+        return output
+
+    return await asyncio.gather(*(client() for _ in range(count)))
+
+
+def test_sessions_share_tree_but_not_state():
+    """
+    Test that many players can browse at once over a Unix socket.
+    """
+
+    async def scenario():
+        game = GameServer(load_tree("1documents"))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "game.sock")
+            server = await game.start(unix_path=path)
+            async with server:
+                outputs = await run_clients(path, 20)
+            return game, outputs
+
+    game, outputs = asyncio.run(scenario())
+    assert len(outputs) == 20
+    for output in outputs:
+        assert b"work_documents/" in output
+        assert b"job_offer.txt" in output
+    assert not game.sessions
+
+
+def test_search_index_is_built_before_serving():
+    """
+    Test that the search index is built off the event loop at startup,
+    not by the first player to search.
+    """
+    index = SearchIndex(load_tree("1documents"))
+    threads = []
+    build = index.build
+
+    def record_build():
+        threads.append(threading.current_thread())
+        build()
+
+    index.build = record_build
+
+    async def scenario():
+        game = GameServer(load_tree("1documents"), index)
+        with tempfile.TemporaryDirectory() as tmp:
+            server = await game.start(unix_path=os.path.join(tmp, "game.sock"))
+            server.close()
+
+    asyncio.run(scenario())
+    assert threads and threads[0] is not threading.main_thread()
+    assert index.document_count > 0
+
+
+async def read_until(reader, text):
+    """
+    Read a player's output until some text has arrived.
+
+    Args:
+        reader (asyncio.StreamReader): Player output.
+        text (bytes): Text to wait for.
+
+    Returns:
+        bytes: Everything read.
+    """
+    output = b""
+    while text not in output:
+        data = await asyncio.wait_for(reader.read(4096), timeout=10)
+        assert data, output
+        output += data
+    return output
+
+
+def test_password_attempts_are_checked_off_loop_and_per_peer():
+    """
+    Test that a password is checked while the server keeps running, that
+    failures still count after the player reconnects from the same
+    address, and that Unix socket connections are throttled separately.
+    """
+    manifest = Manifest.load()
+
+    async def attempt(connect, password, result):
+        reader, writer = await connect()
+        await read_until(reader, b"work_documents/")
+        writer.write(b"2")
+        await read_until(reader, b"Enter password")
+        writer.write(password + b"\r")
+        output = await read_until(reader, b"Checking password")
+        # The result is drawn once the check finishes
+        while result not in output.rpartition(b"Checking password")[2]:
+            output += await asyncio.wait_for(reader.read(4096), timeout=10)
+        writer.write(b"\x04")
+        await reader.read()
+        writer.close()
+        return output
+
+    async def scenario():
+        game = GameServer(
+            load_tree("1documents", manifest=manifest),
+            password_hashes=manifest.password_hashes,
+        )
+        server = await game.start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "game.sock")
+            unix_server = await game.start(unix_path=path)
+            async with server, unix_server:
+                for _ in range(3):
+                    # The "Checking password" row is erased
+                    await attempt(
+                        lambda: asyncio.open_connection("127.0.0.1", port),
+                        b"guess",
+                        b"\x1b[J",
+                    )
+                reader, writer = await asyncio.open_connection(
+                    "127.0.0.1", port
+                )
+                await read_until(reader, b"work_documents/")
+                writer.write(b"2vires_in_silentio\r")
+                throttled = await read_until(reader, b"Too many attempts")
+                writer.write(b"\x04")
+                await reader.read()
+                writer.close()
+
+                for _ in range(3):
+                    await attempt(
+                        lambda: asyncio.open_unix_connection(path),
+                        b"guess",
+                        b"\x1b[J",
+                    )
+                unlocked = await attempt(
+                    lambda: asyncio.open_unix_connection(path),
+                    b"vires_in_silentio",
+                    b"diary_cont/",
+                )
+            return unlocked, throttled
+
+    unlocked, throttled = asyncio.run(scenario())
+    assert b"Checking password" not in throttled
+    assert b"Too many attempts" not in unlocked
@@ -84,6 +84,43 @@ class TestView(unittest.TestCase):
         self.view.display_file_list([mock_file], "Header")
         self.mock_stdscr.addstr.assert_any_call(2, 0, "1. notes.txt")
 
+    def test_display_text_file_draws_only_visible_rows(self):
+        """
+        Test that a long text file only has its first screen drawn.
+        """
+        text_file = MagicMock(spec=TextFile)
+        text_file.contents = "\n".join(f"line {i}" for i in range(5000))
+        text_file.prebuilt_layout.return_value = None
+        self.mock_stdscr.getch.return_value = ord("q")
+        self.view.display_text_file(text_file, [DummyFile("log.txt")])
+        drawn = [
+            call.args[2]
+            for call in self.mock_stdscr.addstr.call_args_list
+            if call.args[2].startswith("line")
+        ]
+        self.assertEqual(drawn, [f"line {i}" for i in range(22)])
+
+    def test_display_file_list_pages_long_directories(self):
+        """
+        Test that only one page of a long listing is drawn at a time.
+        """
+        files = [MagicMock(spec=TextFile) for _ in range(50)]
+        for number, file in enumerate(files):
+            file.name = f"doc{number}.txt"
+        self.view.display_file_list(files, "Header")
+        self.view.scroll_listing("KEY_NPAGE")
+        drawn = [
+            call.args[2] for call in self.mock_stdscr.addstr.call_args_list
+        ]
+        self.assertIn("21. doc20.txt", drawn)
+        self.assertIn("42. doc41.txt", drawn)
+        self.assertNotIn("43. doc42.txt", drawn)
+        self.assertIn("Page 2/3 (PgUp/PgDn)", drawn)
+
+        self.view.filter_listing("doc4")
+        self.mock_stdscr.addstr.assert_any_call(2, 0, "5. doc4.txt")
+        self.mock_stdscr.addstr.assert_any_call(23, 0, "Filter: doc4")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,108 @@
+"""
+Unit tests for reloading changed content with ContentWatcher.
+"""
+
+import os
+from headless import HeadlessGame
+from model import ContentCache, Directory, TextFile
+from watcher import ContentWatcher
+
+
+def make_tree(tmp_path):
+    """
+    Create a small content tree.
+
+    Args:
+        tmp_path (pathlib.Path): Directory to create it in.
+
+    Returns:
+        pathlib.Path: Path to the tree's root.
+    """
+    root = tmp_path / "1docs"
+    (root / "1sub").mkdir(parents=True)
+    (root / "1a.txt").write_text("alpha", encoding="utf-8")
+    (root / "1b.txt").write_text("beta", encoding="utf-8")
+    (root / "1sub" / "1c.txt").write_text("gamma", encoding="utf-8")
+    return root
+
+
+def rewrite(path, text):
+    """
+    Change a file's contents and move its modification time on.
+
+    Args:
+        path (pathlib.Path): The file.
+        text (str): Its new contents.
+    """
+    mtime_ns = path.stat().st_mtime_ns
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+
+
+def test_only_changed_nodes_are_rebuilt(tmp_path):
+    """
+    Test that added, modified and removed files are picked up, and that
+    unchanged nodes are kept.
+    """
+    path = make_tree(tmp_path)
+    root = Directory("1docs", str(tmp_path))
+    watcher = ContentWatcher(root)
+    assert watcher.poll() == set()
+
+    a_txt, b_txt, sub = root.contents
+    rewrite(path / "1a.txt", "alpha 2")
+    (path / "1b.txt").unlink()
+    (path / "1d.txt").write_text("delta", encoding="utf-8")
+    assert watcher.poll() == {root}
+
+    names = [node.name for node in root.contents]
+    assert names == ["a.txt", "d.txt", "sub"]
+    assert root.contents[0] is not a_txt
+    assert root.contents[0].contents == "alpha 2"
+    assert root.contents[2] is sub
+    assert b_txt.contents == "beta"  # Old nodes stay readable
+    assert watcher.poll() == set()
+
+
+def test_new_directories_are_watched(tmp_path):
+    """
+    Test that changes inside a directory added while watching are found.
+    """
+    path = make_tree(tmp_path)
+    root = Directory("1docs", str(tmp_path))
+    watcher = ContentWatcher(root)
+    (path / "1new").mkdir()
+    assert watcher.poll() == {root}
+    (path / "1new" / "1e.txt").write_text("epsilon", encoding="utf-8")
+    new = root.contents[2]
+    assert new.name == "new"
+    assert watcher.poll() == {new}
+    assert isinstance(new.contents[0], TextFile)
+
+
+def test_unlisted_directories_are_not_read(tmp_path):
+    """
+    Test that a lazy tree's unopened directories are left alone.
+    """
+    path = make_tree(tmp_path)
+    cache = ContentCache()
+    root = Directory("1docs", str(tmp_path), cache)
+    root.contents  # pylint: disable=pointless-statement
+    watcher = ContentWatcher(root)
+    (path / "1sub" / "1f.txt").write_text("phi", encoding="utf-8")
+    (path / "1g.txt").write_text("gee", encoding="utf-8")
+    assert watcher.poll() == {root}
+    assert root.contents[-1].contents[1].name == "f.txt"
+
+
+def test_open_listing_is_redrawn(tmp_path):
+    """
+    Test that a player looking at a listing sees it change.
+    """
+    path = make_tree(tmp_path)
+    root = Directory("1docs", str(tmp_path))
+    game = HeadlessGame(root)
+    watcher = ContentWatcher(root)
+    (path / "1z.txt").write_text("zeta", encoding="utf-8")
+    game.controller.content_changed(watcher.poll())
+    assert "4. z.txt" in game.lines
@@ -2,10 +2,19 @@
 View module for handling all visual display and user interaction logic.
 """
 
-from time import sleep
-import curses
-import pygame
+import functools
+import math
 from model import Directory, TextFile, ImageFile
+from layout import LayoutCache, Viewport
+from images import ImageCache, display_format
+from media import load_pygame
+from preview import PreviewCache, TerminalColors
+from render import FrameRenderer
+from navigation import NavigationStack
+from metrics import timed
+
+# Columns the title keeps before instructions are shown beside it
+MIN_TITLE_WIDTH = 20
 
 
 class View:
@@ -13,7 +22,17 @@ class View:
     View class for displaying file contents and interface in the game.
     """
 
-    def __init__(self, stdscr, controller, model):
+    def __init__(
+        self,
+        stdscr,
+        controller,
+        model,
+        layouts=None,
+        image_window=True,
+        images=None,
+        image_preview=True,
+        previews=None,
+    ):
         """
         Initialize the View.
 
@@ -21,10 +40,49 @@ class View:
             stdscr: Curses screen object.
             controller: Controller instance for input handling.
             model: Model instance for data and state.
+            layouts: LayoutCache of wrapped text files, or None to create
+                one for this view.
+            image_window: Whether images open in a pygame window, which
+                needs a local display.
+            images: ImageCache used for image windows, or None to create
+                one for this view.
+            image_preview: Whether images that do not open in a window are
+                drawn in the terminal. If not, a notice is shown instead.
+            previews: PreviewCache of images drawn in the terminal, or None
+                to create one for this view.
         """
         self._stdscr = stdscr
         self._model = model
         self._controller = controller
+        self._layouts = LayoutCache() if layouts is None else layouts
+        self._image_window = image_window
+        if images is None and image_window:
+            images = ImageCache()
+        self._images = images
+        self._image_preview = image_preview
+        self._previews = PreviewCache() if previews is None else previews
+        self._colors = None
+        self._frame = FrameRenderer(stdscr)
+
+        # Password prompt and the characters echoed after it
+        self._password_prompt = (
+            "File locked. Enter password to authorize entry: "
+        )
+        self._password_echo = ""
+
+        # Entries, filter and page of the open directory listing
+        self._listing_files = []
+        self._listing_filter = ""
+        self._listing_status = ""
+        self._listing_rows = range(0)
+        self._listing_viewport = None
+
+        # Layout and scroll position of the open text file
+        self._text_layout = None
+        self._viewport = None
+
+        # Draws the open screen again after the terminal is resized
+        self._redraw = None
 
         # Get max screen size and subtract 1 to avoid overflow
         self._rows, self._cols = self._stdscr.getmaxyx()
@@ -47,122 +105,360 @@ class View:
         Convert a list of File objects into a /-separated path string.
 
         Args:
-            dir_path: List of File objects representing the current path.
+            dir_path: NavigationStack, or list of File objects representing
+                the current path.
 
         Returns:
             str: Full path as a string.
         """
-        path = ""
-        for element in dir_path:
-            path += "/" + element.name
-        return path
+        if isinstance(dir_path, NavigationStack):
+            return dir_path.path_string
+        return "".join("/" + element.name for element in dir_path)
 
-    def display_text_file(self, file, path):
+    def begin_screen(self, title, instructions):
         """
-        Displays contents of a text file using a curses pad.
+        Start a frame with a title at top-left and instructions at right.
+
+        The title is cut short where the instructions start. On terminals
+        too narrow to leave it MIN_TITLE_WIDTH columns, only the title is
+        shown.
+
+        Args:
+            title (str): Text for the top-left corner, such as the path.
+            instructions (list): Lines of instructions for the top-right.
+        """
+        self._frame.begin()
+        col = self._cols - 30
+        if col - 1 < MIN_TITLE_WIDTH:
+            self._frame.put(0, 0, title[: self._cols])
+            return
+        self._frame.put(0, 0, title[: col - 1])
+        for i, line in enumerate(instructions):
+            self._frame.put(i, col, line)
+
+    def invalidate(self):
+        """
+        Repaint the whole terminal on the next update.
+        """
+        self._frame.invalidate()
+
+    @timed("view.resize")
+    def resize(self):
+        """
+        Draw the open screen again at the terminal's new size.
+
+        Only what is visible is laid out again: a text file is rewrapped
+        from the line at the top of the screen, as far as the screen goes,
+        and keeps its wrapping if the width did not change. The new screen
+        is sent in one update.
+        """
+        self._rows, self._cols = self._stdscr.getmaxyx()
+        self._rows -= 1
+        self._cols -= 1
+        self._frame.invalidate()
+        if self._redraw is not None:
+            self._redraw()
+
+    @timed("view.display_text_file")
+    def display_text_file(self, file, path, offset=0):
+        """
+        Displays contents of a text file in a scrollable window.
+
+        Only the rows that fit on screen are drawn, so opening and scrolling
+        cost the same however long the file is. The file is only wrapped as
+        far as the first page. Keys are passed to scroll_text while the
+        file is open.
 
         Args:
             file: TextFile to be displayed.
             path: Path from root to this file.
+            offset (int): Offset in the text of the line to show at the top,
+                e.g. to keep the same line in view after a resize.
         """
-        self._stdscr.clear()
-
-        # Print the current file path at top-left
-        self._stdscr.addstr(0, 0, self.current_path_to_string(path))
-
-        # Print user instructions at top-right
-        for i, line in enumerate(self._file_instructions):
-            self._stdscr.addstr(i, self._cols - 30, line)
-        self._stdscr.refresh()
-
-        # Create a pad to scroll through long text files
-        text_pad = curses.newpad(1000, self._cols)
-        mypad_pos = 0
-
-        # Split file into lines and add to pad
-        text_lines = file.contents.split("\n")
-        current_row = 0
-
-        for line in text_lines:
-            # Wrap long lines that exceed screen width
-            for i in range(int(len(line) / self._cols)):
-                text_pad.addstr(
-                    current_row,
-                    0,
-                    line[self._cols * i : self._cols * (i + 1) + 1],
-                )
-                current_row += 1
-            # Add the remainder of the line
-            text_pad.addstr(current_row, 0, line[-(len(line) % self._cols) :])
-            current_row += 1
-
-        # Render initial view of pad
-        text_pad.refresh(0, 0, 2, 0, self._rows, self._cols)
-
-        # Scroll with up/down keys, quit on "q"
-        while True:
-            input_key = self._stdscr.getch()
-            if input_key == curses.KEY_DOWN:
-                mypad_pos += 1
-            elif input_key == curses.KEY_UP:
-                mypad_pos -= 1
-            elif input_key == 113:  # ASCII for 'q'
-                break
+        # Print the current file path and user instructions
+        self.begin_screen(
+            self.current_path_to_string(path), self._file_instructions
+        )
+
+        # Text is shown from row 2 to the last usable row
+        layout = self._text_layout = self._layouts.get(file, self._cols)
+        top = layout.row_at(offset) if offset else 0
+        layout.index_to(top + max(self._rows - 1, 1))
+        self._viewport = Viewport(layout.row_count, self._rows - 1)
+        self._viewport.scroll(top)
+        self._redraw = functools.partial(self._redraw_text_file, file, path)
+        self.draw_text_rows(layout, self._viewport)
 
-            text_pad.refresh(mypad_pos, 0, 2, 0, self._rows, self._cols)
-            sleep(0.002)
+    def _redraw_text_file(self, file, path):
+        """
+        Show the open text file again from the line at the top.
+
+        Args:
+            file: The open TextFile.
+            path: Path from root to this file.
+        """
+        starts, _ = self._text_layout.offsets
+        self.display_text_file(file, path, starts[self._viewport.top])
+
+    @timed("view.scroll_text")
+    def scroll_text(self, key):
+        """
+        Scroll the open text file with arrow and paging keys.
+
+        A file that is not fully wrapped yet is indexed just far enough
+        ahead of the new position first, except for End, which has to
+        index all of it.
+
+        Args:
+            key (str): Key name as returned by getkey.
+        """
+        viewport = self._viewport
+        layout = self._text_layout
+        if not layout.complete:
+            needed = {
+                "KEY_DOWN": viewport.top + viewport.height + 1,
+                "KEY_NPAGE": viewport.top + 2 * viewport.height,
+                "KEY_END": None,
+            }
+            if key in needed:
+                layout.index_to(needed[key])
+                viewport.resize(layout.row_count)
+        scroll_keys = {
+            "KEY_DOWN": lambda: viewport.scroll(1),
+            "KEY_UP": lambda: viewport.scroll(-1),
+            "KEY_NPAGE": viewport.page_down,
+            "KEY_PPAGE": viewport.page_up,
+            "KEY_HOME": viewport.home,
+            "KEY_END": viewport.end,
+        }
+        if key in scroll_keys and scroll_keys[key]():
+            self.draw_text_rows(layout, viewport)
+
+    def draw_text_rows(self, layout, viewport):
+        """
+        Draw the rows of a layout that are inside the viewport.
+
+        Args:
+            layout: TextLayout of the file being shown.
+            viewport: Viewport giving the visible rows.
+        """
+        self._frame.clear_rows(2, viewport.height + 2)
+        rows = layout.rows(viewport.top, viewport.bottom)
+        for screen_row, text in enumerate(rows):
+            self._frame.put(screen_row + 2, 0, text)
+        self._frame.present()
+
+    @timed("view.display_image_preview")
+    def display_image_preview(self, file, path):
+        """
+        Draw an image in the terminal with coloured half-block characters.
+
+        Terminals without colour get the image notice instead.
+
+        Args:
+            file: ImageFile to be displayed.
+            path: Path to file from root.
+        """
+        if self._colors is None:
+            self._colors = TerminalColors(self._stdscr)
+        if not self._colors.usable:
+            self.display_image_notice(file, path)
+            return
+        preview = self._previews.get(
+            file,
+            max(self._cols, 1),
+            max(self._rows - 1, 1),
+            self._colors.colors,
+            self._colors.max_pairs,
+        )
+        attributes = self._colors.attributes(preview.pairs)
+        self._redraw = functools.partial(self.display_image_preview, file, path)
+        self.begin_screen(
+            self.current_path_to_string(path), self._file_instructions
+        )
+        for row, runs in enumerate(preview.rows, start=2):
+            for col, text, pair in runs:
+                self._frame.put(row, col, text, attributes[pair - 1])
+        self._frame.present()
+
+    def display_image_notice(self, file, path):
+        """
+        Tell the user an image cannot be shown in this session.
+
+        Args:
+            file: ImageFile object.
+            path: Path to file from root.
+        """
+        self._redraw = functools.partial(self.display_image_notice, file, path)
+        self.begin_screen(
+            self.current_path_to_string(path), self._file_instructions
+        )
+        self._frame.put(
+            2, 0, f"{file.name} is an image and can only be viewed locally."
+        )
+        self._frame.present()
 
     def display_image_file(self, file, path):
         """
         Display a .png file using pygame.
 
+        The window is hidden rather than destroyed when closed, so the
+        display stays initialised for the next image.
+
         Args:
             file: ImageFile object.
             path: Path to file from root.
         """
-        # Create a pygame window matching image size
+        pygame = load_pygame()
+
+        # Create (or reuse) a pygame window matching image size
         scrn = pygame.display.set_mode(
-            (file.contents.get_width(), file.contents.get_height())
+            self._images.get(file).get_size(), pygame.SHOWN
         )
         pygame.display.set_caption(self.current_path_to_string(path))
 
-        # Render the image and update display
-        imp = file.contents.convert()
+        # Render the image (converted once per display format) and update
+        imp = self._images.get(file, display_format())
         scrn.blit(imp, (0, 0))
         pygame.display.flip()
 
-        # Wait until user closes the window
-        status = True
-        while status:
-            for i in pygame.event.get():
-                if i.type == pygame.QUIT:
-                    status = False
+        # Sleep until the user closes the window or presses Q/Escape,
+        # repainting if the window is uncovered in the meantime
+        while True:
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT or (
+                event.type == pygame.KEYDOWN
+                and event.key in (pygame.K_q, pygame.K_ESCAPE)
+            ):
+                break
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                scrn.blit(imp, (0, 0))
+                pygame.display.flip()
 
-        pygame.quit()
+        pygame.display.set_mode((1, 1), pygame.HIDDEN)
 
     def display_file_list(self, files, header):
         """
         Display a list of files and directories with indexes and header.
 
+        Only the page of entries that fits on screen is drawn, so listing
+        a directory costs the same however many entries it has.
+
         Args:
             files: List of File/Directory objects.
             header: String to show as the title.
         """
+        self._listing_files = files
+        self._listing_filter = ""
+        self._listing_status = ""
+        self._listing_rows = range(len(files))
+        self._listing_viewport = Viewport(len(files), self._rows - 2)
+        self.draw_listing()
+
+    def listing_label(self, index):
+        """
+        Return the numbered label shown for an entry of the listing.
+
+        Args:
+            index: Position of the entry in the directory.
 
-        # Print each file/directory, numbered
+        Returns:
+            str: The label, e.g. "3. notes.txt".
+        """
+        item = self._listing_files[index]
+        if isinstance(item, Directory):
+            if item.lock_level > self._model.unlock_level:
+                return f"{index+1}. [LOCKED]"
+            return f"{index+1}. {item.name}/"
+        return f"{index+1}. {item.name}"
+
+    def draw_listing(self):
+        """
+        Draw the visible page of the listing and its status line.
+        """
+        viewport = self._listing_viewport
+        self._frame.clear_rows(2, self._rows + 1)
+
+        # Print each visible file/directory, numbered
         row = 2
-        for i, item in enumerate(files):
-            if isinstance(item, Directory):
-                if item.lock_level > self._model.unlock_level:
-                    self._stdscr.addstr(row, 0, f"{i+1}. [LOCKED]")
-                else:
-                    self._stdscr.addstr(row, 0, f"{i+1}. {item.name}/")
-            else:
-                self._stdscr.addstr(row, 0, f"{i+1}. {item.name}")
+        for position in range(viewport.top, viewport.bottom):
+            index = self._listing_rows[position]
+            self._frame.put(row, 0, self.listing_label(index))
             row += 1
 
-        self._stdscr.refresh()
+        # Summarise paging, filtering and selection on the last row
+        status = []
+        pages = -(-len(self._listing_rows) // viewport.height)
+        if pages > 1:
+            page = viewport.top // viewport.height + 1
+            status.append(f"Page {page}/{pages} (PgUp/PgDn)")
+        if self._listing_filter:
+            status.append(f"Filter: {self._listing_filter}")
+        if self._listing_status:
+            status.append(self._listing_status)
+        if status:
+            self._frame.put(self._rows, 0, "  ".join(status)[: self._cols])
+        self._frame.present()
+
+    def scroll_listing(self, key):
+        """
+        Page through the listing.
+
+        Args:
+            key (str): Key name as returned by getkey.
+        """
+        viewport = self._listing_viewport
+        page_keys = {
+            "KEY_NPAGE": viewport.page_down,
+            "KEY_PPAGE": viewport.page_up,
+            "KEY_HOME": viewport.home,
+            "KEY_END": viewport.end,
+        }
+        if key in page_keys and page_keys[key]():
+            self.draw_listing()
+
+    def filter_listing(self, text, typing=False):
+        """
+        Show only the entries whose label contains some text.
+
+        Entries keep their numbers, so they can still be opened by number.
+
+        Args:
+            text: Text to look for, ignoring case; empty shows everything.
+            typing: Whether the user is still typing the filter.
+        """
+        if text != self._listing_filter:
+            self._listing_filter = text
+            if text:
+                needle = text.lower()
+                self._listing_rows = [
+                    index
+                    for index in range(len(self._listing_files))
+                    if needle in self.listing_label(index).lower()
+                ]
+            else:
+                self._listing_rows = range(len(self._listing_files))
+            self._listing_viewport = Viewport(
+                len(self._listing_rows), self._rows - 2
+            )
+        self._listing_status = (
+            "Type to filter, Enter to keep, Esc to clear" if typing else ""
+        )
+        self.draw_listing()
+
+    def show_listing_status(self, selection):
+        """
+        Show the entry number typed so far.
+
+        Args:
+            selection: Digits typed, or an empty string.
+        """
+        self._listing_status = (
+            f"Open: {selection} (Enter to open)" if selection else ""
+        )
+        self.draw_listing()
 
+    @timed("view.display_directory")
     def display_directory(self, directory, path):
         """
         Display a directory, with password entry if locked.
@@ -172,27 +468,59 @@ class View:
             path: Path list from root to this directory.
         """
 
-        self._stdscr.clear()
-
-        # Print the current file path at top-left
-        self._stdscr.addstr(0, 0, self.current_path_to_string(path))
-
-        # Print user instructions at top-right
-        for i, line in enumerate(self._file_instructions):
-            self._stdscr.addstr(i, self._cols - 30, line)
-        self._stdscr.refresh()
+        # Print the current file path and user instructions
+        self.begin_screen(
+            self.current_path_to_string(path), self._file_instructions
+        )
 
         # Check if locked
         if directory.lock_level > self._model.unlock_level:
             # Prompt for password if locked
-            if self.password_entry(self._model.passwords[directory.lock_level]):
-                self._model.increase_level()
-                self.display_directory(directory, path)
+            self.display_password_prompt()
+            self._redraw = functools.partial(self._redraw_password, path)
         else:
             # Show contents if unlocked
             self.display_file_list(
                 directory.contents, self.current_path_to_string(path)
             )
+            self._redraw = functools.partial(self._redraw_listing, path)
+            # Start decoding images so they open without a wait
+            if self._images is not None:
+                self._images.prefetch(directory.contents)
+
+    def _redraw_listing(self, path):
+        """
+        Show the open listing again, on the page holding its first visible
+        entry, keeping its filter and status.
+
+        Args:
+            path: Path from root to the directory.
+        """
+        self.begin_screen(
+            self.current_path_to_string(path), self._file_instructions
+        )
+        top = self._listing_viewport.top
+        self._listing_viewport = Viewport(
+            len(self._listing_rows), self._rows - 2
+        )
+        height = self._listing_viewport.height
+        self._listing_viewport.scroll(top - top % height)
+        self.draw_listing()
+
+    def _redraw_password(self, path):
+        """
+        Show the password prompt again with what has been typed so far.
+
+        Args:
+            path: Path from root to the locked directory.
+        """
+        self.begin_screen(
+            self.current_path_to_string(path), self._file_instructions
+        )
+        self._frame.put(2, 0, self._password_prompt + self._password_echo)
+        self._frame.present(
+            cursor=(2, len(self._password_prompt) + len(self._password_echo))
+        )
 
     def display_file(self, file, path):
         """
@@ -201,39 +529,114 @@ class View:
         Args:
             file: File or Directory object.
             path: Path list from root.
+
+        Returns:
+            bool: True if the file stays on screen until the user goes
+                back, False if it was shown in a window that is already
+                closed.
         """
         if isinstance(file, Directory):
             self.display_directory(file, path)
         elif isinstance(file, TextFile):
             self.display_text_file(file, path)
         elif isinstance(file, ImageFile):
-            self.display_image_file(file, path)
+            if self._image_window:
+                self.display_image_file(file, path)
+                return False
+            if self._image_preview:
+                self.display_image_preview(file, path)
+            else:
+                self.display_image_notice(file, path)
+        return True
 
-    def password_entry(self, password):
+    def display_search_prompt(self, query):
         """
-        Prompt user to enter a password and verify correctness.
+        Show the search prompt with the query typed so far.
 
         Args:
-            password (str): Correct password to check against.
+            query (str): The query.
+        """
+        self._redraw = functools.partial(self.display_search_prompt, query)
+        self.begin_screen(
+            "Search", ["Press Enter to search", "Press Esc to cancel"]
+        )
+        prompt = f"Search for: {query}"[: self._cols]
+        self._frame.put(2, 0, prompt)
+        self._frame.present(cursor=(2, len(prompt)))
 
-        Returns:
-            bool: True if entered correctly, False otherwise.
+    def display_search_results(self, query, hits):
         """
+        List the documents matching a search, best match first.
 
-        self._stdscr.addstr(
-            2, 0, "File locked. Enter password to authorize entry: "
+        Args:
+            query (str): The query that was run.
+            hits (list): SearchHits to show.
+        """
+        self._redraw = functools.partial(
+            self.display_search_results, query, hits
         )
+        self.begin_screen(f"Search: {query}", self._file_instructions)
+        if not hits:
+            self._frame.put(2, 0, "No documents found.")
+        for i, hit in enumerate(hits[: self._rows - 1]):
+            lines = ", ".join(str(line) for line in hit.lines[:5])
+            if len(hit.lines) > 5:
+                lines += ", ..."
+            entry = f"{i+1}. {hit.path} (lines {lines})"
+            self._frame.put(i + 2, 0, entry[: self._cols])
+        self._frame.present()
+
+    def display_password_prompt(self):
+        """
+        Ask the user to enter a password for a locked directory.
 
-        entered_password = ""
-        while True:
-            key = self._stdscr.getkey()
-            if key is not None:
-                if key == "\n":
-                    # Check password and return result
-                    return entered_password == password
-                elif key in ("q", "Q"):
-                    return False
-                # Display key as it's typed and update input
-                self._stdscr.addstr(key)
-                entered_password += str(key)
-            sleep(0.002)
+        The controller collects the typed keys and echoes each one with
+        echo_password_key.
+        """
+        self._password_echo = ""
+        self._frame.put(2, 0, self._password_prompt)
+        self._frame.present(cursor=(2, len(self._password_prompt)))
+
+    def show_password_checking(self):
+        """
+        Tell the user their password is being checked.
+        """
+        self._frame.put(3, 0, "Checking password...")
+        self._frame.present(cursor=(2, len(self._password_prompt)))
+
+    def show_password_busy(self):
+        """
+        Tell the user another of their passwords is still being checked.
+        """
+        self._frame.put(
+            3, 0, "Another check is in progress; press Enter again."
+        )
+        self._frame.present(
+            cursor=(2, len(self._password_prompt) + len(self._password_echo))
+        )
+
+    def show_password_wait(self, seconds):
+        """
+        Tell the user to wait before trying another password.
+
+        Args:
+            seconds (float): Time left to wait.
+        """
+        self._frame.put(
+            3, 0, f"Too many attempts. Try again in {math.ceil(seconds)}s."
+        )
+        self._frame.present(cursor=(2, len(self._password_prompt)))
+
+    def echo_password_key(self, key):
+        """
+        Display a key typed at the password prompt.
+
+        Args:
+            key (str): Key name as returned by getkey.
+        """
+        self._password_echo += key
+        self._frame.clear_rows(2, 3)
+        self._frame.put(2, 0, self._password_prompt + self._password_echo)
+        self._frame.present(
+            cursor=(2, len(self._password_prompt) + len(self._password_echo))
+        )
@@ -0,0 +1,125 @@
+"""
+Polling watcher that reloads the parts of a content tree that change.
+
+ContentWatcher remembers the size and modification time of every entry in
+each directory that has been listed. A poll compares them with what is on
+disk and, for each directory that changed, builds a new listing that keeps
+the nodes of unchanged entries and creates nodes only for entries that
+were added or modified. The new listing replaces the old one in a single
+assignment, so players browsing the tree see either the old or the new
+version of a directory, never a mix.
+
+Directories that have not been listed yet (or were dropped from a lazy
+tree's cache) are not watched; they are read fresh when next opened.
+"""
+
+import os
+from model import Directory
+
+
+def _stat_entries(path):
+    """
+    Record what each entry of a directory looks like on disk.
+
+    Args:
+        path (str): Path to the directory.
+
+    Returns:
+        dict: On-disk name to None for a subdirectory, or to the file's
+            (modification time in ns, size).
+    """
+    entries = {}
+    with os.scandir(path) as scan:
+        for entry in scan:
+            if entry.is_dir():
+                entries[entry.name] = None
+            else:
+                stat = entry.stat()
+                entries[entry.name] = (stat.st_mtime_ns, stat.st_size)
+    return entries
+
+
+class ContentWatcher:
+    """
+    Finds added, modified and removed files under a content tree by polling.
+    """
+
+    def __init__(self, root):
+        """
+        Start watching a tree as it is now.
+
+        Args:
+            root (Directory): Top-level directory of the tree.
+        """
+        self._root = root
+        self._entries = {}
+        self.scan()
+
+    def scan(self):
+        """
+        Look for changes and build new listings, without swapping them in.
+
+        This only reads the disk, so it can run on a worker thread while
+        players keep using the tree.
+
+        Returns:
+            list: A (directory, contents, entries) tuple for each directory
+                that changed, to pass to apply.
+        """
+        changes = []
+        watched = {}
+        directories = [self._root]
+        while directories:
+            directory = directories.pop()
+            contents = directory.loaded_contents
+            if contents is None:
+                continue
+            try:
+                entries = _stat_entries(directory.path)
+            except OSError:
+                continue  # Removed; its parent's new listing drops it
+            previous = self._entries.get(directory)
+            if previous is not None and previous != entries:
+                changed = {
+                    name
+                    for name, entry in entries.items()
+                    if name in previous and previous[name] != entry
+                }
+                contents = directory.reload(changed)
+                changes.append((directory, contents, entries))
+            watched[directory] = entries
+            directories.extend(
+                child for child in contents if isinstance(child, Directory)
+            )
+        # Only directories still in the tree stay watched
+        self._entries = {
+            directory: self._entries.get(directory, entries)
+            for directory, entries in watched.items()
+        }
+        return changes
+
+    def apply(self, changes):
+        """
+        Swap in the new listings found by scan.
+
+        Call this on the thread the players' input is handled on.
+
+        Args:
+            changes (list): Changes returned by scan.
+
+        Returns:
+            set: The directories whose listings were replaced.
+        """
+        for directory, contents, entries in changes:
+            directory.replace_contents(contents)
+            self._entries[directory] = entries
+        return {directory for directory, _, _ in changes}
+
+    def poll(self):
+        """
+        Scan for changes and apply them straight away.
+
+        Returns:
+            set: The directories whose listings were replaced.
+        """
+        return self.apply(self.scan())